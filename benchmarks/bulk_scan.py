@@ -0,0 +1,98 @@
+"""
+Bulk scanning of files, with and without the page cache friendly mode
+
+Scans the same files with ``scan_paths()`` normally and with
+``bulk=True`` (``O_NOATIME``, ``posix_fadvise()`` hints, unbuffered
+reads), reporting the throughput of each, from a cold and a warm page
+cache, and how many access times were updated.
+
+The page cache is emptied (for the scanned files only) with
+``posix_fadvise(DONTNEED)``, which needs no privileges; this is Linux
+specific, elsewhere the "cold" runs are warm ones.
+
+Usage: python benchmarks/bulk_scan.py [-n COUNT] [-r ROUNDS] [image ...]
+
+Without images, synthetic JPEG files are used (pass images on the local
+filesystem to be benchmarked for meaningful results).
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from py3exif.batch import scan_paths
+
+
+def _synthetic_files(directory, count):
+    """Write ``count`` JPEG files with EXIF data and 1 MiB of image data"""
+    from tests.helpers import make_jpeg, make_tiff, BASIC_IFD0, BASIC_EXIF
+
+    image = make_jpeg(make_tiff(BASIC_IFD0, BASIC_EXIF))
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, 'image{:d}.jpg'.format(i))
+        with open(path, 'wb') as fileobj:
+            fileobj.write(image + os.urandom(1024 * 1024))
+        paths.append(path)
+    return paths
+
+
+def _drop_cache(paths):
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def _atimes(paths):
+    return [os.stat(path).st_atime_ns for path in paths]
+
+
+def run(paths, bulk, cold, rounds):
+    """Return the best throughput (files per second) over ``rounds``"""
+    best = 0
+    for _ in range(rounds):
+        if cold:
+            _drop_cache(paths)
+        start = time.perf_counter()
+        for result in scan_paths(paths, bulk=bulk):
+            pass
+        elapsed = time.perf_counter() - start
+        best = max(best, len(paths) / elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('-n', '--count', type=int, default=200,
+                        help='number of synthetic files')
+    parser.add_argument('-r', '--rounds', type=int, default=3,
+                        help='rounds per mode, keeping the best')
+    parser.add_argument('images', nargs='*')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = args.images or _synthetic_files(directory, args.count)
+
+        for cold in (True, False):
+            for bulk in (False, True):
+                before = _atimes(paths)
+                rate = run(paths, bulk, cold, args.rounds)
+                touched = sum(1 for a, b in zip(before, _atimes(paths))
+                              if a != b)
+                print('{:4} cache, {:6}: {:9.0f} files/s, '
+                      '{:d} access times updated'.format(
+                          'cold' if cold else 'warm',
+                          'bulk' if bulk else 'normal', rate, touched))
+
+
+if __name__ == '__main__':
+    main()
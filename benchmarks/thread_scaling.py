@@ -0,0 +1,93 @@
+"""
+Thread scaling of process_file()
+
+Decodes the same files on 1, 2, 4... threads and reports the throughput
+for each thread count. On a free-threaded Python build (eg. python3.13t)
+it should grow with the number of threads, up to the number of cores;
+with the GIL, it stays flat.
+
+Usage: python benchmarks/thread_scaling.py [-n COUNT] [-t THREADS] [image ...]
+
+Without images, synthetic JPEG files are used.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import concurrent.futures
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from py3exif import process_file
+
+
+def _synthetic_files(directory, count):
+    """Write ``count`` small JPEG files with EXIF and GPS data"""
+    from tests.helpers import make_jpeg, make_tiff, BASIC_IFD0, BASIC_EXIF
+    from py3exif.constants.field_types import FT_RATIO
+
+    gps = [(0x0002, FT_RATIO, [(48, 1), (51, 1), (2400, 100)])]
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, 'image{:d}.jpg'.format(i))
+        with open(path, 'wb') as fileobj:
+            fileobj.write(make_jpeg(make_tiff(BASIC_IFD0, BASIC_EXIF, gps)))
+        paths.append(path)
+    return paths
+
+
+def _decode(path):
+    with open(path, 'rb') as fileobj:
+        header = process_file(fileobj)
+        return sum(1 for tag in header.tags.values() if str(tag))
+
+
+def run(paths, threads, rounds=3):
+    """Return the best throughput (files per second) over ``rounds``"""
+    best = 0
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in executor.map(_decode, paths, chunksize=16):
+                pass
+            elapsed = time.perf_counter() - start
+            best = max(best, len(paths) / elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('-n', '--count', type=int, default=2000,
+                        help='number of files to decode per round')
+    parser.add_argument('-t', '--threads', type=int,
+                        default=os.cpu_count() or 1,
+                        help='maximum number of threads')
+    parser.add_argument('images', nargs='*')
+    args = parser.parse_args()
+
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('Python {} ({}), {:d} CPUs'.format(
+        sys.version.split()[0], 'GIL' if gil else 'free-threaded',
+        os.cpu_count() or 1))
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.images:
+            paths = (args.images * args.count)[:args.count]
+        else:
+            paths = _synthetic_files(directory, min(args.count, 100))
+            paths = (paths * args.count)[:args.count]
+
+        threads = 1
+        baseline = None
+        while threads <= args.threads:
+            rate = run(paths, threads)
+            baseline = baseline or rate
+            print('{:3d} threads: {:9.0f} files/s  x{:.2f}'.format(
+                threads, rate, rate / baseline))
+            threads *= 2
+
+
+if __name__ == '__main__':
+    main()
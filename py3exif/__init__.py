@@ -17,156 +17,249 @@ import logging
 from py3exif.constants.tags import EXIF_TAGS, GPS_TAGS
 from py3exif.constants.tags import INTR_TAGS, ENDIAN_FORMATS
 from py3exif.constants.field_types import FIELD_TYPES
-from py3exif.exceptions import UnsupportedFormat, NoExifData
-from py3exif.utils import make_string, mmapbytes
-from py3exif.objects import ExifHeader
+from py3exif.exceptions import UnsupportedFormat, NoExifData, LimitExceeded
+from py3exif.limits import ParseLimits, CancellationToken
+from py3exif.selection import TagSelection
+from py3exif.utils import make_string, open_reader, BufferReader, \
+    PrefixReader
+from py3exif.objects import ExifHeader, Segment, ProbeResult
 import sys
 
-print('sys version: %s' % sys.version)
 if int(sys.version[0]) < 2:
     raise SystemExit('please use python3')
 
 logger = logging.getLogger('py3exif')
 
-__all__ = ['process_file']
-
-
-def _get_offset_endian_tiff(f):
-    # # it's a TIFF file
-    f.seek(0)
-    endian = f.read(1)
-    f.read(1)
-    offset = 0
-    return offset, endian
-
-
-def _get_offset_endian_jpeg(f):
-    # # it's a JPEG file
-    logger.debug("JPEG format recognized data[0:2] == '0xFFD8'.")
-
-    # # Determine the "base" from which to start reading
-    f.seek(0)
-    data = bytearray(f.read(12))
-    base = 2
-    while data[2] == 0xFF and data[6:10] in ('JFIF', 'JFXX', 'OLYM', 'Phot'):
-        logger.debug("  data[2] == 0xFF data[3] == {:x} and data[6:10] = {}"
-                     "".format(data[3], data[6:10]))
-        length = (data[4] * 256) + data[5]
-        assert isinstance(length, int)
-        logger.debug("    Length offset is {:d}".format(length))
-        f.read(length - 8)
-        # # Fake an EXIF beginning of file
-        # # I don't think this is used. --gd
-        data = '\xFF\x00' + f.read(10)
-        # fake_exif = 1
-        if base > 2:
-            base += length + 2
-        else:
-            base = length + 4
-        logger.debug("    Set segment base to {}".format(base))
-
-    del data  # We're done with it!!
-
-    b = mmapbytes(f)
+__all__ = ['process_file', 'probe', 'has_exif', 'ParseLimits',
+           'CancellationToken', 'TagSelection']
+
+
+#: JPEG markers that are not followed by a length field
+_JPEG_STANDALONE_MARKERS = frozenset([0x01, 0xD8] + list(range(0xD0, 0xD8)))
+
+
+def _read_endian(reader, pos):
+    """Read the one-byte endian flag at ``pos``, as a native string"""
+    return reader.read_at(pos, 1).decode('latin-1')
+
+
+def _scan_jpeg_segments(reader):
+    """
+    Walk the JPEG markers from SOI up to SOS (or EOI), reading just the
+    marker and length of each segment.
+
+    :return: list of :py:class:`Segment` objects, in file order
+    """
+    segments = []
+    pos = 2
+
     while True:
-        logger.debug("Segment base 0x{:X}".format(base))
-        b.set_window(base)
-        b1 = b[1]
-        if b[0] == 0xFF:
-            if b1 == 0xE1:
-                if b[4:8] == "Exif":
-                    base -= 2
-                break
-            if b1 == 0xDB:
-                break
-        _base_increment = (b[2] * 256) + b[3] + 2
-        logger.debug("Increment base by {}".format(_base_increment))
-        base += _base_increment
-
-    # # Jump ahead after file headers
-    b.set_window(base)
-    _data_b2 = b[2]
-    _data_b6t10 = b[6:10]
-    _data_b6t11 = b[6:11]
-
-    if _data_b2 == 0xFF:
-
-        logger.debug("Exif header: {:x} {!r}".format(_data_b2, _data_b6t11))
-
-        if _data_b6t10 == 'Exif':
-            # # detected EXIF header
-            offset = f.tell()
-            endian = f.read(1)
-            return offset, endian
-            # HACK TEST:  endian = 'M'
-
-        elif _data_b6t11 == 'Ducky':
-            # # detected Ducky header.
-            logger.debug("EXIF-like header (normally 0xFF and code): "
-                         "{:x} and {!r}".format(_data_b2, _data_b6t11))
-            offset = f.tell()
-            endian = f.read(1)
-            return offset, endian
-
-        elif _data_b6t11 == 'Adobe':
-            # # detected APP14 (Adobe)
-            logger.debug("EXIF-like header (normally 0xFF and code): "
-                         "{:x} and {!r}".format(_data_b2, _data_b6t11))
-            offset = f.tell()
-            endian = f.read(1)
-            return offset, endian
-    else:
-        # # No EXIF information found -- error!!
-        logger.debug(
-            "No EXIF header found:\n"
-            "    Expected b[2]==0xFF and b[6:10]=='Exif'' (or 'Duck')\n"
-            "    Got: {:x} and {!r}".format(_data_b2, _data_b6t11))
-        raise NoExifData("No EXIF header found")
+        head = bytearray(reader.read_at(pos, 4))
+        if len(head) < 2 or head[0] != 0xFF:
+            logger.debug("No marker found at 0x{:X}, stop scanning"
+                         "".format(pos))
+            break
+
+        marker = head[1]
+        if marker == 0xFF:
+            # # Fill byte before the actual marker
+            pos += 1
+            continue
+
+        if marker in _JPEG_STANDALONE_MARKERS:
+            pos += 2
+            continue
+
+        if marker == 0xD9:
+            # # EOI, without any SOS: nothing more to look at
+            break
+
+        if len(head) < 4:
+            logger.debug("Truncated segment at 0x{:X}".format(pos))
+            break
+
+        length = (head[2] << 8) | head[3]
+        if length < 2:
+            logger.debug("Invalid segment length {:d} at 0x{:X}"
+                         "".format(length, pos))
+            break
+
+        segment = Segment(marker, pos + 4, length - 2)
+        logger.debug("Found {}".format(segment))
+        segments.append(segment)
+
+        if marker == 0xDA:
+            # # SOS: entropy-coded data follows, no more metadata
+            break
+
+        pos += 2 + length
+
+    return segments
+
+
+#: TIFF (and BigTIFF) headers, in both byte orders
+_TIFF_MAGIC = (b'II*\x00', b'MM\x00*', b'II+\x00', b'MM\x00+')
+
+#: Size of the read :py:func:`probe` answers from, in most cases
+PROBE_SIZE = 4096
 
+#: Size of the first read of a file by :py:func:`process_file`, meant to
+#: cover the EXIF information of most JPEG files (APP1 segments are up
+#: to 64 KiB)
+INITIAL_READ_SIZE = 64 * 1024
 
-def _get_offset_endian(f):
-    """Get offset and endian type from a TIFF or JPEG file"""
 
-    f.seek(0)
-    data = bytearray(f.read(12))
+def _find_exif(reader):
+    """
+    Detect the file format (TIFF or JPEG) and locate the EXIF
+    information in it, with the index of JPEG segments (empty for TIFF
+    files); returns a :py:class:`ProbeResult`.
+    """
+
+    data = reader.read_at(0, 4)
 
-    if data[0:4] in (b'II*\x00', 'MM\x00*'):
-        # # This is a TIFF file
-        return _get_offset_endian_tiff(f)
+    if data in _TIFF_MAGIC:
+        # # This is a TIFF (or BigTIFF) file
+        return ProbeResult('tiff', 0, _read_endian(reader, 0),
+                           reader.size, [])
 
     elif data[0:2] == b'\xff\xd8':
         # # This is a JPEG file
-        return _get_offset_endian_jpeg(f)
+        logger.debug("JPEG format recognized data[0:2] == '0xFFD8'.")
+
+        segments = _scan_jpeg_segments(reader)
+
+        for segment in segments:
+            if segment.marker != 0xE1 or segment.length < 8:
+                continue
+
+            if reader.read_at(segment.offset, 6) == b'Exif\x00\x00':
+                # # detected EXIF header; the TIFF structure follows
+                offset = segment.offset + 6
+                return ProbeResult('jpeg', offset,
+                                   _read_endian(reader, offset),
+                                   segment.length - 6, segments)
+
+        logger.debug("No APP1 Exif segment found among {:d} segments"
+                     "".format(len(segments)))
+        return ProbeResult('jpeg', None, None, 0, segments)
+
+    logger.debug('Unrecognised file format, starting with {!r}'
+                 ''.format(bytes(data)))
+    return ProbeResult(None, None, None, 0, [])
+
+
+def _get_offset_endian(reader):
+    """
+    Get offset and endian type from a TIFF or JPEG file, along
+    with the index of JPEG segments (empty for TIFF files), as a
+    :py:class:`ProbeResult`
+    """
+    result = _find_exif(reader)
+    if result.format is None:
+        raise UnsupportedFormat("Unrecognised file format")
+    if not result.has_exif:
+        # # No EXIF information found -- error!!
+        raise NoExifData("No EXIF header found")
+    return result
+
+
+def probe(file_obj, read_size=PROBE_SIZE):
+    """
+    Find out, cheaply, whether a file has EXIF information and where,
+    without raising on unsupported or EXIF-less files.
+
+    The file header (and JPEG segments up to the image data) is looked
+    for in a single read of its first ``read_size`` bytes, further reads
+    being made only when the segments extend past them.
 
-    logging.error('Data is: %s' % data)
-    logging.error("Should be: %s in  ('II*\x00', 'MM\x00*') or %s in '\xff\xd8'"\
-                  % (data[0:4], data[0:2]))
-    raise UnsupportedFormat("Unrecognised file format")
+    :param file_obj: as for :py:func:`process_file`
+    :return: a :py:class:`ProbeResult`, which can be passed on to
+        :py:func:`process_file` to skip finding the EXIF information again
+    """
+    reader = PrefixReader(open_reader(file_obj), read_size)
+    return _find_exif(reader)
+
+
+def has_exif(file_obj):
+    """Whether a file has EXIF information (see :py:func:`probe`)"""
+    return probe(file_obj).has_exif
 
 
-def process_file(file_obj, detailed=True, strict=False):
+def process_file(file_obj, detailed=True, strict=False, limits=None,
+                 deadline=None, cancel=None, probe_result=None,
+                 read_size=INITIAL_READ_SIZE, select=None):
     """
     Process an image file (expects an open file object)
     this is the function that has to deal with all the arbitrary nasty bits
     of the EXIF standard.
 
-    :param file_obj: File object from which to read
+    :param file_obj: File object from which to read (regular files are
+        read with ``os.pread()``, ``BytesIO`` objects without copying);
+        bytes-like data is also accepted
     :param detailed: Whether to add "detailed" tag information.
         Defaults to True.
     :param strict: Whether to run in "strict mode", raising
         more exceptions upon failure
+    :param limits: A :py:class:`ParseLimits` object, capping the resources
+        spent decoding the file; :py:class:`LimitExceeded` is raised when
+        one of them is crossed. Use this with untrusted input.
+    :param deadline: A ``time.monotonic()`` value after which tags
+        extraction stops, keeping the tags decoded so far and flagging
+        the header as ``incomplete``.
+    :param cancel: A :py:class:`CancellationToken`, to stop tags
+        extraction from another thread (with the same outcome as an
+        expired deadline).
+    :param probe_result: The :py:class:`ProbeResult` of a previous
+        :py:func:`probe` of the file, to start from.
+    :param read_size: Size of the first read of the file, which finding
+        and decoding the EXIF information is served from (with a single
+        follow-up read, if a JPEG EXIF segment extends past it); ``0``
+        for reads of the sizes needed only.
+    :param select: The tags to decode: a :py:class:`TagSelection`, or
+        names, shell-style patterns (eg. ``'GPS*'``) and presets names
+        (see :py:data:`py3exif.selection.PRESETS`). The IFDs and entries
+        not selected are skipped (though the tags the selected ones
+        depend on, like IFD pointers, are decoded) and left out.
     :return: An ExifHeader object (dict-like) containing the extracted
-        EXIF tags (or, extracting them on-the-fly).
+        EXIF tags (or, extracting them on-the-fly). For JPEG files, its
+        ``segments`` attribute indexes all the marker segments found
+        before the image data.
     """
 
-    offset, endian = _get_offset_endian(file_obj)
+    reader = open_reader(file_obj)
+    if read_size and not isinstance(reader, (BufferReader, PrefixReader)):
+        # # Many small reads cost more than a larger one, on cold caches
+        # # and remote storage
+        reader = PrefixReader(reader, read_size)
+
+    if probe_result is None or not probe_result.has_exif:
+        probe_result = _get_offset_endian(reader)
+    offset = probe_result.offset
+    endian = probe_result.endian
+    segments = probe_result.segments
+
+    if isinstance(reader, PrefixReader) and probe_result.format == 'jpeg':
+        # # The rest of the EXIF segment, if it extends past the first read
+        reader.extend(offset + probe_result.length)
 
     logger.debug("File endian format is {} ({})"
                  "".format(endian, ENDIAN_FORMATS.get(endian, 'unknown')))
 
+    if select is not None and not isinstance(select, TagSelection):
+        if isinstance(select, str):
+            select = [select]
+        select = TagSelection.from_names(select)
+
     return ExifHeader(
         file_obj,
         endian=endian,
         offset=offset,
+        segments=segments,
         strict=strict,
-        detailed=detailed)
+        detailed=detailed,
+        limits=limits,
+        deadline=deadline,
+        cancel=cancel,
+        reader=reader,
+        selection=select)
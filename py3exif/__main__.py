@@ -1,13 +1,95 @@
 # # py3exif.__main__
 
+import os
 import sys
+import json
 import optparse
 import logging
+import functools
 from py3exif import version
 
-from . import process_file, FIELD_TYPES
-import traceback
-from py3exif.exceptions import py3exifGoodException
+from py3exif import exceptions
+from py3exif.batch import scan_paths, iter_image_files, printable_values, \
+    typed_values, DEFAULT_EXTENSIONS, ARCHIVE_EXTENSIONS
+from py3exif.objects import THUMBNAIL_TAGS
+from py3exif.export import CSVWriter, json_record
+from py3exif.selection import TagSelection, PRESETS
+
+
+def _iter_paths(args, recursive, extensions):
+    """
+    The files to process: the arguments, with the image files in the
+    directories among them (see :py:func:`iter_image_files`) when
+    ``recursive``. Other directories fail like unreadable files.
+    """
+    for arg in args:
+        if recursive and os.path.isdir(arg):
+            for path in iter_image_files(arg, extensions=extensions):
+                yield path
+        else:
+            yield arg
+
+
+class HumanWriter(object):
+    """Human-readable output, from ``printable_values()``"""
+
+    def __init__(self, out, colors=False):
+        self._out = out
+        if colors:
+            self._message_format = \
+                "  \x1b[1;36m{}\x1b[0m \x1b[0;36m({})\x1b[0m" \
+                " = \x1b[1;32m{}\x1b[0m\n"
+            self._filename_format = '\x1b[1m{}\x1b[0m\n'
+        else:
+            self._message_format = "  {} ({}) = {}\n"
+            self._filename_format = '{}\n'
+
+    def write_result(self, result):
+        lines = [self._filename_format.format(result.path)]
+        if result.error:
+            # # No traceback here (see --debug), just a summary
+            lines.append("  Error: {}\n".format(result.error))
+
+        for key, (field_type, printable) in sorted(result.tags.items()):
+            if printable is None:
+                printable = '<binary-object>'
+            else:
+                printable = repr(printable)
+            lines.append(self._message_format.format(
+                key, field_type, printable))
+
+        lines.append("\n")
+        self._out.write(''.join(lines))
+        self._out.flush()
+
+    def close(self):
+        pass
+
+
+class NDJSONWriter(object):
+    """
+    One JSON object per file and line: ``{"path": ..., "error": ...,
+    "tags": {...}}``, with the thumbnails (if any) encoded in base64.
+    """
+
+    def __init__(self, out):
+        self._out = out
+
+    def write_result(self, result):
+        record = json_record(result)
+        self._out.write(json.dumps(record, sort_keys=True) + '\n')
+        self._out.flush()
+
+    def close(self):
+        pass
+
+
+def _is_good_error(error):
+    """Whether a ``FileResult`` error is a :py:class:`py3exifGoodException`"""
+    name = error.partition(':')[0]
+    exc_class = getattr(exceptions, name, None)
+    return isinstance(exc_class, type) and \
+        issubclass(exc_class, exceptions.py3exifGoodException)
 
 
 def main():
@@ -22,6 +104,10 @@ def main():
     option_parser.add_option(
         '-q', '--quick', action='store_true', dest='quick', default=False,
         help='Do not process MakerNotes')
+    option_parser.add_option(
+        '-p', '--preset', action='store', dest='preset', default=None,
+        help='Only decode a preset selection of tags: {} (default: all '
+             'the tags, as with full).'.format(', '.join(sorted(PRESETS))))
     # option_parser.add_option(
     #     '-t', '--stop-tag', action='store', dest='stop_tag', metavar='TAG',
     #     help='Stop processing when this tag is retrieved')
@@ -34,10 +120,43 @@ def main():
     option_parser.add_option(
         '--exc-report', action='store_true', dest='exc_report', default=False,
         help='Print report of exceptions after execution.')
+    option_parser.add_option(
+        '-r', '--recursive', action='store_true', dest='recursive',
+        default=False,
+        help='Process the image files found in directories, recursively')
+    option_parser.add_option(
+        '-e', '--extensions', action='store', dest='extensions',
+        default=','.join(DEFAULT_EXTENSIONS),
+        help='Comma-separated extensions of the image files to process in '
+             'directories (default: %default).')
+    option_parser.add_option(
+        '-a', '--archives', action='store_true', dest='archives',
+        default=False,
+        help='Process the image files in the ZIP and TAR archives among '
+             'the files (and in directories, with -r), without extracting '
+             'them.')
+    option_parser.add_option(
+        '-j', '--jobs', action='store', type='int', dest='jobs', default=1,
+        help='Number of worker processes (0 for one per CPU; default: 1)')
+    option_parser.add_option(
+        '--unordered', action='store_true', dest='unordered', default=False,
+        help='Output files as soon as they are processed, rather than in '
+             'the order they were found in (with --jobs).')
     option_parser.add_option(
         '-f', '--format', action='store', dest='format', default='human',
         help='Specify the desired output format. Allowed values are: '
-             'human (the default), json, csv.')
+             'human (the default), json (one object per line), csv.')
+    option_parser.add_option(
+        '--tags', action='store', dest='tags', default=None,
+        help='Comma-separated tags to decode (and output as columns, '
+             'with the csv format), by name or shell-style pattern, eg. '
+             '\'Image Orientation,GPS*\'; preset names are accepted too. '
+             'By default, all the tags (or the preset ones).')
+    option_parser.add_option(
+        '--thumbnails', action='store_true', dest='thumbnails',
+        default=False,
+        help='Include the thumbnails (base64-encoded), with the json '
+             'format.')
     option_parser.add_option(
         '--color', action='store', dest='color', default='auto',
         help='Whether to colorize human-readable output. Allowed values are: '
@@ -61,6 +180,19 @@ def main():
     detailed = not opts.quick
     strict = opts.strict
 
+    # # The tags to decode, only those are extracted
+    names = []
+    if opts.preset:
+        if opts.preset not in PRESETS:
+            option_parser.error('Unknown preset: {}'.format(opts.preset))
+        names.append(opts.preset)
+    if opts.tags:
+        names.extend(name.strip() for name in opts.tags.split(',')
+                     if name.strip())
+    select = TagSelection.from_names(names) if names else None
+    if select is not None and opts.thumbnails:
+        select = TagSelection(select.patterns + THUMBNAIL_TAGS)
+
     if opts.color == 'auto':
         use_colors_stdout = sys.stdout.isatty()
         use_colors_stderr = sys.stderr.isatty()
@@ -69,83 +201,61 @@ def main():
         use_colors_stdout = opts.color == 'always'
         use_colors_stderr = opts.color == 'always'
 
-    # # Output info for each file
+    # # Output info for each file, with a single buffered writer
+    out = sys.stdout
     if opts.format == 'human':
+        writer = HumanWriter(out, colors=use_colors_stdout)
+        values = printable_values
 
-        if use_colors_stdout:
-            message_format = \
-                "  \x1b[1;36m{}\x1b[0m \x1b[0;36m({})\x1b[0m" \
-                " = \x1b[1;32m{}\x1b[0m"
-            filename_format = '\x1b[1m{}\x1b[0m'
-        else:
-            message_format = "  {} ({}) = {}"
-            filename_format = '{}'
-
-        failures = []
-
-        for filename in args:
-            print(filename_format.format(filename))
-
-            try:
-                fileobj = open(str(filename), 'rb')
-            except IOError:
-                print("  Unreadable file. Skipping.")
-                continue
-
-            try:
-                data = process_file(
-                    fileobj,
-                    detailed=detailed,
-                    strict=strict)
-
-                for key, value in sorted(data.iteritems()):
-
-                    if key in ('JPEGThumbnail', 'TIFFThumbnail'):
-                        printable = '<binary-object>'
-                        field_type = 'blob'
+    elif opts.format == 'json':
+        writer = NDJSONWriter(out)
+        values = functools.partial(typed_values, thumbnails=opts.thumbnails)
 
-                    else:
-                        printable = repr(value.printable)
+    elif opts.format == 'csv':
+        columns = None
+        if select is not None and select.exact_names:
+            columns = list(select.patterns)
+        writer = CSVWriter(out, columns)
+        values = typed_values
 
-                        try:
-                            field_type = FIELD_TYPES[value.field_type][2]
-                        except IndexError:
-                            field_type = 'unknown'
+    else:
+        option_parser.error('Unsupported format: {}'.format(opts.format))
 
-                    print(message_format.format(key, field_type, printable))
+    failures = []
 
-            except Exception as e:
-                if opts.exc_report:
-                    failures.append((filename, e))
-                traceback.print_exc()
+    extensions = [ext.strip() for ext in opts.extensions.split(',')
+                  if ext.strip()]
+    found_extensions = extensions
+    if opts.archives:
+        found_extensions = extensions + list(ARCHIVE_EXTENSIONS)
+    paths = _iter_paths(args, opts.recursive, found_extensions)
+    # # Plain files and archive members all go through the same workers
+    results = scan_paths(
+        paths, jobs=opts.jobs, ordered=not opts.unordered, values=values,
+        archives=opts.archives, extensions=extensions, detailed=detailed,
+        strict=strict, select=select)
 
-            finally:
-                fileobj.close()
+    for result in results:
+        writer.write_result(result)
+        if opts.exc_report and result.error:
+            # # Only kept for the summary
+            failures.append((result.path, result.error))
+    writer.close()
 
-            print("")
+    if opts.exc_report and failures:
+        sys.stderr.write("\n\nFailures Summary:\n")
+        if use_colors_stderr:
+            _fmtBad = "    \x1b[1m{} \x1b[1;31m{!r}\x1b[0m\n"
+            _fmtGood = "    \x1b[1m{} \x1b[1;32m{!r}\x1b[0m\n"
+        else:
+            _fmtBad = "    !!! {} {!r}\n"
+            _fmtGood = "        {} {!r}\n"
 
-        if opts.exc_report and failures:
-            print("\n\nFailures Summary:")
-            if use_colors_stderr:
-                _fmtBad = "    \x1b[1m{} \x1b[1;31m{!r}\x1b[0m\n"
-                _fmtGood = "    \x1b[1m{} \x1b[1;32m{!r}\x1b[0m\n"
+        for filename, error in failures:
+            if _is_good_error(error):
+                sys.stderr.write(_fmtGood.format(filename, error))
             else:
-                _fmtBad = "    !!! {} {!r}\n"
-                _fmtGood = "        {} {!r}\n"
-
-            for filename, exc in failures:
-                if isinstance(exc, py3exifGoodException):
-                    sys.stderr.write(_fmtGood.format(filename, exc))
-                else:
-                    sys.stderr.write(_fmtBad.format(filename, exc))
-
-    elif opts.format == 'json':
-        # # We have some issues with this.. need work on the library
-        raise NotImplementedError('JSON output not implemented yet')
-
-    elif opts.format == 'csv':
-        # # We have some issues with this.. need work on the library
-        raise NotImplementedError('CSV output not implemented yet')
+                sys.stderr.write(_fmtBad.format(filename, error))
 
 
 if __name__ == '__main__':
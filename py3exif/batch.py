@@ -0,0 +1,432 @@
+"""
+py3exif Batch processing of many files
+"""
+
+import os
+import queue
+import logging
+import tarfile
+import zipfile
+import contextlib
+import collections
+import multiprocessing
+import multiprocessing.pool
+
+from py3exif.objects import THUMBNAIL_TAGS
+from py3exif.constants.field_types import FIELD_TYPES
+from py3exif.utils import FDReader, SeekReader
+
+logger = logging.getLogger('py3exif')
+
+__all__ = ['FileResult', 'iter_image_files', 'scan_paths', 'open_bulk',
+           'scan_archive', 'is_archive', 'DEFAULT_EXTENSIONS',
+           'ARCHIVE_EXTENSIONS']
+
+#: File extensions that may contain EXIF data
+DEFAULT_EXTENSIONS = ('.jpg', '.jpeg', '.jpe', '.tif', '.tiff', '.nef',
+                      '.cr2', '.dng', '.orf', '.pef', '.arw')
+
+#: File extensions of the archives :py:func:`scan_archive` looks into
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2',
+                      '.tbz2', '.tar.xz', '.txz')
+
+#: Tags holding binary blobs, left out of the results
+BLOB_TAGS = THUMBNAIL_TAGS
+
+
+class FileResult(collections.namedtuple('FileResult', 'path tags error')):
+    """
+    Outcome of processing one file: ``tags`` maps tag names to their
+    values (by default, their typed values, see ``ExifHeader.typed()``),
+    ``error`` describes the failure, if any, as
+    ``'ExceptionName: message'``.
+    """
+    __slots__ = ()
+
+
+def typed_values(header, thumbnails=False):
+    """
+    Return a dict of the typed value of each tag of an ``ExifHeader``
+    (see ``ExifHeader.typed()``), leaving out the thumbnails unless
+    ``thumbnails`` (their values are then the image data).
+    """
+    values = header.typed()
+    if thumbnails:
+        for name in THUMBNAIL_TAGS:
+            if name in header:
+                values[name] = header.tags[name]
+    return values
+
+
+def printable_values(header):
+    """
+    Return a dict of ``(field type name, printable value)`` for each tag
+    of an ``ExifHeader``, as shown by the command line tool (thumbnails
+    are ``('blob', None)``).
+    """
+    values = dict((name, ('blob', None)) for name in THUMBNAIL_TAGS
+                  if name in header)
+    for name, printable in header.printable_values().items():
+        field_type = FIELD_TYPES.get(header.tags[name].field_type)
+        values[name] = (field_type[2] if field_type else 'unknown',
+                        printable)
+    return values
+
+
+def iter_image_files(top, recursive=True, extensions=DEFAULT_EXTENSIONS):
+    """
+    Yield the paths of the files under ``top`` whose extension is one of
+    ``extensions`` (case insensitive; ``None`` to accept any file).
+    """
+    if extensions is not None:
+        extensions = tuple(ext.lower() for ext in extensions)
+
+    stack = [top]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError as e:
+            logger.debug('Cannot list {}: {}'.format(directory, e))
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    subdirs.append(entry.path)
+            elif extensions is None or \
+                    entry.name.lower().endswith(extensions):
+                yield entry.path
+
+        # # Depth-first, keeping the directories in name order
+        stack.extend(reversed(subdirs))
+
+
+def _advise(fd, offset, length, advice):
+    """``posix_fadvise()``, where available; it is only a hint"""
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, offset, length, advice)
+        except OSError as e:
+            logger.debug('posix_fadvise() failed: {}'.format(e))
+
+
+@contextlib.contextmanager
+def open_bulk(path, header_size):
+    """
+    Open a file for a metadata-only scan, keeping it out of the page cache
+    as far as possible: without updating its access time (``O_NOATIME``,
+    if permitted, ie. for the owner of the file), telling the kernel its
+    first ``header_size`` bytes are about to be read and, once done, that
+    it is not needed any more.
+
+    :return: a reader (see :py:func:`py3exif.utils.open_reader`), reading
+        with ``os.pread()`` (unbuffered) with explicit sizes
+    """
+    flags = os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0)
+    noatime = getattr(os, 'O_NOATIME', 0)
+    try:
+        fd = os.open(path, flags | noatime)
+    except PermissionError:
+        if not noatime:
+            raise
+        fd = os.open(path, flags)
+
+    try:
+        _advise(fd, 0, header_size, getattr(os, 'POSIX_FADV_WILLNEED', 0))
+        reader = FDReader(fd)
+        try:
+            yield reader
+        finally:
+            reader.close()
+            _advise(fd, 0, 0, getattr(os, 'POSIX_FADV_DONTNEED', 0))
+    finally:
+        os.close(fd)
+
+
+def _scan_path(task):
+    """Process a single file (runs in the worker processes)"""
+    from py3exif import process_file, INITIAL_READ_SIZE
+
+    path, bulk, values, options = task
+    try:
+        if bulk:
+            header_size = options.get('read_size') or INITIAL_READ_SIZE
+            fileobj = open_bulk(path, header_size)
+        else:
+            fileobj = open(path, 'rb')
+        with fileobj as fileobj:
+            header = process_file(fileobj, **options)
+            return FileResult(path, values(header), None)
+    except Exception as e:
+        logger.debug('Failed to process {}'.format(path), exc_info=True)
+        return FileResult(path, {}, '{}: {}'.format(type(e).__name__, e))
+
+
+def _imap_bounded(pool, func, iterable, window):
+    """
+    Like ``pool.imap()``, but never more than ``window`` tasks are
+    submitted ahead of the consumer, so memory stays flat.
+    """
+    pending = collections.deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def _imap_bounded_unordered(pool, func, iterable, window):
+    """
+    Like :py:func:`_imap_bounded`, but yielding the results as soon as
+    they are ready.
+    """
+    done = queue.Queue()
+    pending = 0
+    for item in iterable:
+        pool.apply_async(func, (item,), callback=done.put,
+                         error_callback=done.put)
+        pending += 1
+        if pending >= window:
+            pending -= 1
+            yield _checked(done.get())
+    while pending:
+        pending -= 1
+        yield _checked(done.get())
+
+
+def _checked(result):
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+def _run_task(task):
+    """Run a ``(function, argument)`` task (in the worker processes)"""
+    func, arg = task
+    return func(arg)
+
+
+def _done(result):
+    """The task of a result known beforehand"""
+    return result
+
+
+def scan_paths(paths, jobs=None, threads=False, bulk=False, ordered=True,
+               values=typed_values, archives=False,
+               extensions=DEFAULT_EXTENSIONS, **options):
+    """
+    Process many files, yielding a :py:class:`FileResult` for each of
+    them, in order (unless ``ordered`` is false: then as soon as they are
+    ready).
+
+    :param paths: iterable of file paths
+    :param jobs: number of worker processes; ``None`` or ``1`` to
+        process the files in the current process, ``0`` for one per CPU.
+    :param threads: use worker threads instead of processes (which
+        scales on free-threaded Python builds)
+    :param bulk: open the files with :py:func:`open_bulk`, to scan large
+        archives without filling the page cache nor updating access times
+    :param values: function returning the values of the results from an
+        ``ExifHeader`` (:py:func:`typed_values`, or
+        :py:func:`printable_values`); it must be picklable, for worker
+        processes
+    :param archives: process the image files in the archives among
+        ``paths`` (see :py:func:`scan_archive`) instead of the archives
+        themselves. With worker processes, the archives are read in this
+        one, handing the start of each member over to the workers.
+    :param extensions: with ``archives``, as for :py:func:`scan_archive`
+    :param options: passed on to :py:func:`py3exif.process_file`
+        (eg. ``detailed``, ``strict``, ``limits``).
+    """
+    in_process = jobs is None or jobs == 1
+    tasks = _path_tasks(paths, bulk, values, options,
+                        extensions if archives else None, not in_process)
+
+    if in_process:
+        for task in tasks:
+            yield _run_task(task)
+        return
+
+    if threads:
+        pool = multiprocessing.pool.ThreadPool(jobs or None)
+    else:
+        pool = multiprocessing.Pool(jobs or None)
+    try:
+        window = 4 * (jobs or multiprocessing.cpu_count())
+        imap = _imap_bounded if ordered else _imap_bounded_unordered
+        for result in imap(pool, _run_task, tasks, window):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _path_tasks(paths, bulk, values, options, extensions, read):
+    """
+    The tasks processing ``paths``, and the members of the archives
+    among them unless ``extensions`` is ``None``
+    """
+    for path in paths:
+        if extensions is not None and is_archive(path):
+            for task in _archive_tasks(path, extensions, path, values,
+                                       options, read):
+                yield task
+        else:
+            yield _scan_path, (path, bulk, values, options)
+
+
+def is_archive(path):
+    """Whether ``path`` names a ZIP or TAR archive, by its extension"""
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _read_head(fileobj, read_size):
+    """
+    Read the start of a stream, as far as needed for its EXIF information:
+    its first ``read_size`` bytes, the rest of the JPEG EXIF segment if it
+    extends past them, or else the whole of TIFF files (whose IFDs may be
+    anywhere) and of JPEG files whose EXIF segment is further in.
+    """
+    from py3exif import probe
+
+    data = fileobj.read(read_size)
+    found = probe(data)
+    if found.format == 'jpeg' and found.has_exif:
+        end = found.offset + found.length
+        if end > len(data):
+            data += fileobj.read(end - len(data))
+    elif found.format is not None and len(data) == read_size:
+        data += fileobj.read()
+    return data
+
+
+def _iter_members(archive):
+    """
+    Yield ``(name, fileobj, size, seekable)`` for each regular file in a
+    ZIP or TAR archive (a path or a file object), ``fileobj`` being open
+    until the next one is yielded.
+    """
+    if isinstance(archive, (str, bytes, os.PathLike)):
+        seekable = True
+        is_zip = zipfile.is_zipfile(archive)
+        tar_args = {'name': archive}
+    else:
+        seekable = archive.seekable()
+        is_zip = seekable and zipfile.is_zipfile(archive)
+        tar_args = {'fileobj': archive}
+        if seekable:
+            archive.seek(0)
+
+    if is_zip:
+        # # Members are seekable (decompressing up to the positions read)
+        with zipfile.ZipFile(archive) as zip_file:
+            for info in zip_file.infolist():
+                if info.is_dir():
+                    continue
+                with zip_file.open(info) as member:
+                    yield info.filename, member, info.file_size, True
+        return
+
+    # # Random access where possible, or else a single pass over the
+    # # stream (eg. a pipe)
+    mode = 'r:*' if seekable else 'r|*'
+    with tarfile.open(mode=mode, **tar_args) as tar_file:
+        for info in tar_file:
+            if not info.isfile():
+                continue
+            with tar_file.extractfile(info) as member:
+                yield info.name, member, info.size, seekable
+
+
+def _member_source(fileobj, size, seekable, read, options):
+    """
+    What to process an archive member from: the member itself, or the
+    start of it (see :py:func:`_read_head`) when not seekable or when
+    ``read``
+    """
+    from py3exif import INITIAL_READ_SIZE
+
+    if seekable and not read:
+        # # Only what process_file() reads is decompressed, mostly
+        # # its first read
+        return SeekReader(fileobj, size)
+    read_size = options.get('read_size') or INITIAL_READ_SIZE
+    return _read_head(fileobj, read_size)
+
+
+def _scan_source(task):
+    """Process a single archive member (runs in the worker processes)"""
+    from py3exif import process_file
+
+    name, source, values, options = task
+    try:
+        header = process_file(source, **options)
+        return FileResult(name, values(header), None)
+    except Exception as e:
+        logger.debug('Failed to process {}'.format(name), exc_info=True)
+        return FileResult(name, {}, '{}: {}'.format(type(e).__name__, e))
+
+
+def _archive_tasks(archive, extensions, name, values, options, read):
+    """
+    The tasks processing the members of an archive (see
+    :py:func:`scan_archive`). Unless ``read``, each of them must be run
+    before the next one is taken, while its member is open.
+    """
+    if extensions is not None:
+        extensions = tuple(ext.lower() for ext in extensions)
+
+    try:
+        for member_name, fileobj, size, seekable in _iter_members(archive):
+            if extensions is not None and \
+                    not member_name.lower().endswith(extensions):
+                continue
+            member_name = os.path.join(name, member_name)
+            try:
+                source = _member_source(fileobj, size, seekable, read,
+                                        options)
+            except Exception as e:
+                logger.debug('Failed to read {}'.format(member_name),
+                             exc_info=True)
+                error = '{}: {}'.format(type(e).__name__, e)
+                yield _done, FileResult(member_name, {}, error)
+                continue
+            yield _scan_source, (member_name, source, values, options)
+    except (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError) as e:
+        logger.debug('Failed to read {}'.format(name), exc_info=True)
+        error = '{}: {}'.format(type(e).__name__, e)
+        yield _done, FileResult(name, {}, error)
+
+
+def scan_archive(archive, extensions=DEFAULT_EXTENSIONS, name=None,
+                 values=typed_values, **options):
+    """
+    Process the image files in a ZIP or TAR archive (possibly compressed)
+    without extracting it, yielding a :py:class:`FileResult` for each of
+    them, in archive order.
+
+    Only the start of each member is read (and decompressed), as with
+    :py:func:`py3exif.process_file` on a file, when the archive allows
+    random access; TAR archives that are streamed (from a pipe, say) are
+    read in a single pass, keeping the start of each member in memory.
+
+    :param archive: path or file object of the archive (ZIP archives
+        must be seekable)
+    :param extensions: as for :py:func:`iter_image_files`, matched
+        against the member names
+    :param name: the archive name, which the result paths are the member
+        names under (the archive path by default)
+    :param values: as for :py:func:`scan_paths`
+    :param options: passed on to :py:func:`py3exif.process_file`
+    :return: the results of the members, followed by one for the archive
+        itself if it could not be read (entirely)
+    """
+    if name is None:
+        name = archive if isinstance(archive, str) else ''
+
+    for task in _archive_tasks(archive, extensions, name, values, options,
+                               read=False):
+        yield _run_task(task)
@@ -2,10 +2,13 @@
 Definition of field types
 """
 
+from py3exif.utils import ASCII_CODEC
+
 __all__ = ['FIELD_TYPES',
            'FT_PROPRIETARY', 'FT_BYTE', 'FT_ASCII', 'FT_LONG', 'FT_RATIO',
            'FT_SHORT', 'FT_SIGNED_BYTE', 'FT_SIGNED_LONG', 'FT_SIGNED_RATIO',
-           'FT_SIGNED_SHORT', 'FT_UNDEFINED']
+           'FT_SIGNED_SHORT', 'FT_UNDEFINED', 'FT_LONG8', 'FT_SIGNED_LONG8',
+           'FT_IFD', 'FT_IFD8']
 
 
 FT_PROPRIETARY = 0
@@ -19,14 +22,29 @@ FT_UNDEFINED = 7
 FT_SIGNED_SHORT = 8
 FT_SIGNED_LONG = 9
 FT_SIGNED_RATIO = 10
+FT_IFD = 13
+
+# # BigTIFF additions
+FT_LONG8 = 16
+FT_SIGNED_LONG8 = 17
+FT_IFD8 = 18
 
 
 def _dummy(x):
     return x
 
 
+def _ascii(x):
+    if isinstance(x, bytes):
+        # # As printable values are, see utils.make_string()
+        return x.decode(ASCII_CODEC)
+    return x
+
+
 def _ratio(x):
     from py3exif.objects import Ratio
+    if isinstance(x, Ratio):
+        return x
     return Ratio(x)
 
 
@@ -34,7 +52,7 @@ FIELD_TYPES = {
     # (typelen, ?, description, decoder)
     FT_PROPRIETARY: (0, 'X', 'Proprietary', _dummy),  # no such type
     FT_BYTE: (1, 'B', 'Byte', _dummy),
-    FT_ASCII: (1, 'A', 'ASCII', _dummy),
+    FT_ASCII: (1, 'A', 'ASCII', _ascii),
     FT_SHORT: (2, 'S', 'Short', int),
     FT_LONG: (4, 'L', 'Long', int),
     FT_RATIO: (8, 'R', 'Ratio', _ratio),
@@ -43,4 +61,8 @@ FIELD_TYPES = {
     FT_SIGNED_SHORT: (2, 'SS', 'Signed Short', int),
     FT_SIGNED_LONG: (4, 'SL', 'Signed Long', int),
     FT_SIGNED_RATIO: (8, 'SR', 'Signed Ratio', _ratio),
+    FT_IFD: (4, 'IFD', 'IFD', int),
+    FT_LONG8: (8, 'L8', 'Long8', int),
+    FT_SIGNED_LONG8: (8, 'SL8', 'Signed Long8', int),
+    FT_IFD8: (8, 'IFD8', 'IFD8', int),
 }
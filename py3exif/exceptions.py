@@ -31,3 +31,19 @@ class py3exifBadException(Exception):
     indicate there is a problem with the parser somewhere..
     """
     pass
+
+
+class LimitExceeded(py3exifGoodException):
+    """
+    Decoding the file would exceed one of the configured
+    :py:class:`py3exif.limits.ParseLimits`
+    """
+    pass
+
+
+class ParseInterrupted(py3exifGoodException):
+    """
+    Decoding was stopped because its deadline passed or it was
+    cancelled; the tags decoded so far are kept.
+    """
+    pass
@@ -0,0 +1,425 @@
+"""
+py3exif Columnar export of the tags of many files
+
+Results are grouped in batches of rows, turned into columns (one per
+tag, plus the file path and error) and streamed to CSV, to Arrow IPC
+(if ``pyarrow`` is available) or to a stream of pickled batches.
+"""
+
+import io
+import csv
+import base64
+import pickle
+import logging
+import warnings
+import fractions
+
+from py3exif.objects import Ratio, THUMBNAIL_TAGS
+from py3exif.batch import scan_paths, iter_image_files
+
+try:
+    import pyarrow
+except ImportError:  # Optional dependency
+    pyarrow = None
+
+logger = logging.getLogger('py3exif')
+
+__all__ = ['Batch', 'iter_batches', 'CSVWriter', 'ArrowWriter',
+           'PickleWriter', 'read_pickle_batches', 'export_files',
+           'export_directory', 'json_record', 'EXPORT_FORMATS']
+
+#: Columns always present, before the tag ones
+BASE_COLUMNS = ('path', 'error')
+
+
+class Batch(object):
+    """
+    A batch of rows in columnar form: ``data`` maps each of
+    ``columns`` to a list of ``size`` values (``None`` when missing).
+    """
+
+    def __init__(self, columns, data, size):
+        self.columns = columns
+        self.data = data
+        self.size = size
+
+    def __repr__(self):
+        return '<Batch {:d} rows x {:d} columns>'.format(
+            self.size, len(self.columns))
+
+    def rows(self):
+        """Iterate over the rows of the batch, as lists of values"""
+        columns = [self.data[name] for name in self.columns]
+        for i in range(self.size):
+            yield [column[i] for column in columns]
+
+
+def iter_batches(results, columns=None, batch_size=1000, per_batch=False):
+    """
+    Group :py:class:`FileResult` objects in :py:class:`Batch` objects.
+
+    :param columns: the tag columns; if not specified, they are those
+        found in the first batch, sorted by name. Tags not in the columns
+        are left out (with a warning, for those first found in a later
+        batch).
+    :param per_batch: if ``columns`` are not specified, use the tags
+        found in each batch as its columns, so that none is left out
+    """
+    # # The columns found in the first batch, if not specified
+    found = None
+    dropped = set()
+    for chunk in _chunks(results, batch_size):
+        if columns is not None:
+            batch_columns = columns
+            if found is not None:
+                _warn_dropped(chunk, columns, dropped)
+        else:
+            batch_columns = _find_columns(chunk)
+            if not per_batch:
+                columns = found = batch_columns
+        yield _make_batch(chunk, batch_columns)
+
+
+def _chunks(results, size):
+    chunk = []
+    for result in results:
+        chunk.append(result)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _find_columns(results):
+    names = set()
+    for result in results:
+        names.update(result.tags)
+    return sorted(names)
+
+
+def _warn_dropped(results, columns, dropped):
+    """Warn about the tags left out of the columns, once per tag"""
+    names = set(_find_columns(results)).difference(columns, dropped)
+    if names:
+        dropped.update(names)
+        warnings.warn('Tags not in the columns of the first batch, left '
+                      'out: {}'.format(', '.join(sorted(names))))
+
+
+def _make_batch(results, columns):
+    all_columns = list(BASE_COLUMNS) + list(columns)
+    data = dict((name, []) for name in all_columns)
+    for result in results:
+        data['path'].append(result.path)
+        data['error'].append(result.error)
+        for name in columns:
+            data[name].append(result.tags.get(name))
+    return Batch(all_columns, data, len(results))
+
+
+def _format_cell(value):
+    """Render a typed value for a text (CSV) cell"""
+    if value is None:
+        return ''
+    if isinstance(value, Ratio):
+        return '{}/{}'.format(value.num, value.den)
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).hex()
+    if isinstance(value, (list, tuple)):
+        return ', '.join(_format_cell(x) for x in value)
+    if isinstance(value, dict):
+        # # Structured records (eg. Canon settings)
+        return ', '.join('{}: {}'.format(k, _format_cell(v))
+                         for k, v in value.items())
+    return str(value)
+
+
+class CSVWriter(object):
+    """
+    Writes batches, or single results, as CSV rows, to a text file object
+
+    :param columns: the tag columns of the rows written with
+        :py:meth:`write_result` (by default, the tags of the first
+        successful one: failed results are held back until it comes, or
+        until :py:meth:`close`)
+    """
+
+    #: Whether each batch may have columns of its own
+    per_batch_columns = False
+
+    def __init__(self, fileobj, columns=None):
+        self._writer = csv.writer(fileobj)
+        self._fileobj = fileobj
+        self._tag_columns = columns
+        self._columns = None
+        # # Failed results written before the columns were known
+        self._held = []
+
+    def write_batch(self, batch):
+        if self._columns is None:
+            self._columns = batch.columns
+            self._writer.writerow(batch.columns)
+        for row in batch.rows():
+            self._writer.writerow([_format_cell(x) for x in row])
+        self._fileobj.flush()
+
+    def write_result(self, result):
+        """Write the row of a :py:class:`FileResult`, as soon as it comes"""
+        if self._columns is None:
+            if self._tag_columns is None:
+                if result.error:
+                    self._held.append(result)
+                    return
+                self._tag_columns = sorted(result.tags)
+            self._write_header()
+        self._write_row(result)
+        self._fileobj.flush()
+
+    def _write_header(self):
+        self._columns = list(BASE_COLUMNS) + list(self._tag_columns or ())
+        self._writer.writerow(self._columns)
+        held, self._held = self._held, []
+        for result in held:
+            self._write_row(result)
+
+    def _write_row(self, result):
+        row = [result.path, result.error] + [
+            result.tags.get(name)
+            for name in self._columns[len(BASE_COLUMNS):]]
+        self._writer.writerow([_format_cell(x) for x in row])
+
+    def close(self):
+        if self._held:
+            # # Only failures: no tag columns
+            self._write_header()
+            self._fileobj.flush()
+
+
+def _arrow_value(value):
+    """Convert a typed value to something pyarrow can store"""
+    if isinstance(value, Ratio):
+        try:
+            return float(value)
+        except ZeroDivisionError:
+            return None
+    if isinstance(value, (list, tuple)):
+        return [_arrow_value(x) for x in value]
+    if isinstance(value, dict):
+        return dict((k, _arrow_value(v)) for k, v in value.items())
+    return value
+
+
+class ArrowWriter(object):
+    """
+    Writes batches to an Arrow IPC file. The schema is inferred from the
+    first batch; values that do not fit it later are stored as strings
+    (if the column is a string one) or left out.
+    """
+
+    per_batch_columns = False
+
+    def __init__(self, fileobj):
+        if pyarrow is None:
+            raise RuntimeError('pyarrow is required for Arrow export')
+        self._fileobj = fileobj
+        self._writer = None
+        self._schema = None
+
+    def _column(self, values, field_type=None):
+        values = [_arrow_value(x) for x in values]
+        try:
+            return pyarrow.array(values, type=field_type)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError,
+                OverflowError):
+            pass
+        if field_type is None or pyarrow.types.is_string(field_type):
+            return pyarrow.array(
+                [None if x is None else _format_cell(x) for x in values],
+                type=pyarrow.string())
+        warnings.warn('Values do not fit column type {}, left out'
+                      ''.format(field_type))
+        return pyarrow.nulls(len(values), type=field_type)
+
+    def write_batch(self, batch):
+        if self._schema is None:
+            arrays = [self._column(batch.data[name])
+                      for name in batch.columns]
+            table = pyarrow.Table.from_arrays(arrays, names=batch.columns)
+            self._schema = table.schema
+            self._writer = pyarrow.ipc.new_file(self._fileobj, self._schema)
+        else:
+            arrays = [self._column(batch.data[field.name], field.type)
+                      for field in self._schema]
+            table = pyarrow.Table.from_arrays(arrays, schema=self._schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _plain_value(value):
+    """Convert a typed value to standard library types only"""
+    if isinstance(value, Ratio):
+        if value.den == 0:
+            return None
+        return fractions.Fraction(value.num, value.den)
+    if isinstance(value, (list, tuple)):
+        return [_plain_value(x) for x in value]
+    if isinstance(value, dict):
+        return dict((k, _plain_value(v)) for k, v in value.items())
+    return value
+
+
+def _json_value(value):
+    """Convert a typed value to JSON (ratios as ``'num/den'`` strings)"""
+    if isinstance(value, Ratio):
+        return '{}/{}'.format(value.num, value.den)
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).hex()
+    if isinstance(value, (list, tuple)):
+        return [_json_value(x) for x in value]
+    if isinstance(value, dict):
+        return dict((k, _json_value(v)) for k, v in value.items())
+    return value
+
+
+def json_record(result):
+    """
+    Convert a :py:class:`FileResult` (with typed values) to a dict that
+    can be serialised to JSON: ``{"path": ..., "error": ..., "tags":
+    {...}}``, with the thumbnails (if any) encoded in base64.
+    """
+    tags = {}
+    for name, value in result.tags.items():
+        if name in THUMBNAIL_TAGS:
+            tags[name] = base64.b64encode(value).decode('ascii')
+        else:
+            tags[name] = _json_value(value)
+    return {'path': result.path, 'error': result.error, 'tags': tags}
+
+
+class PickleWriter(object):
+    """
+    Writes batches to a binary file object as a stream of pickled
+    ``{'columns': [...], 'data': {...}}`` records: a compact format
+    needing nothing beyond the standard library to be read back (see
+    :py:func:`read_pickle_batches`). Ratios are stored as ``Fraction``.
+    Each batch has its own columns.
+    """
+
+    per_batch_columns = True
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+
+    def write_batch(self, batch):
+        data = dict((name, [_plain_value(x) for x in values])
+                    for name, values in batch.data.items())
+        pickle.dump({'columns': batch.columns, 'data': data},
+                    self._fileobj, protocol=pickle.HIGHEST_PROTOCOL)
+        self._fileobj.flush()
+
+    def close(self):
+        pass
+
+
+class _BatchUnpickler(pickle.Unpickler):
+    """Loads the plain types written by :py:class:`PickleWriter` only"""
+
+    def find_class(self, module, name):
+        if (module, name) == ('fractions', 'Fraction'):
+            return fractions.Fraction
+        raise pickle.UnpicklingError(
+            'Unexpected object in batch: {}.{}'.format(module, name))
+
+
+def read_pickle_batches(fileobj):
+    """
+    Read back the batches written by :py:class:`PickleWriter`.
+
+    Unlike ``pickle.load()``, this never runs code from the file: only
+    standard types and ``Fraction`` are loaded, anything else raises
+    ``pickle.UnpicklingError``. A crafted file may still use a lot of
+    memory, so only read files of known origin.
+    """
+    while True:
+        try:
+            record = _BatchUnpickler(fileobj).load()
+        except EOFError:
+            return
+        columns = record['columns']
+        size = len(record['data'][columns[0]])
+        yield Batch(columns, record['data'], size)
+
+
+#: Export formats: name -> (writer class, whether it writes binary)
+EXPORT_FORMATS = {
+    'csv': (CSVWriter, False),
+    'arrow': (ArrowWriter, True),
+    'pickle': (PickleWriter, True),
+}
+
+
+def _get_format(name):
+    if name == 'binary':
+        # # The most compact format available
+        name = 'arrow' if pyarrow is not None else 'pickle'
+    try:
+        return EXPORT_FORMATS[name]
+    except KeyError:
+        raise ValueError('Unsupported export format: {!r}'.format(name))
+
+
+def export_files(paths, output, format='csv', columns=None,
+                 batch_size=1000, jobs=None, **options):
+    """
+    Process many files and write their tags in columnar form.
+
+    :param paths: iterable of file paths
+    :param output: file path, or file object (text for CSV, binary for
+        the other formats)
+    :param format: ``'csv'``, ``'arrow'``, ``'pickle'`` or ``'binary'``
+        (Arrow if pyarrow is available, pickle otherwise)
+    :param columns: tag names to use as columns; by default, those found
+        in the first batch (in each batch, for the pickle format)
+    :param batch_size: number of files per batch
+    :param jobs: number of worker processes (see
+        :py:func:`py3exif.batch.scan_paths`)
+    :param options: passed on to :py:func:`py3exif.process_file`
+    :return: number of files exported
+    """
+    writer_class, binary = _get_format(format)
+
+    if isinstance(output, str):
+        if binary:
+            fileobj = open(output, 'wb')
+        else:
+            fileobj = io.open(output, 'w', newline='', encoding='utf-8')
+    else:
+        fileobj = None
+
+    writer = writer_class(fileobj or output)
+    count = 0
+    try:
+        results = scan_paths(paths, jobs=jobs, **options)
+        for batch in iter_batches(results, columns, batch_size,
+                                  writer.per_batch_columns):
+            writer.write_batch(batch)
+            count += batch.size
+        writer.close()
+    finally:
+        if fileobj is not None:
+            fileobj.close()
+    logger.debug('Exported {:d} files'.format(count))
+    return count
+
+
+def export_directory(top, output, recursive=True, **kwargs):
+    """
+    Export the tags of all the image files under ``top``; see
+    :py:func:`export_files` for the other arguments.
+    """
+    return export_files(iter_image_files(top, recursive=recursive),
+                        output, **kwargs)
@@ -0,0 +1,157 @@
+"""
+py3exif Resource limits, for processing untrusted input
+"""
+
+import time
+import threading
+
+from py3exif.exceptions import LimitExceeded, ParseInterrupted
+
+__all__ = ['ParseLimits', 'ParseBudget', 'CancellationToken']
+
+
+class ParseLimits(object):
+    """
+    Limits on the resources spent decoding a single file.
+    Any limit set to ``None`` (the default) is not enforced.
+
+    :param max_ifds: maximum number of IFDs decoded, including the
+        EXIF, GPS and MakerNote ones
+    :param max_entries: maximum number of entries in a single IFD
+    :param max_values: maximum number of values decoded, over all tags
+    :param max_bytes: maximum number of bytes read by the decoder
+    :param max_depth: maximum nesting of IFDs: the main IFDs are at
+        depth 0, the EXIF and GPS ones at depth 1, the Interoperability
+        and MakerNote ones at depth 2.
+    :param max_time: maximum wall-clock time spent decoding, in seconds
+    """
+
+    def __init__(self, max_ifds=None, max_entries=None, max_values=None,
+                 max_bytes=None, max_depth=None, max_time=None):
+        self.max_ifds = max_ifds
+        self.max_entries = max_entries
+        self.max_values = max_values
+        self.max_bytes = max_bytes
+        self.max_depth = max_depth
+        self.max_time = max_time
+
+    def __repr__(self):
+        limits = ', '.join(
+            '{}={!r}'.format(name, value)
+            for name, value in sorted(vars(self).items())
+            if value is not None)
+        return '<ParseLimits {}>'.format(limits or 'unlimited')
+
+    def budget(self):
+        """Start tracking the resources spent against these limits"""
+        return ParseBudget(self)
+
+
+class CancellationToken(object):
+    """
+    Lets another thread stop the decoding of a file, between two units
+    of work (IFDs, MakerNotes, thumbnails).
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+class ParseBudget(object):
+    """
+    Keeps count of the resources spent decoding a file, raising
+    :py:class:`LimitExceeded` as soon as one of the limits is crossed.
+    The clock starts with the first IFD decoded, and is stopped with
+    :py:meth:`pause` when decoding is over, until the next checkpoint
+    (eg. when the deferred MakerNote decoding is run).
+
+    :param deadline: ``time.monotonic()`` value after which decoding
+        stops, raising :py:class:`ParseInterrupted`
+    :param cancel: a :py:class:`CancellationToken`; once cancelled,
+        decoding stops raising :py:class:`ParseInterrupted`
+    """
+
+    def __init__(self, limits=None, deadline=None, cancel=None):
+        self.limits = limits or ParseLimits()
+        self.deadline = deadline
+        self.cancel = cancel
+        self.ifds = 0
+        self.values = 0
+        self.bytes_read = 0
+        # # Time spent decoding, not counting the running span
+        self.elapsed = 0.0
+        # # Start of the running span, None while paused
+        self.started = None
+        # # The header may be shared between threads
+        self._lock = threading.Lock()
+
+    def add_ifd(self, entries, depth=0):
+        limits = self.limits
+        with self._lock:
+            self.ifds += 1
+            ifds = self.ifds
+        if limits.max_ifds is not None and ifds > limits.max_ifds:
+            raise LimitExceeded(
+                'Too many IFDs (limit: {:d})'.format(limits.max_ifds))
+        if limits.max_entries is not None and entries > limits.max_entries:
+            raise LimitExceeded(
+                'Too many entries in IFD: {:d} (limit: {:d})'
+                ''.format(entries, limits.max_entries))
+        if limits.max_depth is not None and depth > limits.max_depth:
+            raise LimitExceeded(
+                'IFDs nested too deep (limit: {:d})'.format(limits.max_depth))
+        self.checkpoint()
+
+    def add_values(self, count):
+        max_values = self.limits.max_values
+        with self._lock:
+            self.values += count
+            values = self.values
+        if max_values is not None and values > max_values:
+            raise LimitExceeded(
+                'Too many values (limit: {:d})'.format(max_values))
+
+    def add_bytes(self, count):
+        max_bytes = self.limits.max_bytes
+        with self._lock:
+            self.bytes_read += count
+            bytes_read = self.bytes_read
+        if max_bytes is not None and bytes_read > max_bytes:
+            raise LimitExceeded(
+                'Too many bytes read (limit: {:d})'.format(max_bytes))
+
+    def checkpoint(self):
+        """Called between units of work: stop here if we have to"""
+        if self.cancel is not None and self.cancel.cancelled:
+            raise ParseInterrupted('Decoding was cancelled')
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise ParseInterrupted('Decoding deadline passed')
+        self.check_time()
+
+    def check_time(self):
+        max_time = self.limits.max_time
+        if max_time is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self.started is None:
+                self.started = now
+            elapsed = self.elapsed + now - self.started
+        if elapsed > max_time:
+            raise LimitExceeded(
+                'Decoding took too long (limit: {}s)'.format(max_time))
+
+    def pause(self):
+        """Stop the clock: the time until the next checkpoint is free"""
+        now = time.monotonic()
+        with self._lock:
+            if self.started is not None:
+                self.elapsed += now - self.started
+                self.started = None
@@ -0,0 +1,171 @@
+"""
+py3exif MakerNote decoders
+
+Decoders are looked up by camera make and/or by a signature at the start
+of the MakerNote. Each vendor module (holding its tag tables and decoding
+logic) is only imported the first time a matching file is seen.
+
+Extra vendors can be plugged in with :py:func:`register_makernote`;
+a decoder is called as ``decode(header, tags, note)``, where ``note`` is
+the ``EXIF MakerNote`` tag, and usually calls
+``header.extract_makernote_ifd()`` to add ``MakerNote ...`` tags.
+"""
+
+import logging
+import threading
+import importlib
+
+logger = logging.getLogger('py3exif')
+
+__all__ = ['MakerNoteDecoder', 'register_makernote',
+           'unregister_makernote', 'find_makernote_decoder']
+
+
+class MakerNoteDecoder(object):
+    """
+    A MakerNote decoder and the files it applies to.
+
+    :param decoder: the ``decode(header, tags, note)`` function, or the
+        ``'module:function'`` path to import it from when first needed
+    :param make: the camera make (``Image Make``, stripped) to match
+        exactly, or a callable taking the make and returning whether it
+        matches
+    :param signature: bytes the MakerNote must start with
+    """
+
+    #: Whether this is one of the decoders shipped with py3exif
+    builtin = False
+
+    def __init__(self, decoder, make=None, signature=None):
+        self._decoder = decoder
+        self.make = make
+        self.signature = signature
+
+    def __repr__(self):
+        return '<MakerNoteDecoder {!r} make={!r} signature={!r}>'.format(
+            self._decoder, self.make, self.signature)
+
+    def matches(self, make, note_values):
+        if callable(self.make):
+            if not self.make(make):
+                return False
+        elif self.make is not None and self.make != make:
+            return False
+        if self.signature is not None:
+            head = bytes(bytearray(note_values[:len(self.signature)]))
+            if head != self.signature:
+                return False
+        return True
+
+    @property
+    def decoder(self):
+        if isinstance(self._decoder, str):
+            logger.debug('Loading MakerNote decoder {}'.format(self._decoder))
+            module_name, _, function = self._decoder.partition(':')
+            module = importlib.import_module(module_name)
+            self._decoder = getattr(module, function or 'decode')
+        return self._decoder
+
+    def decode(self, header, tags, note):
+        return self.decoder(header, tags, note)
+
+
+# # Decoders for an exact make, and the other ones, in lookup order.
+# # They are replaced (never changed in place) on registration, so that
+# # lookups from other threads need no lock.
+_DECODERS_BY_MAKE = {}
+_DECODERS = ()
+_REGISTRY_LOCK = threading.Lock()
+
+
+def register_makernote(decoder, make=None, signature=None, _builtin=False):
+    """
+    Register a MakerNote decoder (see :py:class:`MakerNoteDecoder` for
+    the arguments). Decoders registered this way are tried before the
+    built-in ones.
+
+    :return: the :py:class:`MakerNoteDecoder` object
+    """
+    if make is None and signature is None:
+        raise ValueError('A make or a signature is required')
+
+    global _DECODERS_BY_MAKE, _DECODERS
+
+    entry = MakerNoteDecoder(decoder, make=make, signature=signature)
+    entry.builtin = _builtin
+    with _REGISTRY_LOCK:
+        if make is not None and not callable(make):
+            decoders = _DECODERS_BY_MAKE.get(make, ())
+        else:
+            decoders = _DECODERS
+
+        if _builtin:
+            decoders = decoders + (entry, )
+        else:
+            decoders = (entry, ) + decoders
+
+        if make is not None and not callable(make):
+            by_make = dict(_DECODERS_BY_MAKE)
+            by_make[make] = decoders
+            _DECODERS_BY_MAKE = by_make
+        else:
+            _DECODERS = decoders
+    return entry
+
+
+def unregister_makernote(entry):
+    """
+    Remove a decoder, as returned by :py:func:`register_makernote`.
+    """
+    global _DECODERS_BY_MAKE, _DECODERS
+
+    with _REGISTRY_LOCK:
+        if entry in _DECODERS:
+            _DECODERS = tuple(x for x in _DECODERS if x is not entry)
+            return
+        for make, decoders in _DECODERS_BY_MAKE.items():
+            if entry in decoders:
+                by_make = dict(_DECODERS_BY_MAKE)
+                by_make[make] = tuple(x for x in decoders if x is not entry)
+                _DECODERS_BY_MAKE = by_make
+                return
+    raise ValueError('{!r} is not registered'.format(entry))
+
+
+def find_makernote_decoder(make, note_values):
+    """
+    Return the :py:class:`MakerNoteDecoder` for a camera make and the
+    MakerNote values, or ``None``.
+    """
+    candidates = _DECODERS_BY_MAKE.get(make, ()) + _DECODERS
+    # # The registered decoders first, whether they match by make or
+    # # signature, then the built-in ones
+    for builtin in (False, True):
+        for entry in candidates:
+            if entry.builtin is builtin and entry.matches(make, note_values):
+                return entry
+    return None
+
+
+def _is_nikon(make):
+    return 'NIKON' in make
+
+
+def _is_olympus(make):
+    return make.startswith('OLYMPUS')
+
+
+def _is_casio(make):
+    return 'CASIO' in make or 'Casio' in make
+
+
+register_makernote('py3exif.makernotes.nikon:decode', make=_is_nikon,
+                   _builtin=True)
+register_makernote('py3exif.makernotes.olympus:decode', make=_is_olympus,
+                   _builtin=True)
+register_makernote('py3exif.makernotes.casio:decode', make=_is_casio,
+                   _builtin=True)
+register_makernote('py3exif.makernotes.fujifilm:decode', make='FUJIFILM',
+                   _builtin=True)
+register_makernote('py3exif.makernotes.canon:decode', make='Canon',
+                   _builtin=True)
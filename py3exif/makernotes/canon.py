@@ -0,0 +1,242 @@
+"""
+Canon MakerNote
+"""
+
+import collections.abc
+from types import MappingProxyType
+
+
+MAKERNOTE_CANON_TAGS = MappingProxyType({
+    0x0006: ('ImageType', ),
+    0x0007: ('FirmwareVersion', ),
+    0x0008: ('ImageNumber', ),
+    0x0009: ('OwnerName', ),
+})
+
+## This is in element offset, name, optional value dictionary format
+MAKERNOTE_CANON_TAG_0x001 = MappingProxyType({
+    1: ('Macromode',
+        {1: 'Macro',
+         2: 'Normal'}),
+    2: ('SelfTimer', ),
+    3: ('Quality',
+        {2: 'Normal',
+         3: 'Fine',
+         5: 'Superfine'}),
+    4: ('FlashMode',
+        {0: 'Flash Not Fired',
+         1: 'Auto',
+         2: 'On',
+         3: 'Red-Eye Reduction',
+         4: 'Slow Synchro',
+         5: 'Auto + Red-Eye Reduction',
+         6: 'On + Red-Eye Reduction',
+         16: 'external flash'}),
+    5: ('ContinuousDriveMode',
+        {0: 'Single Or Timer',
+         1: 'Continuous'}),
+    7: ('FocusMode',
+        {0: 'One-Shot',
+         1: 'AI Servo',
+         2: 'AI Focus',
+         3: 'MF',
+         4: 'Single',
+         5: 'Continuous',
+         6: 'MF'}),
+    10: ('ImageSize',
+         {0: 'Large',
+          1: 'Medium',
+          2: 'Small'}),
+    11: ('EasyShootingMode',
+         {0: 'Full Auto',
+          1: 'Manual',
+          2: 'Landscape',
+          3: 'Fast Shutter',
+          4: 'Slow Shutter',
+          5: 'Night',
+          6: 'B&W',
+          7: 'Sepia',
+          8: 'Portrait',
+          9: 'Sports',
+          10: 'Macro/Close-Up',
+          11: 'Pan Focus'}),
+    12: ('DigitalZoom',
+         {0: 'None',
+          1: '2x',
+          2: '4x'}),
+    13: ('Contrast',
+         {0xFFFF: 'Low',
+          0: 'Normal',
+          1: 'High'}),
+    14: ('Saturation',
+         {0xFFFF: 'Low',
+          0: 'Normal',
+          1: 'High'}),
+    15: ('Sharpness',
+         {0xFFFF: 'Low',
+          0: 'Normal',
+          1: 'High'}),
+    16: ('ISO',
+         {0: 'See ISOSpeedRatings Tag',
+          15: 'Auto',
+          16: '50',
+          17: '100',
+          18: '200',
+          19: '400'}),
+    17: ('MeteringMode',
+         {3: 'Evaluative',
+          4: 'Partial',
+          5: 'Center-weighted'}),
+    18: ('FocusType',
+         {0: 'Manual',
+          1: 'Auto',
+          3: 'Close-Up (Macro)',
+          8: 'Locked (Pan Mode)'}),
+    19: ('AFPointSelected',
+         {0x3000: 'None (MF)',
+          0x3001: 'Auto-Selected',
+          0x3002: 'Right',
+          0x3003: 'Center',
+          0x3004: 'Left'}),
+    20: ('ExposureMode',
+         {0: 'Easy Shooting',
+          1: 'Program',
+          2: 'Tv-priority',
+          3: 'Av-priority',
+          4: 'Manual',
+          5: 'A-DEP'}),
+    23: ('LongFocalLengthOfLensInFocalUnits', ),
+    24: ('ShortFocalLengthOfLensInFocalUnits', ),
+    25: ('FocalUnitsPerMM', ),
+    28: ('FlashActivity',
+         {0: 'Did Not Fire',
+          1: 'Fired'}),
+    29: ('FlashDetails',
+         {14: 'External E-TTL',
+          13: 'Internal Flash',
+          11: 'FP Sync Used',
+          7: '2nd("Rear")-Curtain Sync Used',
+          4: 'FP Sync Enabled'}),
+    32: ('FocusContinuous',
+         {0: 'Single',
+          1: 'Continuous'}),
+})
+
+MAKERNOTE_CANON_TAG_0x004 = MappingProxyType({
+    7: ('WhiteBalance', {
+        0: 'Auto',
+        1: 'Sunny',
+        2: 'Cloudy',
+        3: 'Tungsten',
+        4: 'Fluorescent',
+        5: 'Flash',
+        6: 'Custom'}),
+    9: ('SequenceNumber', ),
+    14: ('AFPointUsed', ),
+    15: ('FlashBias', {
+        0xFFC0: '-2 EV',
+        0xFFCC: '-1.67 EV',
+        0xFFD0: '-1.50 EV',
+        0xFFD4: '-1.33 EV',
+        0xFFE0: '-1 EV',
+        0xFFEC: '-0.67 EV',
+        0xFFF0: '-0.50 EV',
+        0xFFF4: '-0.33 EV',
+        0x0000: '0 EV',
+        0x000C: '0.33 EV',
+        0x0010: '0.50 EV',
+        0x0014: '0.67 EV',
+        0x0020: '1 EV',
+        0x002C: '1.33 EV',
+        0x0030: '1.50 EV',
+        0x0034: '1.67 EV',
+        0x0040: '2 EV'}),
+    19: ('SubjectDistance', ),
+})
+
+
+class CanonRecord(collections.abc.Mapping):
+    """
+    A Canon settings array (MakerNote tag 0x0001 or 0x0004), as a
+    read-only mapping of field names to their integer values; fields are
+    only looked up when accessed, and ``describe()`` gives their meaning.
+
+    It looks like an ``IFD_Tag`` of the "proprietary" type, with
+    ``values``, ``printable`` and ``to_python`` attributes.
+    """
+    __slots__ = ('values', '_fields')
+
+    field_type = 0
+
+    def __init__(self, values, fields):
+        self.values = tuple(values)
+        self._fields = fields
+
+    def __repr__(self):
+        return '<CanonRecord {}>'.format(self.printable)
+
+    def __str__(self):
+        return self.printable
+
+    def _index(self, name):
+        index = self._fields[name][0]
+        if index >= len(self.values):
+            raise KeyError(name)
+        return index
+
+    def __getitem__(self, name):
+        return self.values[self._index(name)]
+
+    def __iter__(self):
+        for name in self._fields:
+            if self._fields[name][0] < len(self.values):
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def describe(self, name):
+        """Meaning of the value of a field, as a string"""
+        value = self.values[self._index(name)]
+        meanings = self._fields[name][1]
+        if meanings is None:
+            return str(value)
+        return meanings.get(value, 'Unknown')
+
+    @property
+    def printable(self):
+        return ', '.join('{}: {}'.format(name, self.describe(name))
+                         for name in self)
+
+    @property
+    def to_python(self):
+        return dict(self)
+
+
+def _compile_fields(context):
+    """
+    Index a table of array elements by field name (in element order):
+    ``{name: (index, meanings or None)}``
+    """
+    fields = {}
+    for index in sorted(context):
+        entry = context[index]
+        fields[entry[0]] = (index, entry[1] if len(entry) > 1 else None)
+    return MappingProxyType(fields)
+
+
+# # see http://www.burren.cx/david/canon.html by David Burren
+CANON_RECORDS = (
+    ('MakerNote Tag 0x0001', 'MakerNote CameraSettings',
+     _compile_fields(MAKERNOTE_CANON_TAG_0x001)),
+    ('MakerNote Tag 0x0004', 'MakerNote ShotInfo',
+     _compile_fields(MAKERNOTE_CANON_TAG_0x004)),
+)
+
+
+def decode(header, tags, note):
+    header.extract_makernote_ifd(tags, note.field_offset,
+                                 tags_library=MAKERNOTE_CANON_TAGS)
+    for array_name, record_name, fields in CANON_RECORDS:
+        if array_name in tags:
+            tags[record_name] = CanonRecord(tags[array_name].values, fields)
@@ -4,21 +4,31 @@ Misc objects
 
 import logging
 import warnings
+import threading
 import collections
 
 from .constants.tags import *
 from .constants.field_types import FIELD_TYPES, FT_ASCII, FT_SIGNED_BYTE, \
-    FT_SIGNED_RATIO, FT_SIGNED_LONG, FT_SIGNED_SHORT, FT_RATIO
+    FT_SIGNED_RATIO, FT_SIGNED_LONG, FT_SIGNED_SHORT, FT_RATIO, \
+    FT_SIGNED_LONG8, FT_BYTE, FT_UNDEFINED, FT_SHORT, FT_LONG, FT_IFD, \
+    FT_LONG8, FT_IFD8
 from py3exif import INTR_TAGS
 from .utils import *
+from .limits import ParseBudget
+from .exceptions import ParseInterrupted
+from .makernotes import find_makernote_decoder
 
 
 logger = logging.getLogger('py3exif')
 
+#: Sizes of (entry count, IFD entry, offset) in classic TIFF and BigTIFF
+TIFF_LAYOUT = (2, 12, 4)
+BIGTIFF_LAYOUT = (8, 20, 8)
+
 
 class Ratio(object):
     def __init__(self, num, den=None):
-        if isinstance(num, basestring) and den is None:
+        if isinstance(num, str) and den is None:
             num, den = map(int, num.split('/'))
         self.num = num
         self.den = den
@@ -43,13 +53,141 @@ class Ratio(object):
     def reduce(self):
         div = gcd(self.num, self.den)
         if div > 1:
-            self.num = self.num / div
-            self.den = self.den / div
+            self.num = self.num // div
+            self.den = self.den // div
 
     def __float__(self):
         return float(self.num) / float(self.den)
 
 
+class Segment(collections.namedtuple('Segment', 'marker offset length')):
+    """
+    A JPEG marker segment.
+
+    ``marker`` is the second byte of the marker (eg. ``0xE1`` for APP1),
+    ``offset`` the absolute position of the segment payload in the file
+    (just after the length field) and ``length`` the payload size.
+    """
+    __slots__ = ()
+
+    @property
+    def name(self):
+        if 0xE0 <= self.marker <= 0xEF:
+            return 'APP{:d}'.format(self.marker - 0xE0)
+        return JPEG_MARKER_NAMES.get(
+            self.marker, 'Marker 0x{:02X}'.format(self.marker))
+
+    def __repr__(self):
+        return '<Segment {} at 0x{:X}, {:d} bytes>'.format(
+            self.name, self.offset, self.length)
+
+
+class ProbeResult(collections.namedtuple(
+        'ProbeResult', 'format offset endian length segments')):
+    """
+    Where the EXIF information of a file lives, as found by
+    :py:func:`py3exif.probe`: the file ``format`` (``'tiff'``,
+    ``'jpeg'``, or ``None`` if not recognised), the ``offset`` and byte
+    order (``endian``) of the TIFF structure and its ``length`` (the
+    whole file for TIFF files), ``offset`` being ``None`` when there is
+    no EXIF information. ``segments`` indexes the JPEG segments.
+    """
+    __slots__ = ()
+
+    @property
+    def has_exif(self):
+        return self.offset is not None
+
+
+class IFDContext(collections.namedtuple('IFDContext',
+                                          'base endian layout')):
+    """
+    How to read an IFD: the offsets in it are relative to ``base`` (an
+    absolute position in the file), its integers have the ``endian``
+    byte order (``'I'`` or ``'M'``) and ``layout`` gives the size of its
+    entry count, entries and offsets.
+
+    MakerNotes may have their own byte order and offsets relative to
+    their own start; passing the context along, rather than changing the
+    header, lets them be decoded without side effects.
+    """
+    __slots__ = ()
+
+
+class RawValue(object):
+    """
+    The values of an IFD entry, only read when asked for: ``length``
+    bytes at ``offset`` (relative to the base of the IFD context).
+    """
+    __slots__ = ('_header', '_ctx', 'field_type', 'count', 'offset')
+
+    def __init__(self, header, ctx, field_type, count, offset):
+        self._header = header
+        self._ctx = ctx
+        self.field_type = field_type
+        self.count = count
+        self.offset = offset
+
+    def __repr__(self):
+        return '<RawValue {:d} x {} at 0x{:04X}>'.format(
+            self.count, FIELD_TYPES[self.field_type][2], self.offset)
+
+    @property
+    def length(self):
+        return self.count * FIELD_TYPES[self.field_type][0]
+
+    def tobytes(self):
+        """The raw bytes, in the byte order of the IFD"""
+        return self._header._read(self.offset, self.length, self._ctx)
+
+    def decode(self):
+        """The values, as in :py:attr:`IFD_Tag.values`"""
+        return self._header._read_values(
+            self.field_type, self.count, self.offset, self._ctx)
+
+
+class TagEvent(collections.namedtuple(
+        'TagEvent', 'ifd tag name field_type count value')):
+    """
+    An IFD entry, as yielded by :py:meth:`ExifHeader.iter_tags`: the IFD
+    name (eg. ``'EXIF'``), tag ID and name, field type, number of values
+    and their :py:class:`RawValue`.
+    """
+    __slots__ = ()
+
+    @property
+    def key(self):
+        """The name of the tag in :py:attr:`ExifHeader.tags`"""
+        return '{} {}'.format(self.ifd, self.name)
+
+
+#: Sub-IFD pointer tags: tag ID -> (IFD name, tags library, depth)
+SUB_IFD_POINTERS = collections.OrderedDict([
+    (0x8769, ('EXIF', None, 1)),
+    (0xA005, ('EXIF Interoperability', INTR_TAGS, 2)),
+    (0x8825, ('GPS', GPS_TAGS, 1)),
+])
+
+
+#: Field types of valid sub-IFD pointers
+IFD_POINTER_TYPES = frozenset([FT_SHORT, FT_LONG, FT_IFD, FT_LONG8, FT_IFD8])
+
+
+#: Tags always decoded with a selection, as other tags depend on them:
+#: the sub-IFD pointers, the camera make and MakerNote, and the
+#: thumbnail location
+REQUIRED_TAGS = frozenset(list(SUB_IFD_POINTERS) + [
+    0x010F, 0x927C, 0x0103, 0x0111, 0x0117, 0x0201, 0x0202])
+
+#: Names (prefixes) of the tags found through each IFD of the main chain
+#: or sub-IFD, besides its own
+IFD_DEPENDENTS = {
+    'Image': ('EXIF ', 'GPS ', 'MakerNote '),
+    'EXIF': ('EXIF Interoperability ', 'MakerNote '),
+    'Thumbnail': ('JPEGThumbnail', 'TIFFThumbnail'),
+}
+
+
 class IFD_Tag(object):
     """For ease of dealing with tags"""
     def __init__(self, printable=None, tag=None, field_type=0, values=None,
@@ -119,29 +257,22 @@ class IFD_Tag(object):
         # else:
         #     printable = str(self.values)
 
-        # # Compute printable version of values
-        # # todo: this should be generated by the tag at need...
-        if self.tag_entry and len(self.tag_entry) >= 2:
-            # # We have a formatter function for this field..
-
-            formatter = self.tag_entry[1]
-
-            if callable(formatter):
-                # call mapping function
-                printable = formatter(self._raw_values)
-
-            else:
-                printable = ', '.join(
-                    (formatter.get(i) or repr(i)) for i in self._raw_values)
-
-            return printable
-
-        return self._raw_values
+        # # Compute printable version of values (memoized, as the same
+        # # tag values recur across files)
+        return PRINTABLE_CACHE.render(self)
 
     @property
     def values(self):
+        """
+        The raw values: a list, except for BYTE and UNDEFINED fields
+        which are kept as ``bytes``
+        """
         return self._raw_values
 
+    def as_list(self):
+        """The raw values, as a list (of ints, for bytes values)"""
+        return list(self._raw_values)
+
     @property
     def value(self):
         vl = len(self._raw_values)
@@ -152,19 +283,277 @@ class IFD_Tag(object):
         return self._raw_values[0]
 
 
+def _render_printable(tag):
+    values = tag.values
+    if isinstance(values, bytes):
+        # # Formatters (and printable values) get lists of ints, as the
+        # # values were before BYTE and UNDEFINED ones were kept as bytes
+        values = tag.as_list()
+
+    if tag.tag_entry and len(tag.tag_entry) >= 2:
+        # # We have a formatter function for this field..
+
+        formatter = tag.tag_entry[1]
+
+        if callable(formatter):
+            # call mapping function
+            return formatter(values)
+
+        return ', '.join(
+            (formatter.get(i) or repr(i)) for i in values)
+
+    return values
+
+
+def _printable_key(tag):
+    """
+    The memo key for the printable value of a tag, or ``None`` if it
+    should not be memoized: only tags with a formatter, and short values
+    of hashable types (ratios compare by identity) are.
+    """
+    entry = tag.tag_entry
+    if not entry or len(entry) < 2:
+        return None
+    values = tag.values
+    if len(values) > PrintableCache.max_values:
+        return None
+    if isinstance(values, list):
+        values = tuple(values)
+        if not all(isinstance(x, (int, str, bytes)) for x in values):
+            return None
+    elif not isinstance(values, bytes):
+        return None
+    # # The table entry is checked on lookup, in case its id was reused
+    return id(entry), tag.tag, tag.field_type, values
+
+
+class PrintableCache(object):
+    """
+    A bounded (least recently used) memo of printable values, keyed by
+    the tag table entry, tag ID and raw values, shared by all files.
+
+    :param maxsize: number of printable values kept
+    """
+
+    #: Values longer than this are not memoized
+    max_values = 64
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def render(self, tag):
+        """The printable value of an :py:class:`IFD_Tag`"""
+        return self.render_many([tag])[0]
+
+    def render_many(self, tags):
+        """
+        The printable values of many :py:class:`IFD_Tag` objects, in
+        order, looking them up in a single pass.
+        """
+        keys = [_printable_key(tag) for tag in tags]
+        found = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, (key, tag) in enumerate(zip(keys, tags)):
+                item = self._data.get(key) if key is not None else None
+                if item is not None and item[0] is tag.tag_entry:
+                    self._data.move_to_end(key)
+                    found[i] = item[1]
+                    self.hits += 1
+                else:
+                    missing.append(i)
+                    self.misses += key is not None
+
+        # # Formatters run outside of the lock
+        rendered = [(i, _render_printable(tags[i])) for i in missing]
+
+        with self._lock:
+            for i, printable in rendered:
+                found[i] = printable
+                if keys[i] is not None:
+                    self._data[keys[i]] = (tags[i].tag_entry, printable)
+                    self._data.move_to_end(keys[i])
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return found
+
+
+#: The printable values memo used by :py:attr:`IFD_Tag.printable`
+PRINTABLE_CACHE = PrintableCache()
+
+
+def render_printable(tags):
+    """
+    Compute the printable values of many :py:class:`IFD_Tag` objects at
+    once (filling in their ``printable`` property), as a list. Other
+    tag objects (eg. decoded MakerNote records) are rendered as usual.
+    """
+    tags = list(tags)
+    todo = [tag for tag in tags if isinstance(tag, IFD_Tag) and
+            '_lazy_printable' not in tag.__dict__]
+    for tag, printable in zip(todo, PRINTABLE_CACHE.render_many(todo)):
+        tag.printable = printable
+    return [tag.printable for tag in tags]
+
+
+#: Tags holding binary blobs (thumbnails) rather than IFD_Tag objects
+THUMBNAIL_TAGS = ('JPEGThumbnail', 'TIFFThumbnail')
+
+
+def _typed_value(tag):
+    value = tag.to_python
+    if isinstance(value, list) and len(value) == 1:
+        value = value[0]
+    return value
+
+
+class TagDict(dict):
+    """
+    The tags of an ``ExifHeader``: a dict where some tags (those of the
+    MakerNote) are only decoded when one of them is first looked up, or
+    when all the tags are listed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TagDict, self).__init__(*args, **kwargs)
+        # # Deferred decoding: (name prefixes, decode function) pairs
+        self._pending = []
+        # # Thread running the deferred decoding, if any
+        self._resolving = None
+        self._lock = threading.RLock()
+
+    def defer(self, decode, prefixes=('MakerNote ', )):
+        """
+        Register ``decode(tags)``, to be called to add the tags whose
+        name starts with one of ``prefixes``, when needed.
+        """
+        with self._lock:
+            self._pending.append((tuple(prefixes), decode))
+
+    def resolve(self, key=None):
+        """
+        Run the deferred decoding now: all of it, or only that which may
+        add ``key``.
+        """
+        if not self._pending and self._resolving is None:
+            return
+        if self._resolving == threading.get_ident():
+            # # Lookups made by the decoding itself go through
+            return
+        # # Other threads wait for the decoding to be over
+        with self._lock:
+            self._resolving = threading.get_ident()
+            try:
+                # # Decoding may defer some more
+                while self._run_pending(key):
+                    pass
+            finally:
+                self._resolving = None
+
+    def _run_pending(self, key):
+        for i, (prefixes, decode) in enumerate(self._pending):
+            if key is None or \
+                    (isinstance(key, str) and key.startswith(prefixes)):
+                del self._pending[i]
+                decode(self)
+                return True
+        return False
+
+    def _check(self, key):
+        """Resolve the deferred decoding if ``key`` may come from it"""
+        if not dict.__contains__(self, key):
+            self.resolve(key)
+
+    def __missing__(self, key):
+        self.resolve(key)
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        self._check(key)
+        return dict.__contains__(self, key)
+
+    def get(self, key, default=None):
+        self._check(key)
+        return dict.get(self, key, default)
+
+    def __iter__(self):
+        self.resolve()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self.resolve()
+        return dict.__len__(self)
+
+    def __repr__(self):
+        self.resolve()
+        return dict.__repr__(self)
+
+    def keys(self):
+        self.resolve()
+        return dict.keys(self)
+
+    def values(self):
+        self.resolve()
+        return dict.values(self)
+
+    def items(self):
+        self.resolve()
+        return dict.items(self)
+
+    def copy(self):
+        self.resolve()
+        return dict.copy(self)
+
+    def __reduce__(self):
+        self.resolve()
+        return dict, (dict(self), )
+
+
 class ExifHeader():
 # class ExifHeader(collections.MutableMapping, object):
     """Class that handles an EXIF header"""
 
     def __init__(self, file_obj, endian, offset, fake_exif=False, strict=False,
-                 detailed=True, debug=False):
+                 detailed=True, debug=False, segments=None, limits=None,
+                 deadline=None, cancel=None, reader=None, selection=None):
         self.file = file_obj
+        # # All reads are positional, see utils.open_reader()
+        self._reader = reader if reader is not None \
+            else open_reader(file_obj)
         self.endian = endian
         self.offset = offset
+        # # JPEG marker segments, as found while looking for the EXIF one
+        self.segments = list(segments or [])
         self.fake_exif = fake_exif
         self.strict = strict
         self.detailed = detailed
         self.debug = debug
+        # # Resources spent decoding, checked against the limits
+        self.limits = limits
+        self._budget = ParseBudget(limits, deadline=deadline, cancel=cancel)
+        # # Whether decoding was interrupted, leaving some tags out
+        self.incomplete = False
+        # # The tags to decode (a TagSelection), None for all of them
+        self.selection = selection
+        # # The main IFD chain, as far as it was walked (see _walk_ifds())
+        self._chain = []
+        self._chain_visited = set()
+        self._chain_next = None
+        self._chain_lock = threading.Lock()
 
     def __iter__(self):
         for i in self.tags:
@@ -173,6 +562,41 @@ class ExifHeader():
     def __getitem__(self, item):
         return str(self.tags[item])
 
+    def get_value(self, key, default=None):
+        """
+        The typed value of a tag (see ``IFD_Tag.to_python``): ints,
+        :py:class:`Ratio` objects, bytes, strings... with single values
+        unwrapped from their list. The printable value is not computed.
+        """
+        tag = self.tags.get(key)
+        if tag is None:
+            return default
+        return _typed_value(tag)
+
+    def typed(self):
+        """
+        A dict of the typed value (see :py:meth:`get_value`) of every
+        tag, leaving out the thumbnails.
+        """
+        return dict((name, _typed_value(tag))
+                    for name, tag in self.tags.items()
+                    if name not in THUMBNAIL_TAGS)
+
+    def printable_values(self, keys=None):
+        """
+        A dict of the printable value of the given tags (all of them by
+        default), leaving out the thumbnails; rendered in one batch.
+        """
+        if keys is None:
+            keys = self.tags.keys()
+        names = [name for name in keys
+                 if name not in THUMBNAIL_TAGS and name in self.tags]
+        tags = [self.tags[name] for name in names]
+        return dict(zip(names, render_printable(tags)))
+
+    def __contains__(self, item):
+        return item in self.tags
+
     def __setitem__(self, key, value):
         raise RuntimeError("ExifHeader object is read-only")
 
@@ -182,63 +606,99 @@ class ExifHeader():
     def itervalues(self):
         return self.tags.itervalues()
 
+    def find_segments(self, marker, signature=None):
+        """
+        Return the indexed JPEG segments with the given marker.
+
+        :param marker: marker byte, eg. ``0xE2`` for APP2 (ICC profile)
+        :param signature: if specified, only return segments whose
+            payload starts with these bytes (eg. ``b'ICC_PROFILE\\x00'``)
+        """
+        found = []
+        for segment in self.segments:
+            if segment.marker != marker:
+                continue
+            if signature is not None:
+                if segment.length < len(signature):
+                    continue
+                head = self._reader.read_at(segment.offset, len(signature))
+                if head != signature:
+                    continue
+            found.append(segment)
+        return found
+
+    def read_segment(self, segment):
+        """Read the payload of an indexed JPEG segment"""
+        return self._reader.read_at(segment.offset, segment.length)
+
     @lazy_property
     def tags(self):
+        """
+        All the tags, as a :py:class:`TagDict`. When ``detailed``, the
+        MakerNote is only decoded once a ``MakerNote ...`` tag is looked up
+        (or all the tags are listed).
+        """
         logger.debug('Running tags extraction')
 
-        tags = {}
-        ctr = 0
-        thumb_ifd = None
+        tags = TagDict()
+        try:
+            self._extract_all(tags)
+        except ParseInterrupted as e:
+            logger.debug('Tags extraction interrupted: {}'.format(e))
+            self.incomplete = True
+        finally:
+            # # Only the time spent decoding counts against max_time
+            self._budget.pause()
+
+        if self.selection is not None:
+            # # Leave out the tags only decoded for the selected ones
+            decoded, tags = tags, TagDict()
+            self._select(decoded, tags)
+            if decoded._pending:
+                tags.defer(lambda t: self._select(decoded, t, resolve=True),
+                           ('MakerNote ', 'JPEGThumbnail'))
+        return tags
 
-        for i in self._list_ifds():
-            if ctr == 0:
-                ifd_name = 'Image'
+    def _select(self, source, tags, resolve=False):
+        """Copy the selected tags from ``source`` into ``tags``"""
+        if resolve:
+            source.resolve()
+        for name, tag in dict.items(source):
+            if name in self.selection and not dict.__contains__(tags, name):
+                tags[name] = tag
 
-            elif ctr == 1:
-                ifd_name = 'Thumbnail'
-                thumb_ifd = i
+    def _wants(self, prefix):
+        """
+        Whether the tags whose names start with ``prefix`` (eg. those of
+        an IFD, with ``'GPS '``), or that are found through them, may be
+        selected
+        """
+        if self.selection is None:
+            return True
+        if self.selection.wants_prefix(prefix):
+            return True
+        return any(self._wants(dependent)
+                   for dependent in IFD_DEPENDENTS.get(prefix.strip(), ()))
 
-            else:
-                ifd_name = 'IFD {}'.format(ctr)
+    def _extract_all(self, tags):
+        """Extract all the tags and thumbnails into ``tags``"""
+
+        thumb_ifd = None
+        visited = set()
+
+        for ctr, i in enumerate(self._list_ifds()):
+            ifd_name = self._ifd_name(ctr)
+            if ctr == 1:
+                thumb_ifd = i
+            if not self._wants(ifd_name + ' '):
+                continue
 
             logger.debug('IFD {:d} ({}) at offset {:d}:'
                          ''.format(ctr, ifd_name, i))
 
-            self._extract_tags(tags, ifd=i, ifd_name=ifd_name)
-
-            # # EXIF IFD
-            exif_offset = tags.get('{} ExifOffset'.format(ifd_name))
-            if exif_offset:
-                logger.debug(
-                    'EXIF SubIFD at offset {:d}:'.format(exif_offset.value))
-                self._extract_tags(
-                    tags=tags,
-                    ifd=exif_offset.value,
-                    ifd_name='EXIF')
-
-                # Interoperability IFD contained in EXIF IFD
-                intr_offset = tags.get('EXIF SubIFD InteroperabilityOffset')
-                if intr_offset:
-                    logger.debug(
-                        'EXIF Interoperability SubSubIFD at offset {:d}:'
-                        ''.format(intr_offset.value))
-                    self._extract_tags(
-                        tags=tags,
-                        ifd=intr_offset.value,
-                        ifd_name='EXIF Interoperability',
-                        tags_library=INTR_TAGS)
-
-            # # GPS IFD
-            gps_offset = tags.get('{} GPSInfo'.format(ifd_name))
-            if gps_offset:
-                logger.debug('GPS SubIFD at offset {:d}:'
-                             ''.format(gps_offset.value))
-                self._extract_tags(
-                    tags=tags,
-                    ifd=gps_offset.value,
-                    ifd_name='GPS',
-                    tags_library=GPS_TAGS)
-            ctr += 1
+            self._extract_ifd(tags, ifd=i, ifd_name=ifd_name, visited=visited)
+
+        self._budget.checkpoint()
 
         # # Extract uncompressed TIFF thumbnail
         thumb = tags.get('Thumbnail Compression')
@@ -249,30 +709,298 @@ class ExifHeader():
 
         # # JPEG thumbnail (thankfully the JPEG data is stored as a unit)
         thumb_off = tags.get('Thumbnail JPEGInterchangeFormat')
-        if thumb_off:
-            self.file.seek(self.offset + thumb_off.value)
-            size = tags['Thumbnail JPEGInterchangeFormatLength'].value
-            tags['JPEGThumbnail'] = self.file.read(size)
+        thumb_len = tags.get('Thumbnail JPEGInterchangeFormatLength')
+        if thumb_off and thumb_len:
+            if self._in_bounds(thumb_off.value, thumb_len.value):
+                tags['JPEGThumbnail'] = self._read(
+                    thumb_off.value, thumb_len.value)
+            else:
+                self._bad_data('JPEG thumbnail is out of bounds')
 
-        # # Deal with MakerNote contained in EXIF IFD
+        # # Deal with MakerNote contained in EXIF IFD, when needed
         # # (Some apps use MakerNote tags but do not use a format for which we
         # # have a description, do not process these).
         if self.detailed and \
+                self._wants('MakerNote ') and \
                 ('EXIF MakerNote' in tags) and \
                 ('Image Make' in tags):
+            tags.defer(self._extract_maker_note,
+                       ('MakerNote ', 'JPEGThumbnail'))
+
+    def iter_tags(self):
+        """
+        Walk the IFDs, yielding a :py:class:`TagEvent` for each entry as
+        it is found, without building :py:class:`IFD_Tag` objects nor
+        reading the values that are not asked for. Sub-IFDs (EXIF,
+        Interoperability, GPS) follow the IFD pointing to them; the
+        MakerNote and thumbnails are not decoded.
+
+        Stop iterating as soon as the wanted tags were seen: the rest of
+        the file is not read.
+        """
+        visited = set()
+        try:
+            for ctr, ifd in enumerate(self._walk_ifds()):
+                visited.add(ifd)
+                for event in self._iter_events(ifd, self._ifd_name(ctr),
+                                               visited):
+                    yield event
+        except ParseInterrupted as e:
+            logger.debug('Tags iteration interrupted: {}'.format(e))
+            self.incomplete = True
+
+    def _iter_events(self, ifd, ifd_name, visited, tags_library=None,
+                     depth=0):
+        """The events of an IFD, then of the sub-IFDs it points to"""
+        ctx = self._context
+        pointers = []
+        for tag, tag_entry, tag_name, field_type, values_count, offset \
+                in self._iter_entries(ifd, ifd_name, tags_library, ctx,
+                                      depth):
+            value = RawValue(self, ctx, field_type, values_count, offset)
+            if tag in SUB_IFD_POINTERS:
+                pointers.append((tag, value))
+            yield TagEvent(ifd_name, tag, tag_name, field_type,
+                           values_count, value)
+
+        for tag, value in pointers:
+            sub_name, sub_library, sub_depth = SUB_IFD_POINTERS[tag]
+            if value.field_type not in IFD_POINTER_TYPES:
+                self._bad_data('{} IFD pointer has invalid type {:d}'
+                               ''.format(sub_name, value.field_type))
+                continue
+            values = value.decode()
+            if not values:
+                continue
+            sub_ifd = values[0]
+            if sub_ifd in visited:
+                self._bad_data('{} IFD at offset {:d} was already decoded'
+                               ''.format(sub_name, sub_ifd))
+                continue
+            visited.add(sub_ifd)
+            for event in self._iter_events(sub_ifd, sub_name, visited,
+                                           sub_library, sub_depth):
+                yield event
+
+    @lazy_property
+    def makernote(self):
+        """
+        The MakerNote tags, by name without the ``MakerNote`` prefix;
+        decodes the MakerNote on first access.
+        """
+        prefix = 'MakerNote '
+        return dict((name[len(prefix):], tag)
+                    for name, tag in self.tags.items()
+                    if name.startswith(prefix))
+
+    def _extract_maker_note(self, tags):
+        """Decode the MakerNote into ``tags``, deferred from ``tags``"""
+        logger.debug('Running MakerNote extraction')
+        try:
+            self._budget.checkpoint()
             self._decode_maker_note(tags)
+        except ParseInterrupted as e:
+            logger.debug('MakerNote extraction interrupted: {}'.format(e))
+            self.incomplete = True
+        finally:
+            self._budget.pause()
 
         # # Sometimes in a TIFF file, a JPEG thumbnail is hidden in the MakerNote
         # # since it's not allowed in a uncompressed TIFF IFD
         if 'JPEGThumbnail' not in tags:
             thumb_off = tags.get('MakerNote JPEGThumbnail')
             if thumb_off:
-                self.file.seek(self.offset + thumb_off.value)
-                tags['JPEGThumbnail'] = file.read(thumb_off.field_length)
+                tags['JPEGThumbnail'] = self._read(
+                    thumb_off.value, thumb_off.field_length)
+
+    @staticmethod
+    def _ifd_name(index):
+        """Name of the ``index``-th IFD of the main chain"""
+        if index == 0:
+            return 'Image'
+        elif index == 1:
+            return 'Thumbnail'
+        return 'IFD {}'.format(index)
+
+    def _extract_ifd(self, tags, ifd, ifd_name, visited=None):
+        """
+        Extract tags from an IFD of the main chain and its sub-IFDs
+
+        :param visited: set of the IFD offsets decoded so far, so that
+            sub-IFD pointers are not followed twice
+        """
+        if visited is None:
+            visited = set()
+        visited.add(ifd)
+
+        self._extract_tags(tags, ifd=ifd, ifd_name=ifd_name)
+
+        # # EXIF IFD
+        if self._extract_sub_ifd(
+                tags, tags.get('{} ExifOffset'.format(ifd_name)),
+                'EXIF', visited):
+
+            # Interoperability IFD contained in EXIF IFD
+            self._extract_sub_ifd(
+                tags, tags.get('EXIF InteroperabilityOffset'),
+                'EXIF Interoperability', visited,
+                tags_library=INTR_TAGS, depth=2)
+
+        # # GPS IFD
+        self._extract_sub_ifd(
+            tags, tags.get('{} GPSInfo'.format(ifd_name)),
+            'GPS', visited, tags_library=GPS_TAGS)
+
+    def _extract_sub_ifd(self, tags, pointer, ifd_name, visited,
+                         tags_library=None, depth=1):
+        """
+        Extract the sub-IFD the ``pointer`` tag points to, unless it was
+        already visited. Returns whether the sub-IFD was decoded.
+        """
+        if not pointer or not self._wants(ifd_name + ' '):
+            return False
+        if pointer.field_type not in IFD_POINTER_TYPES:
+            self._bad_data('{} IFD pointer has invalid type {:d}'
+                           ''.format(ifd_name, pointer.field_type))
+            return False
+        if not pointer.values:
+            self._bad_data('{} IFD pointer has no value'.format(ifd_name))
+            return False
+
+        ifd = pointer.value
+        if ifd in visited:
+            self._bad_data('{} IFD at offset {:d} was already decoded'
+                           ''.format(ifd_name, ifd))
+            return False
+        visited.add(ifd)
+
+        logger.debug('{} SubIFD at offset {:d}:'.format(ifd_name, ifd))
+        self._extract_tags(tags, ifd=ifd, ifd_name=ifd_name,
+                           tags_library=tags_library, depth=depth)
+        return True
+
+    @lazy_property
+    def bigtiff(self):
+        """Whether the TIFF structure uses BigTIFF (64-bit offsets)"""
+        return self._read_int(2, 2) == 43
+
+    @lazy_property
+    def _tiff_layout(self):
+        """Sizes of (entry count, IFD entry, offset) for this TIFF flavour"""
+        if self.bigtiff:
+            return BIGTIFF_LAYOUT
+        return TIFF_LAYOUT
+
+    @property
+    def ifd_offsets(self):
+        """
+        Offsets of the IFDs in the main chain (ie. one per page in
+        multi-page TIFFs), without decoding them.
 
+        Chains pointing back to an already visited IFD are cut there.
+        """
+        return list(self._walk_ifds())
+
+    def _walk_ifds(self):
+        """
+        Yield the offsets of the IFDs in the main chain, reading the chain
+        only as far as it is consumed (the offsets found are kept, it is
+        read once).
+        """
+        index = 0
+        while True:
+            with self._chain_lock:
+                if index == len(self._chain) and not self._extend_chain():
+                    return
+                ifd = self._chain[index]
+            yield ifd
+            index += 1
+
+    def _extend_chain(self):
+        """Find the next IFD of the main chain; returns False at its end"""
+        if self._chain_next is None:
+            self._chain_next = self._first_ifd()
+        ifd = self._chain_next
+        if not ifd:
+            return False
+        if ifd in self._chain_visited:
+            self._bad_data('IFD chain loops back to offset {:d}'.format(ifd))
+            self._chain_next = 0
+            return False
+
+        # # Counted as walked (not as decoded), so that crafted chains
+        # # stop at the limit
+        count_len, entry_len, offset_len = self._tiff_layout
+        if not self._in_bounds(ifd, count_len):
+            self._chain_next = 0
+            self._bad_data('IFD at offset {:d} is out of bounds'.format(ifd))
+            return False
+        entries = self._read_int(ifd, count_len)
+        self._budget.add_ifd(entries)
+        next_field = ifd + count_len + entry_len * entries
+        if self._in_bounds(next_field, offset_len):
+            self._chain_next = self._read_int(next_field, offset_len)
+        else:
+            # # What is left of this IFD is still decoded, the chain ends
+            self._chain_next = 0
+            self._bad_data('IFD at offset {:d} is truncated'.format(ifd))
+        self._chain.append(ifd)
+        self._chain_visited.add(ifd)
+        return True
+
+    @property
+    def page_count(self):
+        """Number of IFDs in the main chain"""
+        return len(self.ifd_offsets)
+
+    def page_tags(self, index):
+        """
+        Decode only the ``index``-th IFD of the main chain (and its
+        sub-IFDs), returning a new dictionary of tags.
+
+        If decoding is interrupted, the tags decoded so far are returned
+        and the header is flagged as ``incomplete``.
+        """
+        tags = {}
+        try:
+            self._extract_ifd(tags, self.ifd_offsets[index],
+                              self._ifd_name(index))
+        except ParseInterrupted as e:
+            logger.debug('Page extraction interrupted: {}'.format(e))
+            self.incomplete = True
         return tags
 
-    def _read_int(self, offset, length, signed=False):
+    def _bad_data(self, message):
+        """Report malformed data: raise in strict mode, warn otherwise"""
+        if self.strict:
+            raise ValueError(message)
+        warnings.warn(message)
+
+    @property
+    def _file_size(self):
+        return self._reader.size
+
+    @lazy_property
+    def _context(self):
+        """Context of the main IFDs"""
+        return IFDContext(self.offset, self.endian, self._tiff_layout)
+
+    def _in_bounds(self, offset, length, ctx=None):
+        """Whether ``length`` bytes at ``offset`` are all within the file"""
+        base = self.offset if ctx is None else ctx.base
+        return 0 <= offset and base + offset + length <= self._file_size
+
+    def _read(self, offset, length, ctx=None):
+        """
+        Read ``length`` bytes at ``offset`` (relative to the start of the
+        EXIF information, or to the base of ``ctx``), accounting them
+        against the limits.
+        """
+        base = self.offset if ctx is None else ctx.base
+        self._budget.add_bytes(length)
+        return self._reader.read_at(base + offset, length)
+
+    def _read_int(self, offset, length, signed=False, ctx=None):
         """
         Reads ``length`` characters from the relative offset ``offset``.
         Converts the number to integer depending on found endianness.
@@ -281,15 +1009,25 @@ class ExifHeader():
         Usually this offset is assumed to be relative to the beginning of the
         start of the EXIF information.
         For some cameras that use relative tags, this offset may be relative
-        to some other starting point.
+        to some other starting point, given by ``ctx``.
         """
-        self.file.seek(self.offset + offset)
-        chunk = self.file.read(length)
-        if self.endian == 'I':
+        chunk = self._read(offset, length, ctx)
+        endian = self.endian if ctx is None else ctx.endian
+        if endian == 'I':
             return unpack_intel(chunk, signed=signed)
         else:
             return unpack_motorola(chunk, signed=signed)
 
+    def _read_ints(self, offset, length, count, signed=False, ctx=None):
+        """
+        Reads ``count`` integers of ``length`` bytes each, starting from
+        the relative offset ``offset``, with a single read.
+        """
+        chunk = self._read(offset, length * count, ctx)
+        endian = self.endian if ctx is None else ctx.endian
+        return decode_ints(chunk, length, signed=signed,
+                           little_endian=(endian == 'I'))
+
     def _encode_int(self, number, length):
         """
         Convert an int to its binary representation, considering endianness
@@ -300,46 +1038,70 @@ class ExifHeader():
             return pack_motorola(number, length=length)
 
     def _first_ifd(self):
-        """Return first IFD"""
-        return self._read_int(4, 4)
+        """Return first IFD (0, ie. none, if the file is truncated)"""
+        if self.bigtiff:
+            offset, length = 8, 8
+        else:
+            offset, length = 4, 4
+        if not self._in_bounds(offset, length):
+            self._bad_data('TIFF header is truncated')
+            return 0
+        return self._read_int(offset, length)
 
     def _next_ifd(self, ifd):
         """Return pointer to next IFD, afther the specified one"""
-        entries = self._read_int(ifd, 2)
-        next_ifd = self._read_int(ifd + 2 + 12 * entries, 4)
-        if next_ifd == ifd:
-            return 0
-        else:
-            return next_ifd
+        count_len, entry_len, offset_len = self._tiff_layout
+        entries = self._read_int(ifd, count_len)
+        return self._read_int(ifd + count_len + entry_len * entries,
+                              offset_len)
 
     def _list_ifds(self):
-        """Return list of IFDs in header"""
-        # todo: refactor this..
-        i = self._first_ifd()
-        while i:
-            yield i
-            i = self._next_ifd(i)
+        """Return the IFDs in header, walking the chain as they are consumed"""
+        return self._walk_ifds()
 
-    def _extract_tags(self, tags, ifd, ifd_name, tags_library=None, relative=0):
-        """Extract IFD tags and add to tags
+    def _iter_entries(self, ifd, ifd_name, tags_library=None, ctx=None,
+                      depth=0):
+        """
+        Walk the entries of an IFD, without reading their values.
 
-        :param tags: Dictionary of extracted tags
-        :param ifd: The initial offset from which we start reading
-        :param ifd_name:
-        :param tags_library: EXIF tags database
-        :param relative:
+        Yields ``(tag, tag_entry, tag_name, field_type, values_count,
+        offset)`` for each valid entry, ``offset`` being that of its
+        values; see :py:meth:`_extract_tags` for the arguments.
         """
 
         if tags_library is None:
             tags_library = EXIF_TAGS
 
+        if ctx is None:
+            ctx = self._context
+        count_len, entry_len, offset_len = ctx.layout
+
+        if not self._in_bounds(ifd, count_len, ctx):
+            self._bad_data('{} IFD at offset {:d} is out of bounds'
+                           ''.format(ifd_name, ifd))
+            return
+
         # # The number of tags we expect to read
-        entries_count = self._read_int(ifd, 2)
+        entries_count = self._read_int(ifd, count_len, ctx=ctx)
+
+        # # Don't trust the count further than the end of file
+        max_entries = (self._file_size - ctx.base - ifd - count_len) \
+            // entry_len
+        if entries_count > max_entries:
+            self._bad_data('{} IFD at offset {:d} is truncated'
+                           ''.format(ifd_name, ifd))
+            entries_count = max_entries
+
+        if depth:
+            self._budget.add_ifd(entries_count, depth)
+        else:
+            # # The IFDs of the main chain are counted as it is walked
+            self._budget.checkpoint()
 
-        for i in xrange(entries_count):
+        for i in range(entries_count):
             # # Entry is index of start of this IFD in the file
-            entry = ifd + 2 + (12 * i)
-            tag = self._read_int(entry, 2)
+            entry = ifd + count_len + (entry_len * i)
+            tag = self._read_int(entry, 2, ctx=ctx)
 
             # # Get tag name early to avoid errors, help debug
             tag_entry = tags_library.get(tag)
@@ -350,147 +1112,167 @@ class ExifHeader():
 
             # # ignore certain tags for faster processing
             # if not (not self.detailed and tag in IGNORE_TAGS):  # <-- WTF?
-            if self.detailed or tag not in IGNORE_TAGS:
-                field_type = self._read_int(entry + 2, 2)
-
-                if field_type not in FIELD_TYPES:
-                    # # We found an unknown field type
-                    message = 'Unknown type {:d} in tag 0x{:04X}' \
-                              ''.format(field_type, tag)
-                    if self.strict:
-                        raise ValueError(message)
-                    else:
-                        warnings.warn(message)
-                        continue  # Just skip
-
-                # # Get the field length for this type
-                type_len = FIELD_TYPES[field_type][0]
-
-                # # Amount of values for this field
-                values_count = self._read_int(entry + 4, 4)
-
-                # # Adjust for tag id/type/value_count (2+2+4 bytes)
-                # # Now we point at either the data or the 2nd level offset
-                offset = entry + 8
-
-                # # If the value fits in 4 bytes, it is inlined, else we
-                # # need to jump ahead again.
-                if (values_count * type_len) > 4:
-                    # # offset is not the value; it's a pointer to the value
-                    # # if relative we set things up so s2n will seek to the
-                    # # right place when it adds self.offset.
-                    # # Note that this 'relative' is for the Nikon type 3
-                    # # makernote.
-                    # # Other cameras may use other relative offsets, which
-                    # # would have to be computed here slightly differently.
-                    if relative:
-                        tmp_offset = self._read_int(offset, 4)
-                        offset = tmp_offset + ifd - 8
-                        if self.fake_exif:
-                            offset += 18
-                    else:
-                        offset = self._read_int(offset, 4)
-
-                field_offset = offset
-                values = None
-
-                if field_type == FT_ASCII:
-                    # # Special case: null-terminated ASCII string
-                    # # todo: investigate
-                    # # Sometimes gets too big to fit in int value (in Python??)
-
-                    if values_count > 0:
-                        # # Was: and value_count < (2**31):
-                        # # but 2E31 is hardware dependant. --gd
-                        try:
-                            self.file.seek(self.offset + offset)
-                            values = self.file.read(values_count)
-                            # # Drop any garbage after a null.
-                            try:
-                                zeroidx = values.index('\x00')
-                            except ValueError:  # No zero in values
-                                pass
-                            else:
-                                values = values[:zeroidx]
-                            values = [values]  # Must be a list..
-
-                        except OverflowError:  # Why??
-                            values = []
+            if not self.detailed and tag in IGNORE_TAGS:
+                continue
+
+            field_type = self._read_int(entry + 2, 2, ctx=ctx)
 
+            if field_type not in FIELD_TYPES:
+                # # We found an unknown field type
+                message = 'Unknown type {:d} in tag 0x{:04X}' \
+                          ''.format(field_type, tag)
+                if self.strict:
+                    raise ValueError(message)
                 else:
-                    signed_types = (
-                        FT_SIGNED_BYTE,
-                        FT_SIGNED_SHORT,
-                        FT_SIGNED_LONG,
-                        FT_SIGNED_RATIO,
-                    )
+                    warnings.warn(message)
+                    continue  # Just skip
+
+            # # Get the field length for this type
+            type_len = FIELD_TYPES[field_type][0]
+
+            # # Amount of values for this field
+            values_count = self._read_int(entry + 4, offset_len, ctx=ctx)
+
+            # # Adjust for tag id/type/value_count (2+2+4 bytes)
+            # # Now we point at either the data or the 2nd level offset
+            offset = entry + 4 + offset_len
+
+            # # If the value fits in 4 bytes (8 for BigTIFF), it is
+            # # inlined, else we need to jump ahead again.
+            if (values_count * type_len) > offset_len:
+                # # offset is not the value; it's a pointer to the value,
+                # # relative to the base of the context
+                offset = self._read_int(offset, offset_len, ctx=ctx)
+
+            if not self._in_bounds(offset, values_count * type_len, ctx):
+                self._bad_data('Values of tag {} are out of bounds'
+                               ''.format(tag_name))
+                continue
+
+            if values_count > 1000 and field_type != FT_ASCII:
+                # # todo: investigate this:
+                # # some entries get too big to handle could be malformed
+                # # file or problem with self.s2n
+                # values_count = 1000
+                if tag_name != 'MakerNote':
+                    warnings.warn(
+                        "Encountered tag {} with > 1000 values "
+                        "({} found). Limiting to 1000."
+                        "".format(tag_name, values_count))
+                    values_count = 1000
+
+            yield tag, tag_entry, tag_name, field_type, values_count, offset
+
+    def _read_values(self, field_type, values_count, offset, ctx=None):
+        """
+        Read the values of an IFD entry: a list, or ``bytes`` for BYTE
+        and UNDEFINED fields (see :py:meth:`_iter_entries`).
+        """
+        type_len = FIELD_TYPES[field_type][0]
+        values = None
+
+        if field_type == FT_ASCII:
+            # # Special case: null-terminated ASCII string
+            # # todo: investigate
+            # # Sometimes gets too big to fit in int value (in Python??)
+
+            if values_count > 0:
+                # # Was: and value_count < (2**31):
+                # # but 2E31 is hardware dependant. --gd
+                try:
+                    self._budget.add_values(values_count)
+                    values = self._read(offset, values_count, ctx)
+                    # # Drop any garbage after a null.
+                    try:
+                        zeroidx = values.index(b'\x00')
+                    except ValueError:  # No zero in values
+                        pass
+                    else:
+                        values = values[:zeroidx]
+                    values = [values]  # Must be a list..
+
+                except OverflowError:  # Why??
                     values = []
-                    signed = (field_type in signed_types)
-
-                    if values_count > 1000:
-                        # # todo: investigate this:
-                        # # some entries get too big to handle could be malformed
-                        # # file or problem with self.s2n
-                        # values_count = 1000
-                        if tag_name != 'MakerNote':
-                            warnings.warn(
-                                "Encountered tag {} with > 1000 values "
-                                "({} found). Limiting to 1000."
-                                "".format(tag_name, values_count))
-                            values_count = 1000
-
-                    for dummy in xrange(values_count):
-                        if field_type in (FT_RATIO, FT_SIGNED_RATIO):
-                            # # This is a ratio
-                            value = Ratio(
-                                self._read_int(offset, 4, signed),
-                                self._read_int(offset + 4, 4, signed))
-                        else:
-                            # # This is an int
-                            value = self._read_int(offset, type_len, signed)
-
-                        values.append(value)
-                        offset += type_len
-
-
-                # ## Now 'values' is either a string or an array
-                # ## todo: WTF???
-                # if value_count == 1 and field_type != FT_ASCII:
-                #     printable = str(values[0])
-                #
-                # elif value_count > 50 and len(values) > 20:
-                #     printable = str(values[0:20])[0:-1] + ", ... ]"
-                #
-                # else:
-                #     printable = str(values)
-                #
-                # ## Compute printable version of values
-                # ## todo: this should be generated by the tag at need...
-                # if tag_entry:
-                #     if len(tag_entry) != 1:
-                #         # optional 2nd tag element is present
-                #         if callable(tag_entry[1]):
-                #             # call mapping function
-                #             printable = tag_entry[1](values)
-                #         else:
-                #             printable = ''
-                #             for i in values:
-                #                 # use lookup table for this tag
-                #                 printable += tag_entry[1].get(i, repr(i))
-
-                _tag_name = '{} {}'.format(ifd_name, tag_name)
-
-                new_tag = IFD_Tag(
-                    tag=tag,
-                    field_type=field_type,
-                    values=values,
-                    field_offset=field_offset,
-                    field_length=values_count * type_len,
-                    tag_entry=tag_entry)
-
-                logger.debug('Added tag: {}: {!r}'.format(tag_name, new_tag))
-
-                tags[_tag_name] = new_tag
+
+        else:
+            signed_types = (
+                FT_SIGNED_BYTE,
+                FT_SIGNED_SHORT,
+                FT_SIGNED_LONG,
+                FT_SIGNED_RATIO,
+                FT_SIGNED_LONG8,
+            )
+            signed = (field_type in signed_types)
+
+            self._budget.add_values(values_count)
+
+            # # All the values are read at once
+            if field_type in (FT_BYTE, FT_UNDEFINED):
+                # # Kept as bytes, see IFD_Tag.as_list()
+                values = self._read(offset, values_count, ctx)
+
+            elif field_type in (FT_RATIO, FT_SIGNED_RATIO):
+                # # Pairs of numerator, denominator
+                ints = self._read_ints(offset, 4, values_count * 2,
+                                       signed, ctx)
+                values = [Ratio(num, den) for num, den
+                          in zip(ints[0::2], ints[1::2])]
+
+            elif type_len:
+                values = list(self._read_ints(
+                    offset, type_len, values_count, signed, ctx))
+
+            else:
+                # # Proprietary type, nothing to read
+                values = []
+
+        return values
+
+    def _extract_tags(self, tags, ifd, ifd_name, tags_library=None, ctx=None,
+                      depth=0):
+        """Extract IFD tags and add to tags
+
+        :param tags: Dictionary of extracted tags
+        :param ifd: The initial offset from which we start reading
+        :param ifd_name:
+        :param tags_library: EXIF tags database
+        :param ctx: :py:class:`IFDContext` to read the IFD with, by
+            default the one of the main IFDs
+        :param depth: Nesting level of this IFD, checked against the limits
+        """
+
+        # # With a selection, the values of the other tags are not read
+        # # (MakerNotes are only decoded when selected, and their decoders
+        # # may need any of their tags)
+        selection = self.selection
+        if ifd_name.startswith('MakerNote'):
+            selection = None
+
+        entries = self._iter_entries(ifd, ifd_name, tags_library, ctx, depth)
+        for tag, tag_entry, tag_name, field_type, values_count, offset \
+                in entries:
+
+            _tag_name = '{} {}'.format(ifd_name, tag_name)
+            if selection is not None and _tag_name not in selection \
+                    and tag not in REQUIRED_TAGS:
+                continue
+
+            values = self._read_values(field_type, values_count, offset, ctx)
+
+            new_tag = IFD_Tag(
+                tag=tag,
+                field_type=field_type,
+                values=values,
+                field_offset=offset,
+                field_length=values_count * FIELD_TYPES[field_type][0],
+                tag_entry=tag_entry)
+
+            if logger.isEnabledFor(logging.DEBUG):
+                # # The repr computes the printable value
+                logger.debug('Added tag: {}: {!r}'.format(tag_name,
+                                                          new_tag))
+
+            tags[_tag_name] = new_tag
 
     def _extract_tiff_thumbnail(self, tags, thumb_ifd):
         """
@@ -498,70 +1280,75 @@ class ExifHeader():
         We take advantage of the pre-existing layout in the thumbnail IFD as
         much as possible
         """
-        entries = self._read_int(thumb_ifd, 2)
+        # # Same layout as the file (BigTIFF or not)
+        count_len, entry_len, offset_len = self._tiff_layout
+        entries = self._read_int(thumb_ifd, count_len)
         # this is header plus offset to IFD ...
-        if self.endian == 'M':
-            tiff = 'MM\x00*\x00\x00\x00\x08'
+        if self.bigtiff:
+            magic = b'MM\x00+' if self.endian == 'M' else b'II+\x00'
+            tiff = magic + self._encode_int(8, 2) + b'\x00\x00' \
+                + self._encode_int(16, 8)
+        elif self.endian == 'M':
+            tiff = b'MM\x00*\x00\x00\x00\x08'
         else:
-            tiff = 'II*\x00\x08\x00\x00\x00'
-            # ... plus thumbnail IFD data plus a null "next IFD" pointer
-        self.file.seek(self.offset + thumb_ifd)
-        tiff += self.file.read(entries * 12 + 2) + '\x00\x00\x00\x00'
+            tiff = b'II*\x00\x08\x00\x00\x00'
+        header_len = len(tiff)
+        # ... plus thumbnail IFD data plus a null "next IFD" pointer
+        tiff += self._read(thumb_ifd, count_len + entries * entry_len) \
+            + b'\x00' * offset_len
 
         # fix up large value offset pointers into data area
 
         strip_off = None  # todo: handle this properly!!
 
         for i in range(entries):
-            entry = thumb_ifd + 2 + 12 * i
+            entry = thumb_ifd + count_len + entry_len * i
             tag = self._read_int(entry, 2)
             field_type = self._read_int(entry + 2, 2)
             typelen = FIELD_TYPES[field_type][0]
-            count = self._read_int(entry + 4, 4)
-            oldoff = self._read_int(entry + 8, 4)
-            # start of the 4-byte pointer area in entry
-            ptr = i * 12 + 18
+            count = self._read_int(entry + 4, offset_len)
+            oldoff = self._read_int(entry + 4 + offset_len, offset_len)
+            # start of the pointer area in entry
+            ptr = header_len + count_len + i * entry_len + 4 + offset_len
             # remember strip offsets location
             if tag == 0x0111:
                 strip_off = ptr
-                strip_len = count * typelen
+                strip_len = typelen
                 # is it in the data area?
-            if count * typelen > 4:
+            if count * typelen > offset_len:
                 # update offset pointer (nasty "strings are immutable" crap)
                 # should be able to say "tiff[ptr:ptr+4]=newoff"
                 newoff = len(tiff)
 
                 # tiff = tiff[:ptr] + self.n2s(newoff, 4) + tiff[ptr + 4:]
-                tiff = ''.join((
+                tiff = b''.join((
                     tiff[:ptr],
-                    self._encode_int(newoff, 4),
-                    tiff[ptr + 4:]
+                    self._encode_int(newoff, offset_len),
+                    tiff[ptr + offset_len:]
                 ))
 
                 # remember strip offsets location
                 if tag == 0x0111:
                     strip_off = newoff
-                    strip_len = 4
                     # get original data and store it
-                self.file.seek(self.offset + oldoff)
-                tiff += self.file.read(count * typelen)
+                tiff += self._read(oldoff, count * typelen)
 
         # add pixel strips and update strip offset info
         old_offsets = tags['Thumbnail StripOffsets'].values
         old_counts = tags['Thumbnail StripByteCounts'].values
         for i in range(len(old_offsets)):
+            self._budget.checkpoint()
             # update offset pointer (more nasty "strings are immutable" crap)
             offset = self._encode_int(len(tiff), strip_len)
             # tiff = tiff[:strip_off] + offset + tiff[strip_off + strip_len:]
-            tiff = ''.join((
+            tiff = b''.join((
                 tiff[:strip_off],
                 offset,
                 tiff[strip_off + strip_len:]
             ))
             strip_off += strip_len
             # add pixel strip to end
-            self.file.seek(self.offset + old_offsets[i])
-            tiff += self.file.read(old_counts[i])
+            tiff += self._read(old_offsets[i], old_counts[i])
 
         tags['TIFFThumbnail'] = tiff
 
@@ -593,97 +1380,34 @@ class ExifHeader():
         note = tags['EXIF MakerNote']
 
         # # Some apps use MakerNote tags but do not use a format for which we
-        # # have a description, so just do a raw dump for these.
-        make = tags['Image Make'].value
-
-        # model = tags['Image Model'].printable # unused
-
-        # # Nikon
-        # # The maker note usually starts with the word Nikon, followed by the
-        # # type of the makernote (1 or 2, as a short).  If the word Nikon is
-        # # not at the start of the makernote, it's probably type 2, since some
-        # # cameras work that way.
-        if 'NIKON' in make:
-            if note.values[0:7] == [78, 105, 107, 111, 110, 0, 1]:
-                logger.debug("Looks like a type 1 Nikon MakerNote.")
-                self._extract_tags(tags, note.field_offset + 8, 'MakerNote',
-                                   tags_library=MAKERNOTE_NIKON_OLDER_TAGS)
-            elif note.values[0:7] == [78, 105, 107, 111, 110, 0, 2]:
-                logger.debug("Looks like a labeled type 2 Nikon MakerNote")
-                _nv_12t14 = note.values[12:14]
-                if _nv_12t14 != [0, 42] and _nv_12t14 != [42, 0]:
-                    raise ValueError("Missing marker tag '42' in MakerNote.")
-                    # # Skip the Makernote label and the TIFF header
-                self._extract_tags(tags, note.field_offset + 10 + 8,
-                                   'MakerNote',
-                                   tags_library=MAKERNOTE_NIKON_NEWER_TAGS,
-                                   relative=1)
-            else:
-                # E99x or D1
-                logger.debug("Looks like an unlabeled type 2 Nikon MakerNote")
-                self._extract_tags(tags, note.field_offset, 'MakerNote',
-                                   tags_library=MAKERNOTE_NIKON_NEWER_TAGS)
-            return
+        # # have a description, do not process these.
+        make = tags['Image Make'].to_python
+        make = make[0].strip() if make else ''
 
-        # # Olympus
-        if make.startswith('OLYMPUS'):
-            self._extract_tags(tags, note.field_offset + 8, 'MakerNote',
-                               tags_library=MAKERNOTE_OLYMPUS_TAGS)
-            # XXX TODO
-            # for i in (('MakerNote Tag 0x2020', MAKERNOTE_OLYMPUS_TAG_0x2020),):
-            #    self.decode_olympus_tag(tags[i[0]].values, i[1])
-            # return
-
-        # # Casio
-        if 'CASIO' in make or 'Casio' in make:
-            self._extract_tags(tags, note.field_offset, 'MakerNote',
-                               tags_library=MAKERNOTE_CASIO_TAGS)
+        decoder = find_makernote_decoder(make, note.values)
+        if decoder is None:
+            logger.debug('No MakerNote decoder for make {!r}'.format(make))
             return
 
-        # # Fujifilm
-        if make == 'FUJIFILM':
-            # bug: everything else is "Motorola" endian, but the MakerNote
-            # is "Intel" endian
-            endian = self.endian
-            self.endian = 'I'
-            # bug: IFD offsets are from beginning of MakerNote, not
-            # beginning of file header
-            offset = self.offset
-            self.offset += note.field_offset
-            # process note with bogus values (note is actually at offset 12)
-            self._extract_tags(tags, 12, 'MakerNote',
-                               tags_library=MAKERNOTE_FUJIFILM_TAGS)
-            # reset to correct values
-            self.endian = endian
-            self.offset = offset
-            return
-
-        # # Canon
-        if make == 'Canon':
-            self._extract_tags(tags, note.field_offset, 'MakerNote',
-                               tags_library=MAKERNOTE_CANON_TAGS)
-            for i in (('MakerNote Tag 0x0001', MAKERNOTE_CANON_TAG_0x001),
-                      ('MakerNote Tag 0x0004', MAKERNOTE_CANON_TAG_0x004)):
-                if i[0] in tags:
-                    self._decode_canon_tag(tags, tags[i[0]].values, i[1])
-            return
+        decoder.decode(self, tags, note)
 
-    # XXX TODO decode Olympus MakerNote tag based on offset within tag
-    def _decode_olympus_tag(self, value, context):
-        pass
-
-    # decode Canon MakerNote tag based on offset within tag
-    # see http://www.burren.cx/david/canon.html by David Burren
-    def _decode_canon_tag(self, tags, value, context):
-        for i in range(1, len(value)):
-            x = context.get(i, ('Unknown',))
-            logger.debug('{!r} {!r}'.format(i, x))
-            name = x[0]
-            if len(x) > 1:
-                val = x[1].get(value[i], 'Unknown')
-            else:
-                val = value[i]
-                # it's not a real IFD Tag but we fake one to make everybody
-            # happy. this will have a "proprietary" type
-            tags['MakerNote {}'.format(name)] = \
-                IFD_Tag(values=[str(val)], tag=None, field_type=0)
+    def extract_makernote_ifd(self, tags, ifd, tags_library, base=0,
+                              endian=None, depth=2, ifd_name='MakerNote'):
+        """
+        Decode a MakerNote IFD into ``tags``, as ``MakerNote ...`` tags.
+        To be used by the MakerNote decoders.
+
+        :param ifd: Offset of the IFD, relative to ``base``
+        :param tags_library: Tags database of this MakerNote
+        :param base: Offset (relative to the EXIF header) the offsets in
+            the MakerNote are relative to, for those using relative
+            addressing
+        :param endian: Byte order of the MakerNote (``'I'`` or ``'M'``),
+            if not the same as the EXIF data
+        :param depth: Nesting level, 3 for a MakerNote sub-IFD
+        :param ifd_name: Prefix of the tag names
+        """
+        ctx = IFDContext(self.offset + base, endian or self.endian,
+                         TIFF_LAYOUT)
+        self._extract_tags(tags, ifd, ifd_name, tags_library=tags_library,
+                           ctx=ctx, depth=depth)
@@ -0,0 +1,95 @@
+"""
+py3exif Tag selection, to only decode the tags that are needed
+"""
+
+import re
+import fnmatch
+import threading
+
+__all__ = ['TagSelection', 'PRESETS']
+
+#: Named selections; ``None`` selects all the tags
+PRESETS = {
+    'basic': (
+        'Image Make', 'Image Model', 'Image Orientation', 'Image DateTime',
+        'EXIF DateTimeOriginal', 'EXIF ExifImageWidth',
+        'EXIF ExifImageLength',
+    ),
+    'gps': ('GPS *', ),
+    'camera': (
+        'Image Make', 'Image Model', 'EXIF ExposureTime', 'EXIF FNumber',
+        'EXIF ISOSpeedRatings', 'EXIF ExposureProgram', 'EXIF MeteringMode',
+        'EXIF Flash', 'EXIF FocalLength', 'EXIF LensModel', 'MakerNote *',
+    ),
+    'full': None,
+}
+
+# # Characters starting a wildcard in a glob pattern
+_WILDCARDS = re.compile(r'[*?\[]')
+
+
+class TagSelection(object):
+    """
+    A selection of tags, by name (eg. ``'EXIF DateTimeOriginal'``) or
+    shell-style pattern (eg. ``'GPS*'``), matched case-sensitively.
+
+    :param patterns: iterable of names and patterns
+    """
+
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+        self._regex = re.compile('|'.join(
+            fnmatch.translate(pattern) for pattern in self.patterns) or '$^')
+        # # Part of each pattern before its first wildcard
+        self._prefixes = tuple(_WILDCARDS.split(pattern, 1)[0]
+                               for pattern in self.patterns)
+        self._matches = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_names(cls, names):
+        """
+        Build a selection from names, patterns and :py:data:`PRESETS`
+        names; returns ``None`` (all the tags) if one of them is
+        ``'full'``.
+        """
+        patterns = []
+        for name in names:
+            if name in PRESETS:
+                if PRESETS[name] is None:
+                    return None
+                expanded = PRESETS[name]
+            else:
+                expanded = [name]
+            patterns.extend(p for p in expanded if p not in patterns)
+        return cls(patterns)
+
+    def __repr__(self):
+        return '<TagSelection {}>'.format(', '.join(self.patterns))
+
+    def __contains__(self, name):
+        try:
+            return self._matches[name]
+        except KeyError:
+            pass
+        matches = self._regex.match(name) is not None
+        with self._lock:
+            self._matches[name] = matches
+        return matches
+
+    def __reduce__(self):
+        return (type(self), (self.patterns, ))
+
+    def wants_prefix(self, prefix):
+        """
+        Whether names starting with ``prefix`` may be selected (eg. the
+        tags of an IFD, for ``'GPS '``); errs on the side of yes.
+        """
+        return any(p.startswith(prefix) or prefix.startswith(p)
+                   for p in self._prefixes)
+
+    @property
+    def exact_names(self):
+        """Whether the patterns are all plain names (without wildcards)"""
+        return all(p == pattern
+                   for p, pattern in zip(self._prefixes, self.patterns))
@@ -0,0 +1,401 @@
+"""
+py3exif Metadata service, answering requests on a Unix domain socket
+
+Tools that would run the command line tool once per file pay for the
+interpreter start-up and imports every time; a long-running service pays
+for them once.
+
+The protocol is newline-delimited JSON. Each request is an object with
+either a ``path`` or base64-encoded ``data``, and optionally an ``id``
+(copied into the response), ``select`` (tag names, patterns or presets,
+see :py:func:`py3exif.process_file`), ``detailed``, ``strict`` and
+``thumbnails``. Each response is the record of the file, as output by
+``py3exif -f json``. Requests can be pipelined: send many of them without
+waiting, the responses come back in the same order.
+
+The input is untrusted: decoding is bounded by :py:data:`DEFAULT_LIMITS`
+(see :py:class:`py3exif.ParseLimits`), and requests longer than
+:py:data:`MAX_REQUEST_SIZE` get an error response.
+
+Usage::
+
+    python -m py3exif.service serve /tmp/py3exif.sock
+    python -m py3exif.service parse /tmp/py3exif.sock image.jpg ...
+
+or, from a shell::
+
+    echo '{"path": "/photos/image.jpg"}' | socat - UNIX:/tmp/py3exif.sock
+"""
+
+import os
+import sys
+import json
+import stat
+import queue
+import base64
+import signal
+import socket
+import logging
+import argparse
+import threading
+import socketserver
+import concurrent.futures
+
+from py3exif import process_file, ParseLimits
+from py3exif.batch import FileResult, typed_values
+from py3exif.export import json_record
+
+logger = logging.getLogger('py3exif')
+
+__all__ = ['MetadataServer', 'ServiceClient', 'handle_request',
+           'DEFAULT_LIMITS', 'MAX_REQUEST_SIZE']
+
+#: Limits on the decoding of each file, by default
+DEFAULT_LIMITS = ParseLimits(max_ifds=1000, max_entries=4096,
+                             max_values=1000000, max_bytes=16 * 1024 * 1024,
+                             max_depth=4, max_time=10)
+
+#: Maximum size of a request line, in bytes, by default
+MAX_REQUEST_SIZE = 64 * 1024 * 1024
+
+
+def handle_request(request, limits=DEFAULT_LIMITS):
+    """
+    Process a request, returning the response (see the module docs)
+
+    :param limits: the :py:class:`ParseLimits` of the decoding
+    """
+    path = request.get('path')
+    options = {
+        'detailed': request.get('detailed', True),
+        'strict': request.get('strict', False),
+        'select': request.get('select'),
+        'limits': limits,
+    }
+    thumbnails = request.get('thumbnails', False)
+    try:
+        if request.get('data') is not None:
+            data = base64.b64decode(request['data'])
+            header = process_file(data, **options)
+            values = typed_values(header, thumbnails)
+        elif path is not None:
+            with open(path, 'rb') as fileobj:
+                header = process_file(fileobj, **options)
+                values = typed_values(header, thumbnails)
+        else:
+            raise ValueError('A path or data is required')
+        result = FileResult(path, values, None)
+    except Exception as e:
+        logger.debug('Failed to process {}'.format(path), exc_info=True)
+        result = FileResult(path, {}, '{}: {}'.format(type(e).__name__, e))
+
+    response = json_record(result)
+    response['id'] = request.get('id')
+    return response
+
+
+def _error_response(message, request_id=None):
+    return {'id': request_id, 'path': None, 'error': message, 'tags': {}}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handles the requests of a connection: they are handed to the worker
+    pool as they are read, and a writer thread sends the responses back
+    in order.
+    """
+
+    def handle(self):
+        # # Bounded, so that a client not reading its responses stalls
+        # # rather than piling them up
+        pending = queue.Queue(self.server.pipeline_depth)
+        writer = threading.Thread(target=self._write_responses,
+                                  args=(pending, ))
+        writer.start()
+        max_size = self.server.max_request_size
+        try:
+            while True:
+                line = self.rfile.readline(max_size + 1)
+                if not line:
+                    break
+                if len(line) > max_size:
+                    self._skip_line(line)
+                    pending.put(self._failed(
+                        'ValueError: Request too long (limit: {:d} bytes)'
+                        ''.format(max_size)))
+                    continue
+                if not line.strip():
+                    continue
+                pending.put(self._submit(line))
+        finally:
+            pending.put(None)
+            writer.join()
+
+    def _skip_line(self, line):
+        """Skip the rest of a line, without keeping it in memory"""
+        while line and not line.endswith(b'\n'):
+            line = self.rfile.readline(64 * 1024)
+
+    def _submit(self, line):
+        try:
+            request = json.loads(line.decode('utf-8'))
+            if not isinstance(request, dict):
+                raise ValueError('not an object')
+        except ValueError as e:
+            return self._failed('ValueError: Invalid request: {}'.format(e))
+        return self.server.executor.submit(handle_request, request,
+                                           self.server.limits)
+
+    @staticmethod
+    def _failed(message):
+        future = concurrent.futures.Future()
+        future.set_result(_error_response(message))
+        return future
+
+    def _write_responses(self, pending):
+        connected = True
+        while True:
+            future = pending.get()
+            if future is None:
+                return
+            try:
+                response = future.result()
+            except Exception as e:
+                # # Eg. a worker process died
+                response = _error_response(
+                    '{}: {}'.format(type(e).__name__, e))
+            if not connected:
+                # # Keep consuming, so that the reader is not blocked
+                continue
+            try:
+                self.wfile.write(json.dumps(response, sort_keys=True)
+                                 .encode('utf-8') + b'\n')
+            except OSError as e:
+                logger.debug('Client went away: {}'.format(e))
+                connected = False
+
+
+class MetadataServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Serves parse requests on a Unix domain socket, one thread per
+    connection, processing them on a pool of worker threads (or
+    processes).
+
+    :param socket_path: path of the socket; a stale socket file left
+        there is replaced
+    :param jobs: number of workers (``None`` for the executor default)
+    :param processes: use worker processes rather than threads
+    :param pipeline_depth: maximum number of requests of a connection
+        being processed at once
+    :param limits: the :py:class:`ParseLimits` of the decoding of each
+        file
+    :param max_request_size: maximum size of a request line, in bytes
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, jobs=None, processes=False,
+                 pipeline_depth=64, limits=DEFAULT_LIMITS,
+                 max_request_size=MAX_REQUEST_SIZE):
+        self.socket_path = socket_path
+        self.pipeline_depth = pipeline_depth
+        self.limits = limits
+        self.max_request_size = max_request_size
+        _remove_stale_socket(socket_path)
+        if processes:
+            self.executor = concurrent.futures.ProcessPoolExecutor(jobs)
+        else:
+            self.executor = concurrent.futures.ThreadPoolExecutor(jobs)
+        try:
+            socketserver.ThreadingUnixStreamServer.__init__(
+                self, socket_path, _RequestHandler)
+        except Exception:
+            self.executor.shutdown()
+            raise
+
+    def server_close(self):
+        socketserver.ThreadingUnixStreamServer.server_close(self)
+        self.executor.shutdown()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+def _remove_stale_socket(socket_path):
+    """Remove a socket file no server listens on any more"""
+    try:
+        if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            return
+    except OSError:
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        logger.debug('Removing stale socket {}'.format(socket_path))
+        os.unlink(socket_path)
+    else:
+        raise OSError('A server is already listening on {}'
+                      ''.format(socket_path))
+    finally:
+        probe.close()
+
+
+class ServiceClient(object):
+    """
+    A connection to a :py:class:`MetadataServer`.
+
+    :param socket_path: path of the server socket
+    :param timeout: socket timeout, in seconds
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(socket_path)
+        self._rfile = self._socket.makefile('rb')
+
+    def close(self):
+        self._rfile.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def request(path=None, data=None, **options):
+        """Build a request for a file ``path``, or for ``data`` bytes"""
+        request = dict(options)
+        if data is not None:
+            request['data'] = base64.b64encode(data).decode('ascii')
+        else:
+            request['path'] = path
+        return request
+
+    def parse(self, path=None, data=None, **options):
+        """
+        Parse a file, by ``path`` (as seen by the server) or ``data``,
+        returning its record (see the module docs)
+        """
+        response, = self.parse_many([self.request(path, data, **options)])
+        return response
+
+    def parse_many(self, requests):
+        """
+        Send many requests (paths, or dicts from :py:meth:`request`)
+        without waiting, yielding the responses in order.
+        """
+        sent = []
+        lock = threading.Condition()
+
+        def send():
+            try:
+                for request in requests:
+                    if not isinstance(request, dict):
+                        request = self.request(request)
+                    line = json.dumps(request).encode('utf-8') + b'\n'
+                    self._socket.sendall(line)
+                    with lock:
+                        sent.append(True)
+                        lock.notify()
+            finally:
+                with lock:
+                    sent.append(None)
+                    lock.notify()
+
+        # # Requests are sent from another thread, so that neither end
+        # # blocks on a full socket buffer
+        sender = threading.Thread(target=send)
+        sender.daemon = True
+        sender.start()
+
+        index = 0
+        while True:
+            with lock:
+                while len(sent) <= index:
+                    lock.wait()
+                if sent[index] is None:
+                    break
+            index += 1
+            line = self._rfile.readline()
+            if not line:
+                raise ConnectionError('The server closed the connection')
+            yield json.loads(line.decode('utf-8'))
+        sender.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('-d', '--debug', action='store_true',
+                        help='log debug information')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    serve = commands.add_parser('serve', help='run the service')
+    serve.add_argument('socket', help='path of the socket')
+    serve.add_argument('-j', '--jobs', type=int, default=None,
+                       help='number of workers')
+    serve.add_argument('--processes', action='store_true',
+                       help='use worker processes rather than threads')
+    serve.add_argument('--max-time', type=float,
+                       default=DEFAULT_LIMITS.max_time,
+                       help='maximum time spent decoding a file, in seconds '
+                            '(default: %(default)s)')
+    serve.add_argument('--max-bytes', type=int,
+                       default=DEFAULT_LIMITS.max_bytes,
+                       help='maximum number of bytes read decoding a file '
+                            '(default: %(default)s)')
+    serve.add_argument('--max-request-size', type=int,
+                       default=MAX_REQUEST_SIZE,
+                       help='maximum size of a request, in bytes '
+                            '(default: %(default)s)')
+
+    parse = commands.add_parser(
+        'parse', help='parse files with a running service, writing one '
+                      'JSON object per file and line')
+    parse.add_argument('socket', help='path of the socket')
+    parse.add_argument('files', nargs='*',
+                       help='files to parse (default: read from stdin)')
+    parse.add_argument('--tags', default=None,
+                       help='comma-separated tags to decode')
+
+    args = parser.parse_args(argv)
+
+    logger.addHandler(logging.StreamHandler(sys.stderr))
+    logger.setLevel(logging.DEBUG if args.debug else logging.INFO)
+
+    if args.command == 'serve':
+        limits = ParseLimits(**dict(vars(DEFAULT_LIMITS),
+                                    max_time=args.max_time,
+                                    max_bytes=args.max_bytes))
+        server = MetadataServer(args.socket, jobs=args.jobs,
+                                processes=args.processes, limits=limits,
+                                max_request_size=args.max_request_size)
+        logger.info('Listening on {}'.format(args.socket))
+        # # Clean up on termination too
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+        try:
+            server.serve_forever()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            server.server_close()
+        return
+
+    options = {}
+    if args.tags:
+        options['select'] = [name.strip() for name in args.tags.split(',')]
+    files = args.files or (line.rstrip('\n') for line in sys.stdin)
+    requests = (ServiceClient.request(os.path.abspath(path), **options)
+                for path in files)
+    with ServiceClient(args.socket) as client:
+        for response in client.parse_many(requests):
+            sys.stdout.write(json.dumps(response, sort_keys=True) + '\n')
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
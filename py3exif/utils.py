@@ -1,38 +1,81 @@
 """
 py3exif Utilities
 """
+import io
 import os
+import stat
 import logging
 import struct
+import threading
+
+
+# # Deleted by make_string(): the non-printing (control) characters
+_NON_PRINTING = bytes(range(32))
+
+#: Codec of the ASCII values (which are often not ASCII): every byte
+#: decodes, as one character
+ASCII_CODEC = 'latin-1'
+
+
+def _as_bytes(seq):
+    if isinstance(seq, bytes):
+        return seq
+    if isinstance(seq, (bytearray, memoryview)):
+        return bytes(seq)
+    if all(isinstance(x, (bytes, bytearray)) for x in seq):
+        # # ASCII values: a list of strings
+        return b''.join(seq)
+    try:
+        return bytes(seq)
+    except ValueError:
+        # # Out of range characters are screened out
+        return bytes(c for c in seq if 0 <= c < 256)
 
 
 def make_string(seq):
     """
     Don't throw an exception when given an out of range character.
+    Non-printing characters are left out; if none is left, ``seq`` is
+    returned unchanged.
     """
-    # todo: this can be done way more efficiently!!
-    new_string = ''
-    for c in seq:
-        # Screen out non-printing characters
-        if 32 <= c < 256:
-            new_string += chr(c)
-            # If no printing chars
+    new_string = _as_bytes(seq).translate(None, _NON_PRINTING)
     if not new_string:
         return seq
-    return new_string
+    return new_string.decode(ASCII_CODEC)
+
+
+#: UserComment character codes (first 8 bytes) -> codec
+USER_COMMENT_CODES = {
+    b'ASCII\x00\x00\x00': ASCII_CODEC,
+    b'JIS\x00\x00\x00\x00\x00': 'shift_jis',
+    b'UNICODE\x00': 'utf-16',
+}
 
 
 def make_string_uc(seq):
     """
     Special version to deal with the code in the first 8 bytes of a
     user comment.
-    First 8 bytes gives coding system e.g. ASCII vs. JIS vs Unicode
+    First 8 bytes gives coding system e.g. ASCII vs. JIS vs Unicode;
+    undefined codes (eg. all zeros) are handled as ASCII.
     """
-    # code = seq[0:8]
-    seq = seq[8:]
-    # Of course, this is only correct if ASCII, and the standard explicitly
-    # allows JIS and Unicode.
-    return make_string(make_string(seq))
+    data = _as_bytes(seq)
+    code, data = data[:8], data[8:]
+    codec = USER_COMMENT_CODES.get(code, ASCII_CODEC)
+
+    if codec == ASCII_CODEC:
+        return data.translate(None, _NON_PRINTING).decode(codec)
+
+    if codec == 'utf-16' and data[:2] not in (b'\xff\xfe', b'\xfe\xff'):
+        # # No byte order mark: the byte order is the file one, which is
+        # # not known here; the high (zero) bytes of Latin text tell it
+        if data[0::2].count(0) > data[1::2].count(0):
+            codec = 'utf-16-be'
+        else:
+            codec = 'utf-16-le'
+        data = data[:len(data) & ~1]
+
+    return data.decode(codec, 'replace').rstrip('\x00 ')
 
 
 def _get_pack_format(size=4, signed=False, little_endian=False):
@@ -63,6 +106,15 @@ def decode_int(input_string, signed=False, little_endian=True):
     return struct.unpack(fmt, input_string)[0]
 
 
+def decode_ints(input_string, size, signed=False, little_endian=True):
+    """Decode a sequence of ``size``-bytes integers, as a tuple"""
+    count = len(input_string) // size
+    fmt = _get_pack_format(size=size, signed=signed,
+                           little_endian=little_endian)
+    fmt = '{}{:d}{}'.format(fmt[0], count, fmt[1:])
+    return struct.unpack(fmt, input_string[:count * size])
+
+
 def encode_int(number, size=4, signed=False, little_endian=True):
     fmt = _get_pack_format(size=size, signed=signed,
                            little_endian=little_endian)
@@ -102,6 +154,152 @@ def gcd(a, b):
         return gcd(b, a % b)
 
 
+class BufferReader(object):
+    """
+    Positional reads from an in-memory buffer (bytes, bytearray, or the
+    contents of a ``BytesIO``), by slicing a ``memoryview`` of it.
+    """
+
+    def __init__(self, data):
+        self._view = memoryview(data)
+        self.size = len(self._view)
+
+    def read_at(self, offset, size):
+        if offset < 0:
+            raise ValueError('negative read offset {:d}'.format(offset))
+        return self._view[offset:offset + size].tobytes()
+
+
+class FDReader(object):
+    """
+    Positional reads from a regular file, with ``os.pread()``: there is
+    no shared file position, so concurrent reads are safe.
+
+    :param fileobj: the file object owning ``fd``, if any: once it is
+        closed, reads fail (rather than reading whichever file was given
+        the same descriptor since)
+    """
+
+    def __init__(self, fd, fileobj=None):
+        self._fd = fd
+        self._fileobj = fileobj
+        self._closed = False
+        self.size = os.fstat(fd).st_size
+
+    @property
+    def closed(self):
+        return self._closed or \
+            (self._fileobj is not None and self._fileobj.closed)
+
+    def close(self):
+        """Stop reading, before the descriptor is closed by its owner"""
+        self._closed = True
+
+    def read_at(self, offset, size):
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+        if offset < 0:
+            raise ValueError('negative read offset {:d}'.format(offset))
+        # # Not past the end of file: a read ending there is a single call
+        size = min(size, self.size - offset)
+        chunks = []
+        while size > 0:
+            chunk = os.pread(self._fd, size, offset)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            offset += len(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+
+class SeekReader(object):
+    """
+    Positional reads from any other seekable file object, serialising
+    the ``seek()`` + ``read()`` pairs with a lock.
+    """
+
+    def __init__(self, fileobj, size=None):
+        self._fileobj = fileobj
+        self._lock = threading.Lock()
+        if size is not None:
+            # # Known already: seeking to the end may be costly (eg. in
+            # # compressed archive members)
+            self.size = size
+            return
+        with self._lock:
+            fileobj.seek(0, os.SEEK_END)
+            self.size = fileobj.tell()
+
+    def read_at(self, offset, size):
+        if offset < 0:
+            raise ValueError('negative read offset {:d}'.format(offset))
+        with self._lock:
+            self._fileobj.seek(offset)
+            return self._fileobj.read(size)
+
+
+class PrefixReader(object):
+    """
+    Wraps a reader, serving the reads within its first ``prefix_size``
+    bytes from a single (speculative) read of them; :py:meth:`extend`
+    reads more of the file into the prefix at once.
+    """
+
+    def __init__(self, reader, prefix_size):
+        self._reader = reader
+        self.size = reader.size
+        self.prefix = reader.read_at(0, prefix_size)
+
+    def extend(self, end):
+        """Read up to ``end`` into the prefix, with a single read"""
+        start = len(self.prefix)
+        end = min(end, self.size)
+        if end > start:
+            self.prefix += self._reader.read_at(start, end - start)
+
+    def read_at(self, offset, size):
+        if offset < 0:
+            raise ValueError('negative read offset {:d}'.format(offset))
+        end = offset + size
+        if end <= len(self.prefix) or len(self.prefix) == self.size:
+            return self.prefix[offset:end]
+        return self._reader.read_at(offset, size)
+
+
+def open_reader(fileobj):
+    """
+    Return a reader for positional access to ``fileobj`` (an object with
+    ``read_at(offset, size)`` and a ``size`` attribute): a file object,
+    or bytes-like data.
+    """
+    if isinstance(fileobj, (BufferReader, FDReader, SeekReader,
+                            PrefixReader)):
+        return fileobj
+
+    if isinstance(fileobj, (bytes, bytearray, memoryview)):
+        return BufferReader(fileobj)
+
+    if isinstance(fileobj, io.BytesIO):
+        # # Not getbuffer(): the BytesIO could not be closed (nor resized)
+        # # while the header holds on to it. getvalue() shares the buffer
+        # # until the BytesIO is written to.
+        return BufferReader(fileobj.getvalue())
+
+    if hasattr(os, 'pread'):
+        try:
+            fd = fileobj.fileno()
+            regular = stat.S_ISREG(os.fstat(fd).st_mode)
+        except (AttributeError, OSError, ValueError):
+            # # No file descriptor (io.UnsupportedOperation is an OSError)
+            pass
+        else:
+            if regular:
+                return FDReader(fd, fileobj)
+
+    return SeekReader(fileobj)
+
+
 class FileSeek(object):
     def __init__(self, fileobj, pos=0, from_what=0):
         self._fileobj = fileobj
@@ -119,16 +317,20 @@ class FileSeek(object):
 class FileWindow(object):
     """
     A "window" over a file object
+
+    The window keeps its own position and reads with :py:func:`open_reader`,
+    so several windows can share a file object.
     """
 
     def __init__(self, fileobj, start=None, end=None):
         self._fileobj = fileobj
+        self._reader = open_reader(fileobj)
+        self._pos = 0
         self.set_window(start, end)
 
     @property
     def file_size(self):
-        with FileSeek(self._fileobj, 0, os.SEEK_END):
-            return self._fileobj.tell()
+        return self._reader.size
 
     @property
     def win_size(self):
@@ -166,33 +368,38 @@ class FileWindow(object):
         raise NotImplementedError
 
     def read(self, size=None):
-        max_readable = max(0, self.win_size - self.tell())
+        retval = self.read_at(self._pos, size)
+        self._pos += len(retval)
+        return retval
+
+    def read_at(self, pos, size=None):
+        """Read up to ``size`` bytes at ``pos``, without moving"""
+        max_readable = max(0, self.win_size - pos)
         if (size is None) or (size > max_readable):
             size = max_readable
-        retval = self._fileobj.read(size)
-        return retval
+        return self._reader.read_at(self._start + pos, size)
 
     def seek(self, pos=None, from_where=os.SEEK_SET):
         if pos is None:
             pos = 0
 
         if from_where == os.SEEK_SET:
-            self._fileobj.seek(pos + self._start)
+            self._pos = pos
 
         elif from_where == os.SEEK_CUR:
-            self._fileobj.seek(pos, os.SEEK_CUR)
+            self._pos += pos
 
         elif from_where == os.SEEK_END:
-            self._fileobj.seek(pos + self._end)
+            self._pos = self.win_size + pos
 
         else:
             raise ValueError("Invalid from_where argument (must be os.SEEK_*)")
 
-        if self._fileobj.tell() < self._start:
-            self._fileobj.seek(self._start)
+        if self._pos < 0:
+            self._pos = 0
 
     def tell(self):
-        return self._fileobj.tell() - self._start
+        return self._pos
 
 
 class mmapbytes(object):
@@ -211,23 +418,19 @@ class mmapbytes(object):
     def set_window(self, offset=None, limit=None):
         return self._fileobj.set_window(offset, limit)
 
-    def _get_file_slice(self, start, end):
-        if start is None:
-            start = 0
-
-        from_what = os.SEEK_END if start < 0 else os.SEEK_SET
+    def __len__(self):
+        return self._fileobj.win_size
 
-        if end is None:
-            size = None
-        else:
-            size = end - start
-
-        with FileSeek(self._fileobj, start, from_what=from_what):
-            return self._fileobj.read(size)
+    def _get_file_slice(self, start, end):
+        start, end, _ = slice(start, end).indices(len(self))
+        if end <= start:
+            return b''
+        return self._fileobj.read_at(start, end - start)
 
     def _get_file_char(self, pos):
-        if abs(pos) > self._fileobj.win_size:
-            # As the FileWindow will (correctly) seek() to index 0
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
             raise IndexError("Index out of range")
         return self._get_file_slice(pos, pos + 1)
 
@@ -254,17 +457,32 @@ class mmapbytes(object):
 
 
 def lazy_property(fn):
+    """
+    Property computed on first access, then stored on the instance.
+
+    Thread safe: concurrent first accesses wait for a single computation
+    (under a lock of the instance), later ones do not lock at all.
+    """
     attr_name = '_lazy_' + fn.__name__
 
     def getter(self):
-        if not hasattr(self, attr_name):
-            setattr(self, attr_name, fn(self))
-        return getattr(self, attr_name)
+        try:
+            return self.__dict__[attr_name]
+        except KeyError:
+            pass
+        lock = self.__dict__.get('_lazy_lock')
+        if lock is None:
+            # # setdefault() is atomic: all threads get the same lock
+            lock = self.__dict__.setdefault('_lazy_lock', threading.RLock())
+        with lock:
+            if attr_name not in self.__dict__:
+                self.__dict__[attr_name] = fn(self)
+            return self.__dict__[attr_name]
 
     def setter(self, value):
-        setattr(self, attr_name, value)
+        self.__dict__[attr_name] = value
 
     def deleter(self):
-        delattr(self, attr_name)
+        del self.__dict__[attr_name]
 
     return property(fget=getter, fset=setter, fdel=deleter, doc=fn.__doc__)
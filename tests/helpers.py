@@ -0,0 +1,185 @@
+"""
+Helpers to build small synthetic TIFF / JPEG images for the tests
+"""
+
+import struct
+
+from py3exif.constants.field_types import FIELD_TYPES, FT_ASCII, \
+    FT_RATIO, FT_SIGNED_RATIO, FT_BYTE, FT_UNDEFINED, FT_SHORT, FT_LONG
+
+EXIF_OFFSET = 0x8769
+GPS_OFFSET = 0x8825
+
+_PACK_CODES = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+_SIGNED_PACK_CODES = {1: 'b', 2: 'h', 4: 'i', 8: 'q'}
+
+
+def _pack_values(field_type, values, prefix):
+    """Pack ``values`` for ``field_type`` into a byte string"""
+    if field_type in (FT_ASCII, FT_BYTE, FT_UNDEFINED) \
+            and isinstance(values, bytes):
+        return values
+    type_len = FIELD_TYPES[field_type][0]
+    signed = FIELD_TYPES[field_type][2].startswith('Signed')
+    codes = _SIGNED_PACK_CODES if signed else _PACK_CODES
+    if field_type in (FT_RATIO, FT_SIGNED_RATIO):
+        flat = [x for pair in values for x in pair]
+        return struct.pack('{}{}{}'.format(prefix, len(flat), codes[4]), *flat)
+    return struct.pack('{}{}{}'.format(prefix, len(values), codes[type_len]),
+                       *values)
+
+
+def entry(tag, field_type, values):
+    """Shortcut to build an IFD entry"""
+    return tag, field_type, values
+
+
+def ascii_entry(tag, text):
+    return tag, FT_ASCII, text.encode('ascii') + b'\x00'
+
+
+class TiffBuilder(object):
+    """
+    Lays out a TIFF structure: a chain of IFDs, each optionally pointing
+    to an EXIF and a GPS sub-IFD.
+
+    Each IFD is a list of ``(tag, field_type, values)`` entries; values are
+    byte strings for ASCII/BYTE/UNDEFINED, lists of ``(num, den)`` pairs
+    for ratios and lists of ints otherwise.
+    """
+
+    def __init__(self, endian='I', bigtiff=False):
+        self.endian = endian
+        self.prefix = '<' if endian == 'I' else '>'
+        self.bigtiff = bigtiff
+        # # Size of the entry count, of an entry and of an offset
+        if bigtiff:
+            self.count_len, self.entry_len, self.offset_len = 8, 20, 8
+        else:
+            self.count_len, self.entry_len, self.offset_len = 2, 12, 4
+        self.ifds = []
+
+    def add_ifd(self, entries, exif=None, gps=None):
+        self.ifds.append((list(entries), exif, gps))
+        return self
+
+    def _pack_int(self, value, size):
+        return struct.pack(self.prefix + _PACK_CODES[size], value)
+
+    def _layout(self, pos, entries, pointers, out):
+        """
+        Write one IFD at ``pos`` into ``out``; return the position after
+        its data area and the position of its "next IFD" field.
+        """
+        entries = sorted(entries + [(tag, FT_LONG, [0]) for tag in pointers])
+        data_pos = pos + self.count_len + self.entry_len * len(entries) \
+            + self.offset_len
+        ifd = bytearray(self._pack_int(len(entries), self.count_len))
+        data = bytearray()
+        for tag, field_type, values in entries:
+            if tag in pointers:
+                values = [pointers[tag] or 0]
+            packed = _pack_values(field_type, values, self.prefix)
+            type_len = FIELD_TYPES[field_type][0]
+            count = len(packed) // type_len
+            if len(packed) > self.offset_len:
+                value_field = self._pack_int(data_pos + len(data),
+                                             self.offset_len)
+                data += packed
+                if len(data) % 2:
+                    data += b'\x00'
+            else:
+                value_field = packed.ljust(self.offset_len, b'\x00')
+            ifd += struct.pack(self.prefix + 'HH', tag, field_type)
+            ifd += self._pack_int(count, self.offset_len)
+            ifd += value_field
+        ifd += b'\x00' * self.offset_len  # next IFD, patched later
+        end = data_pos + len(data)
+        if len(out) < end:
+            out.extend(b'\x00' * (end - len(out)))
+        out[pos:pos + len(ifd)] = ifd
+        out[data_pos:end] = data
+        return end, data_pos - self.offset_len
+
+    def build(self):
+        if self.bigtiff:
+            header = (b'II+\x00' if self.endian == 'I' else b'MM\x00+') \
+                + self._pack_int(8, 2) + b'\x00\x00' + self._pack_int(16, 8)
+        elif self.endian == 'I':
+            header = b'II*\x00\x08\x00\x00\x00'
+        else:
+            header = b'MM\x00*\x00\x00\x00\x08'
+        out = bytearray(header)
+        pos = len(out)
+        previous_next = None
+        for entries, exif, gps in self.ifds:
+            # # Lay out the sub-IFDs first, right after the main one
+            sub_entries = []
+            pointers = {}
+            if exif is not None:
+                pointers[EXIF_OFFSET] = None
+                sub_entries.append((EXIF_OFFSET, exif))
+            if gps is not None:
+                pointers[GPS_OFFSET] = None
+                sub_entries.append((GPS_OFFSET, gps))
+
+            # # First pass: measure the main IFD
+            scratch = bytearray()
+            end, _ = self._layout(0, entries, dict(pointers), scratch)
+            sub_pos = pos + end
+            for tag, sub in sub_entries:
+                pointers[tag] = sub_pos
+                sub_pos, _ = self._layout(sub_pos, sub, {}, out)
+
+            _, next_field = self._layout(pos, entries, pointers, out)
+            if previous_next is not None:
+                out[previous_next:previous_next + self.offset_len] = \
+                    self._pack_int(pos, self.offset_len)
+            previous_next = next_field
+            pos = sub_pos
+        self.last_next_field = previous_next
+        return bytes(out)
+
+
+def make_tiff(entries, exif=None, gps=None, endian='I'):
+    """Build a single-IFD TIFF"""
+    return TiffBuilder(endian).add_ifd(entries, exif, gps).build()
+
+
+def segment(marker, payload):
+    """Build a JPEG marker segment"""
+    return struct.pack('>BBH', 0xFF, marker, len(payload) + 2) + payload
+
+
+def make_jpeg(tiff=None, before=(), after=()):
+    """
+    Build a JPEG file embedding ``tiff`` in an APP1 Exif segment.
+
+    ``before`` and ``after`` are lists of ``(marker, payload)`` segments
+    to be placed around the APP1 one.
+    """
+    parts = [b'\xff\xd8',
+             segment(0xE0, b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00')]
+    parts.extend(segment(m, p) for m, p in before)
+    if tiff is not None:
+        parts.append(segment(0xE1, b'Exif\x00\x00' + tiff))
+    parts.extend(segment(m, p) for m, p in after)
+    parts.append(segment(0xDB, b'\x00' + b'\x01' * 64))
+    parts.append(segment(0xDA, b'\x01\x01\x00\x00\x3f\x00'))
+    parts.append(b'\x12\x34\x56\x78' * 16)
+    parts.append(b'\xff\xd9')
+    return b''.join(parts)
+
+
+BASIC_IFD0 = [
+    ascii_entry(0x010F, 'Canon'),
+    ascii_entry(0x0110, 'Canon PowerShot S40'),
+    entry(0x0112, FT_SHORT, [1]),
+    entry(0x011A, FT_RATIO, [(180, 1)]),
+]
+
+BASIC_EXIF = [
+    entry(0x829A, FT_RATIO, [(1, 500)]),
+    entry(0x8827, FT_SHORT, [100]),
+    ascii_entry(0x9003, '2003:12:14 12:01:44'),
+]
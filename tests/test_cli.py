@@ -0,0 +1,217 @@
+"""
+Tests for the command line tool
+"""
+
+import io
+import os
+import csv
+import sys
+import json
+import base64
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+from tests.helpers import make_jpeg, make_tiff, BASIC_IFD0, BASIC_EXIF
+
+
+class CLITestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+        os.makedirs(os.path.join(self.tmpdir, 'sub'))
+        files = {
+            'a.jpg': make_jpeg(make_tiff(BASIC_IFD0, exif=BASIC_EXIF)),
+            'sub/b.jpg': b'garbage',
+            'sub/c.tif': make_tiff(BASIC_IFD0, endian='M'),
+            'sub/notes.txt': b'not an image',
+        }
+        for name, data in files.items():
+            with open(os.path.join(self.tmpdir, name), 'wb') as f:
+                f.write(data)
+
+    def _path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def _run(self, *args):
+        from py3exif.__main__ import main
+        stdout, stderr = io.StringIO(), io.StringIO()
+        argv = ['py3exif', '--color', 'never'] + list(args)
+        with contextlib.redirect_stdout(stdout), \
+                contextlib.redirect_stderr(stderr):
+            old_argv, sys.argv = sys.argv, argv
+            try:
+                main()
+            finally:
+                sys.argv = old_argv
+        return stdout.getvalue(), stderr.getvalue()
+
+    def _files(self, output):
+        """The file names in human output, in order"""
+        return [os.path.relpath(line, self.tmpdir).replace(os.sep, '/')
+                for line in output.splitlines()
+                if line.startswith(self.tmpdir)]
+
+
+class TestHumanOutput(CLITestCase):
+    def test_files(self):
+        output, _ = self._run(self._path('a.jpg'), self._path('sub/b.jpg'))
+        self.assertIn("  Image Orientation (Short) = 'Horizontal (normal)'",
+                      output)
+        self.assertIn("  Image Make (ASCII) = [b'Canon']", output)
+        self.assertIn('  Error: UnsupportedFormat', output)
+        self.assertEqual(['a.jpg', 'sub/b.jpg'], self._files(output))
+
+    def test_recursive(self):
+        output, _ = self._run('-r', self.tmpdir)
+        self.assertEqual(['a.jpg', 'sub/b.jpg', 'sub/c.tif'],
+                         self._files(output))
+
+        output, _ = self._run('-r', '-e', '.tif', self.tmpdir)
+        self.assertEqual(['sub/c.tif'], self._files(output))
+
+        output, _ = self._run(self.tmpdir)
+        self.assertIn('IsADirectoryError', output)
+
+    def test_jobs(self):
+        output, _ = self._run('-r', '-j', '2', self.tmpdir)
+        self.assertEqual(['a.jpg', 'sub/b.jpg', 'sub/c.tif'],
+                         self._files(output))
+
+        output, _ = self._run('-r', '-j', '2', '--unordered', self.tmpdir)
+        self.assertEqual(['a.jpg', 'sub/b.jpg', 'sub/c.tif'],
+                         sorted(self._files(output)))
+
+    def test_exc_report(self):
+        output, errors = self._run('--exc-report', self._path('sub/b.jpg'),
+                                   self._path('missing.jpg'))
+        self.assertIn('Failures Summary', errors)
+        self.assertIn('!!! {} "FileNotFoundError'.format(
+            self._path('missing.jpg')), errors)
+        self.assertIn("    {} 'UnsupportedFormat".format(
+            self._path('sub/b.jpg')), errors)
+
+
+class TestMachineOutput(CLITestCase):
+    def test_json(self):
+        output, _ = self._run('-f', 'json', '-r', self.tmpdir)
+        records = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(
+            [self._path(name) for name in ('a.jpg', 'sub/b.jpg', 'sub/c.tif')],
+            [record['path'] for record in records])
+
+        tags = records[0]['tags']
+        self.assertIsNone(records[0]['error'])
+        self.assertEqual('Canon', tags['Image Make'])
+        self.assertEqual(1, tags['Image Orientation'])
+        self.assertEqual('1/500', tags['EXIF ExposureTime'])
+        self.assertTrue(records[1]['error'].startswith('UnsupportedFormat'))
+
+    def test_json_thumbnails(self):
+        with open(self._path('a.jpg'), 'rb') as f:
+            thumbnail = f.read()
+        tiff = self._thumbnail_tiff(thumbnail)
+        with open(self._path('t.tif'), 'wb') as f:
+            f.write(tiff)
+
+        output, _ = self._run('-f', 'json', self._path('t.tif'))
+        self.assertNotIn('JPEGThumbnail', json.loads(output)['tags'])
+
+        output, _ = self._run('-f', 'json', '--thumbnails',
+                              self._path('t.tif'))
+        encoded = json.loads(output)['tags']['JPEGThumbnail']
+        self.assertEqual(thumbnail, base64.b64decode(encoded))
+
+    def _thumbnail_tiff(self, thumbnail):
+        from py3exif.constants.field_types import FT_LONG
+        from tests.helpers import TiffBuilder, entry
+        builder = TiffBuilder()
+        builder.add_ifd(BASIC_IFD0)
+        # # The thumbnail is appended right after the IFDs
+        size = len(builder.add_ifd([
+            entry(0x0201, FT_LONG, [0]),
+            entry(0x0202, FT_LONG, [len(thumbnail)])]).build())
+        builder = TiffBuilder()
+        builder.add_ifd(BASIC_IFD0)
+        builder.add_ifd([
+            entry(0x0201, FT_LONG, [size]),
+            entry(0x0202, FT_LONG, [len(thumbnail)])])
+        return builder.build() + thumbnail
+
+    def test_csv(self):
+        output, _ = self._run('-f', 'csv', '-r', '-j', '2', '--tags',
+                              'Image Make, EXIF ExposureTime', self.tmpdir)
+        rows = list(csv.reader(io.StringIO(output)))
+        self.assertEqual(['path', 'error', 'Image Make', 'EXIF ExposureTime'],
+                         rows[0])
+        self.assertEqual([self._path('a.jpg'), '', 'Canon', '1/500'],
+                         rows[1])
+        self.assertTrue(rows[2][1].startswith('UnsupportedFormat'))
+        self.assertEqual([self._path('sub/c.tif'), '', 'Canon', ''],
+                         rows[3])
+
+
+    def test_csv_first_failed(self):
+        # # The columns come from the first file read successfully
+        for args, make in [((), True), (('--tags', 'EXIF*'), False)]:
+            output, _ = self._run('-f', 'csv', *(args + (
+                self._path('sub/b.jpg'), self._path('a.jpg'))))
+            rows = list(csv.reader(io.StringIO(output)))
+            self.assertIn('EXIF ExposureTime', rows[0])
+            self.assertEqual(make, 'Image Make' in rows[0])
+            self.assertEqual(self._path('sub/b.jpg'), rows[1][0])
+            self.assertTrue(rows[1][1].startswith('UnsupportedFormat'))
+            self.assertEqual(self._path('a.jpg'), rows[2][0])
+            self.assertIn('1/500', rows[2])
+
+        output, _ = self._run('-f', 'csv', self._path('sub/b.jpg'))
+        rows = list(csv.reader(io.StringIO(output)))
+        self.assertEqual(['path', 'error'], rows[0])
+        self.assertEqual(2, len(rows))
+
+class TestSelection(CLITestCase):
+    def test_tags(self):
+        output, _ = self._run('--tags', 'Image Orientation,EXIF *Time',
+                              self._path('a.jpg'))
+        lines = output.splitlines()[1:-1]
+        self.assertEqual(
+            ['  EXIF ExposureTime (Ratio) = [<Ratio 1/500 (~0.00)>]',
+             "  Image Orientation (Short) = 'Horizontal (normal)'"], lines)
+
+    def test_preset(self):
+        output, _ = self._run('-f', 'json', '-p', 'basic',
+                              self._path('a.jpg'))
+        self.assertEqual(
+            ['EXIF DateTimeOriginal', 'Image Make', 'Image Model',
+             'Image Orientation'], sorted(json.loads(output)['tags']))
+
+        output, _ = self._run('-f', 'csv', '-p', 'gps', '--tags',
+                              'Image Make', self._path('a.jpg'))
+        rows = list(csv.reader(io.StringIO(output)))
+        self.assertEqual(['path', 'error', 'Image Make'], rows[0])
+
+
+class TestArchives(CLITestCase):
+    def test_archives(self):
+        import zipfile
+        with zipfile.ZipFile(self._path('sub/photos.zip'), 'w') as archive:
+            archive.write(self._path('a.jpg'), 'x/a.jpg')
+            archive.write(self._path('sub/notes.txt'), 'notes.txt')
+
+        output, _ = self._run('-r', '-a', self.tmpdir)
+        self.assertEqual(['a.jpg', 'sub/b.jpg', 'sub/c.tif',
+                          'sub/photos.zip/x/a.jpg'], self._files(output))
+        self.assertIn("  Image Make (ASCII) = [b'Canon']",
+                      output.split('photos.zip')[1])
+
+        # # Members go through the same worker processes as files
+        output, _ = self._run('-r', '-a', '-j', '2', self.tmpdir)
+        self.assertEqual(['a.jpg', 'sub/b.jpg', 'sub/c.tif',
+                          'sub/photos.zip/x/a.jpg'], self._files(output))
+
+        # # Archives are files like others without -a
+        output, _ = self._run('-f', 'json', self._path('sub/photos.zip'))
+        self.assertTrue(json.loads(output)['error'].startswith(
+            'UnsupportedFormat'))
@@ -0,0 +1,336 @@
+"""
+Tests for batch processing and columnar export
+"""
+
+import io
+import os
+import csv
+import shutil
+import tarfile
+import zipfile
+import tempfile
+import unittest
+
+from py3exif.constants.field_types import FT_SHORT
+from tests.helpers import make_jpeg, make_tiff, entry, ascii_entry, \
+    BASIC_IFD0, BASIC_EXIF
+
+
+class ExportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+        os.makedirs(os.path.join(self.tmpdir, 'sub', 'deeper'))
+        self.files = {
+            'a.jpg': make_jpeg(make_tiff(BASIC_IFD0, exif=BASIC_EXIF)),
+            'b.JPEG': make_jpeg(make_tiff([
+                ascii_entry(0x010F, 'NIKON'),
+                entry(0x0112, FT_SHORT, [6])])),
+            'notes.txt': b'not an image',
+            'sub/c.tif': make_tiff(BASIC_IFD0, endian='M'),
+            'sub/deeper/d.jpg': make_jpeg(None),
+            'sub/deeper/e.jpg': b'garbage',
+        }
+        for name, data in self.files.items():
+            with open(os.path.join(self.tmpdir, name), 'wb') as f:
+                f.write(data)
+
+    def _relative(self, paths):
+        return [os.path.relpath(p, self.tmpdir).replace(os.sep, '/')
+                for p in paths]
+
+
+class TestScan(ExportTestCase):
+    def test_iter_image_files(self):
+        from py3exif.batch import iter_image_files
+        self.assertEqual(
+            ['a.jpg', 'b.JPEG', 'sub/c.tif', 'sub/deeper/d.jpg',
+             'sub/deeper/e.jpg'],
+            self._relative(iter_image_files(self.tmpdir)))
+        self.assertEqual(
+            ['a.jpg', 'b.JPEG'],
+            self._relative(iter_image_files(self.tmpdir, recursive=False)))
+
+    def test_scan_paths(self):
+        from py3exif.batch import iter_image_files, scan_paths
+        paths = list(iter_image_files(self.tmpdir))
+        for jobs, threads in ((None, False), (2, False), (4, True)):
+            results = list(scan_paths(paths, jobs=jobs, threads=threads))
+            self.assertEqual(paths, [r.path for r in results])
+
+            a, b, c, d, e = results
+            self.assertEqual('Canon', a.tags['Image Make'])
+            self.assertEqual(100, a.tags['EXIF ISOSpeedRatings'])
+            self.assertEqual((1, 500), (a.tags['EXIF ExposureTime'].num,
+                                        a.tags['EXIF ExposureTime'].den))
+            self.assertEqual(6, b.tags['Image Orientation'])
+            self.assertEqual('Canon PowerShot S40', c.tags['Image Model'])
+            self.assertIsNone(c.error)
+            self.assertEqual('NoExifData: No EXIF header found', d.error)
+            self.assertTrue(e.error.startswith('UnsupportedFormat'))
+
+    def test_bulk(self):
+        from py3exif.batch import iter_image_files, scan_paths
+        paths = list(iter_image_files(self.tmpdir))
+        expected = [(r.path, sorted(r.tags), r.error)
+                    for r in scan_paths(paths)]
+        for jobs in (None, 2):
+            results = scan_paths(paths, jobs=jobs, bulk=True)
+            self.assertEqual(expected, [(r.path, sorted(r.tags), r.error)
+                                        for r in results])
+
+        result, = scan_paths([os.path.join(self.tmpdir, 'missing.jpg')],
+                             bulk=True)
+        self.assertTrue(result.error.startswith('FileNotFoundError'))
+
+
+class _Pipe(io.RawIOBase):
+    """A non-seekable stream"""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._data.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class _CountingFile(io.FileIO):
+    """Counts the bytes read"""
+    count = 0
+
+    def read(self, size=-1):
+        data = io.FileIO.read(self, size)
+        self.count += len(data)
+        return data
+
+
+class TestScanArchive(ExportTestCase):
+    def _zip(self):
+        path = os.path.join(self.tmpdir, 'photos.zip')
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name in sorted(self.files):
+                archive.writestr(name, self.files[name])
+        return path
+
+    def _tar(self, mode='w:gz'):
+        path = os.path.join(self.tmpdir, 'photos.tar.gz')
+        with tarfile.open(path, mode) as archive:
+            archive.add(os.path.join(self.tmpdir, 'sub'), 'sub')
+        return path
+
+    def _check(self, results, prefix):
+        self.assertEqual(
+            ['sub/c.tif', 'sub/deeper/d.jpg', 'sub/deeper/e.jpg'],
+            [os.path.relpath(r.path, prefix).replace(os.sep, '/')
+             for r in results][-3:])
+        c, d, e = results[-3:]
+        self.assertEqual('Canon PowerShot S40', c.tags['Image Model'])
+        self.assertIsNone(c.error)
+        self.assertEqual('NoExifData: No EXIF header found', d.error)
+        self.assertTrue(e.error.startswith('UnsupportedFormat'))
+
+    def test_zip(self):
+        from py3exif.batch import scan_archive
+        path = self._zip()
+        results = list(scan_archive(path))
+        self.assertEqual([os.path.join(path, 'a.jpg'),
+                          os.path.join(path, 'b.JPEG')],
+                         [r.path for r in results[:2]])
+        self.assertEqual('Canon', results[0].tags['Image Make'])
+        self.assertEqual(6, results[1].tags['Image Orientation'])
+        self._check(results, path)
+
+    def test_tar(self):
+        from py3exif.batch import scan_archive
+        path = self._tar()
+        self._check(list(scan_archive(path)), path)
+
+        # # Streamed, in a single pass
+        with open(path, 'rb') as f:
+            results = list(scan_archive(_Pipe(f.read()), name='stdin'))
+        self._check(results, 'stdin')
+
+    def test_large_members(self):
+        from py3exif.batch import scan_archive
+        # # The image data past the EXIF information is not decompressed
+        self.files = {'a.jpg': self.files['a.jpg'] + os.urandom(256 * 1024)}
+        with _CountingFile(self._zip()) as f:
+            result, = scan_archive(f, name='', read_size=1024)
+            self.assertEqual('Canon', result.tags['Image Make'])
+            self.assertLess(f.count, 64 * 1024)
+
+        output = io.BytesIO()
+        with tarfile.open(fileobj=output, mode='w') as archive:
+            info = tarfile.TarInfo('a.jpg')
+            info.size = len(self.files['a.jpg'])
+            archive.addfile(info, io.BytesIO(self.files['a.jpg']))
+        result, = scan_archive(_Pipe(output.getvalue()), name='',
+                               read_size=1024)
+        self.assertEqual('a.jpg', result.path)
+        self.assertEqual('Canon', result.tags['Image Make'])
+
+    def test_scan_paths(self):
+        from py3exif.batch import scan_paths
+        zip_path, tar_path = self._zip(), self._tar()
+        a = os.path.join(self.tmpdir, 'a.jpg')
+        paths = [zip_path, a, tar_path]
+        for jobs, threads in [(None, False), (2, True), (2, False)]:
+            results = list(scan_paths(paths, jobs=jobs, threads=threads,
+                                      archives=True))
+            self.assertEqual([os.path.join(zip_path, 'a.jpg'),
+                              os.path.join(zip_path, 'b.JPEG')],
+                             [r.path for r in results[:2]])
+            self._check(results[:5], zip_path)
+            self.assertEqual(a, results[5].path)
+            self.assertEqual('Canon', results[5].tags['Image Make'])
+            self._check(results[6:], tar_path)
+            self.assertEqual(9, len(results))
+
+        # # Archives are files like others by default
+        result, = scan_paths([zip_path])
+        self.assertTrue(result.error.startswith('UnsupportedFormat'))
+
+    def test_errors(self):
+        from py3exif.batch import scan_archive
+        path = os.path.join(self.tmpdir, 'notes.txt')
+        result, = scan_archive(path)
+        self.assertEqual(path, result.path)
+        self.assertTrue(result.error.startswith('ReadError'))
+
+        result, = scan_archive(os.path.join(self.tmpdir, 'missing.zip'))
+        self.assertTrue(result.error.startswith('FileNotFoundError'))
+
+
+class TestExport(ExportTestCase):
+    def test_csv(self):
+        from py3exif.export import export_directory
+        out = io.StringIO()
+        count = export_directory(self.tmpdir, out, batch_size=2, jobs=2)
+        self.assertEqual(5, count)
+
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        header = rows[0]
+        self.assertEqual(['path', 'error'], header[:2])
+        # # Columns come from the first batch (a.jpg and b.JPEG)
+        self.assertIn('EXIF ExposureTime', header)
+        self.assertEqual(6, len(rows))
+
+        a = dict(zip(header, rows[1]))
+        self.assertEqual('1/500', a['EXIF ExposureTime'])
+        self.assertEqual('Canon', a['Image Make'])
+        self.assertEqual('', a['error'])
+
+        c = dict(zip(header, rows[3]))
+        self.assertEqual('', c['EXIF ExposureTime'])
+        self.assertEqual('1', c['Image Orientation'])
+
+    def test_csv_results(self):
+        from py3exif.batch import iter_image_files, scan_paths
+        from py3exif.export import CSVWriter
+        out = io.StringIO()
+        writer = CSVWriter(out, columns=['Image Make', 'EXIF ExposureTime'])
+        for result in scan_paths(iter_image_files(self.tmpdir)):
+            writer.write_result(result)
+
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(['path', 'error', 'Image Make', 'EXIF ExposureTime'],
+                         rows[0])
+        self.assertEqual(['Canon', '1/500'], rows[1][2:])
+        self.assertEqual(['NIKON', ''], rows[2][2:])
+        self.assertTrue(rows[5][1].startswith('UnsupportedFormat'))
+
+    def test_pickle(self):
+        from py3exif.export import export_files, read_pickle_batches
+        from py3exif.batch import iter_image_files
+        path = os.path.join(self.tmpdir, 'out.bin')
+        export_files(iter_image_files(self.tmpdir), path, format='pickle',
+                     columns=['Image Make', 'Image Orientation'],
+                     batch_size=3)
+        with open(path, 'rb') as f:
+            batches = list(read_pickle_batches(f))
+        self.assertEqual([3, 2], [b.size for b in batches])
+        self.assertEqual(['path', 'error', 'Image Make', 'Image Orientation'],
+                         batches[0].columns)
+        self.assertEqual(['Canon', 'NIKON', 'Canon'],
+                         batches[0].data['Image Make'])
+        self.assertEqual([None, None], batches[1].data['Image Orientation'])
+
+    def test_pickle_plain_types(self):
+        import fractions
+        from py3exif.export import export_files, read_pickle_batches
+        out = io.BytesIO()
+        export_files([os.path.join(self.tmpdir, 'a.jpg')], out,
+                     format='pickle')
+        out.seek(0)
+        batch, = read_pickle_batches(out)
+        self.assertEqual([fractions.Fraction(1, 500)],
+                         batch.data['EXIF ExposureTime'])
+        self.assertNotIn(b'py3exif', out.getvalue())
+
+    def test_pickle_per_batch_columns(self):
+        from py3exif.export import export_files, read_pickle_batches
+        from py3exif.batch import iter_image_files
+        out = io.BytesIO()
+        export_files(iter_image_files(self.tmpdir), out, format='pickle',
+                     batch_size=2)
+        out.seek(0)
+        batches = list(read_pickle_batches(out))
+        self.assertIn('EXIF ExposureTime', batches[0].columns)
+        self.assertEqual(['path', 'error'], batches[2].columns)
+
+    def test_pickle_unsafe(self):
+        import pickle
+        from py3exif.export import read_pickle_batches
+        out = io.BytesIO()
+        pickle.dump({'columns': ['path'], 'data': {'path': [os.getcwd]}},
+                    out)
+        out.seek(0)
+        with self.assertRaises(pickle.UnpicklingError):
+            list(read_pickle_batches(out))
+
+    def test_dropped_columns(self):
+        import warnings
+        from py3exif.batch import FileResult
+        from py3exif.export import iter_batches
+        results = [FileResult('a', {'Image Make': 'Canon'}, None),
+                   FileResult('b', {'Image Model': 'S40'}, None),
+                   FileResult('c', {'Image Model': 'D70'}, None)]
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            batches = list(iter_batches(results, batch_size=1))
+        self.assertEqual([['path', 'error', 'Image Make']] * 3,
+                         [b.columns for b in batches])
+        self.assertEqual(1, len(caught))
+        self.assertIn('Image Model', str(caught[0].message))
+
+        batches = list(iter_batches(results, batch_size=1, per_batch=True))
+        self.assertEqual(['S40'], batches[1].data['Image Model'])
+
+        # # Columns asked for: no warning
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            list(iter_batches(results, ['Image Make'], batch_size=1))
+        self.assertEqual([], caught)
+
+    def test_unknown_format(self):
+        from py3exif.export import export_files
+        with self.assertRaises(ValueError):
+            export_files([], io.BytesIO(), format='parquet')
+
+    def test_arrow(self):
+        from py3exif import export
+        if export.pyarrow is None:
+            self.skipTest('pyarrow is not available')
+        out = io.BytesIO()
+        export.export_directory(self.tmpdir, out, format='arrow',
+                                batch_size=2)
+        table = export.pyarrow.ipc.open_file(
+            export.pyarrow.BufferReader(out.getvalue())).read_all()
+        self.assertEqual(5, table.num_rows)
+        self.assertEqual(0.002, table.column('EXIF ExposureTime')[0].as_py())
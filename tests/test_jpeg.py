@@ -0,0 +1,170 @@
+"""
+Tests for JPEG scanning and the segment index
+"""
+
+import io
+import unittest
+
+from tests.helpers import make_jpeg, make_tiff, BASIC_IFD0
+
+XMP = b'http://ns.adobe.com/xap/1.0/\x00<x:xmpmeta/>'
+ICC = b'ICC_PROFILE\x00\x01\x01' + b'\x00' * 32
+IPTC = b'Photoshop 3.0\x008BIM\x04\x04\x00\x00\x00\x00\x00\x00'
+
+
+class TestSegmentIndex(unittest.TestCase):
+    def _process(self, data):
+        from py3exif import process_file
+        return process_file(io.BytesIO(data))
+
+    def test_segments_are_indexed(self):
+        data = make_jpeg(make_tiff(BASIC_IFD0),
+                         after=[(0xE1, XMP), (0xE2, ICC), (0xED, IPTC)])
+        header = self._process(data)
+
+        names = [s.name for s in header.segments]
+        self.assertEqual(
+            ['APP0', 'APP1', 'APP1', 'APP2', 'APP13', 'DQT', 'SOS'], names)
+
+        for segment in header.segments:
+            self.assertEqual(
+                data[segment.offset - 4:segment.offset - 2],
+                bytes(bytearray([0xFF, segment.marker])))
+
+    def test_read_segments(self):
+        data = make_jpeg(make_tiff(BASIC_IFD0),
+                         after=[(0xE1, XMP), (0xE2, ICC), (0xED, IPTC)])
+        header = self._process(data)
+
+        xmp, = header.find_segments(0xE1, b'http://ns.adobe.com/xap/1.0/')
+        self.assertEqual(XMP, header.read_segment(xmp))
+
+        icc, = header.find_segments(0xE2)
+        self.assertEqual(ICC, header.read_segment(icc))
+
+        iptc, = header.find_segments(0xED, b'Photoshop 3.0\x00')
+        self.assertEqual(IPTC, header.read_segment(iptc))
+
+        self.assertEqual([], header.find_segments(0xE2, b'MPF\x00'))
+
+    def test_exif_after_other_segments(self):
+        data = make_jpeg(make_tiff(BASIC_IFD0),
+                         before=[(0xE1, XMP), (0xEE, b'Adobe\x00\x64')])
+        header = self._process(data)
+        exif, = header.find_segments(0xE1, b'Exif\x00\x00')
+        self.assertEqual(exif.offset + 6, header.offset)
+        self.assertEqual('I', header.endian)
+
+    def test_no_exif(self):
+        from py3exif import process_file
+        from py3exif.exceptions import NoExifData
+        data = make_jpeg(None, after=[(0xE1, XMP)])
+        with self.assertRaises(NoExifData):
+            process_file(io.BytesIO(data))
+
+    def test_tiff_has_no_segments(self):
+        header = self._process(make_tiff(BASIC_IFD0, endian='M'))
+        self.assertEqual([], header.segments)
+        self.assertEqual('M', header.endian)
+        self.assertEqual(0, header.offset)
+
+
+class TestProbe(unittest.TestCase):
+    def test_jpeg(self):
+        from py3exif import probe, has_exif, process_file
+        data = make_jpeg(make_tiff(BASIC_IFD0), before=[(0xE2, ICC)])
+        result = probe(io.BytesIO(data))
+        self.assertEqual('jpeg', result.format)
+        self.assertTrue(result.has_exif)
+        self.assertEqual(b'II*\x00', data[result.offset:result.offset + 4])
+        self.assertEqual('I', result.endian)
+        self.assertEqual(len(make_tiff(BASIC_IFD0)), result.length)
+        self.assertTrue(has_exif(io.BytesIO(data)))
+
+        header = process_file(io.BytesIO(data), probe_result=result)
+        self.assertEqual(result.segments, header.segments)
+        self.assertEqual([1], header.tags['Image Orientation'].values)
+
+    def test_segments_past_read_size(self):
+        from py3exif import probe
+        data = make_jpeg(make_tiff(BASIC_IFD0),
+                         before=[(0xE2, ICC * 200)] * 3)
+        result = probe(io.BytesIO(data), read_size=64)
+        self.assertTrue(result.has_exif)
+        self.assertEqual(b'II*\x00', data[result.offset:result.offset + 4])
+
+    def test_no_exif(self):
+        from py3exif import probe, has_exif
+        data = make_jpeg(None, after=[(0xE1, XMP)])
+        result = probe(io.BytesIO(data))
+        self.assertEqual('jpeg', result.format)
+        self.assertFalse(result.has_exif)
+        self.assertIsNone(result.offset)
+        self.assertFalse(has_exif(io.BytesIO(data)))
+
+        result = probe(io.BytesIO(b'GIF89a' + b'\x00' * 100))
+        self.assertIsNone(result.format)
+        self.assertFalse(result.has_exif)
+        self.assertFalse(has_exif(io.BytesIO(b'')))
+
+    def test_tiff(self):
+        from py3exif import probe
+        data = make_tiff(BASIC_IFD0, endian='M')
+        result = probe(io.BytesIO(data))
+        self.assertEqual(('tiff', 0, 'M', len(data)),
+                         result[:4])
+
+
+class _CountingFile(io.RawIOBase):
+    """A seekable file object (without fileno), counting its reads"""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+        self.reads = 0
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def seek(self, offset, whence=0):
+        return self._data.seek(offset, whence)
+
+    def tell(self):
+        return self._data.tell()
+
+    def read(self, size=-1):
+        self.reads += 1
+        return self._data.read(size)
+
+
+class TestInitialRead(unittest.TestCase):
+    def _tags(self, data, **kwargs):
+        from py3exif import process_file
+        fileobj = _CountingFile(data)
+        header = process_file(fileobj, **kwargs)
+        header.tags.resolve()
+        return header, fileobj.reads
+
+    def test_single_read(self):
+        data = make_jpeg(make_tiff(BASIC_IFD0), before=[(0xE2, ICC)])
+        header, reads = self._tags(data)
+        self.assertEqual([1], header.tags['Image Orientation'].values)
+        self.assertEqual(1, reads)
+
+        header, reads = self._tags(data, read_size=0)
+        self.assertEqual([1], header.tags['Image Orientation'].values)
+        self.assertGreater(reads, 10)
+
+    def test_follow_up_read(self):
+        from py3exif import process_file
+        # # The EXIF segment starts within the first read, ends past it
+        data = make_jpeg(make_tiff(BASIC_IFD0), before=[(0xE2, ICC)])
+        fileobj = _CountingFile(data)
+        header = process_file(fileobj, read_size=100)
+        reads = fileobj.reads
+
+        # # Decoding is served from the prefix, extended to the segment end
+        self.assertEqual([1], header.tags['Image Orientation'].values)
+        self.assertEqual(reads, fileobj.reads)
@@ -0,0 +1,225 @@
+"""
+Tests for hardened parsing of untrusted input
+"""
+
+import io
+import struct
+import unittest
+import warnings
+
+from py3exif.constants.field_types import FT_UNDEFINED, FT_SHORT
+from tests.helpers import TiffBuilder, make_tiff, entry, \
+    BASIC_IFD0, BASIC_EXIF, EXIF_OFFSET
+
+
+def _process(data, **kwargs):
+    from py3exif import process_file
+    return process_file(io.BytesIO(data), **kwargs)
+
+
+def _patch_entry(data, tag, count=None, value=None):
+    """Overwrite the count / value field of an (Intel) IFD entry"""
+    data = bytearray(data)
+    pos = data.index(struct.pack('<H', tag), 8)
+    if count is not None:
+        data[pos + 4:pos + 8] = struct.pack('<I', count)
+    if value is not None:
+        data[pos + 8:pos + 12] = struct.pack('<I', value)
+    return bytes(data)
+
+
+class TestLimits(unittest.TestCase):
+    def setUp(self):
+        self.data = TiffBuilder() \
+            .add_ifd(BASIC_IFD0, exif=BASIC_EXIF) \
+            .add_ifd([entry(0x0100, FT_SHORT, [64])]) \
+            .build()
+
+    def test_unlimited(self):
+        from py3exif import ParseLimits
+        header = _process(self.data, limits=ParseLimits())
+        self.assertIn('EXIF ExposureTime', header.tags)
+        self.assertEqual(3, header._budget.ifds)
+
+    def _assert_exceeded(self, **limits):
+        from py3exif import ParseLimits
+        from py3exif.exceptions import LimitExceeded
+        header = _process(self.data, limits=ParseLimits(**limits))
+        with self.assertRaises(LimitExceeded):
+            header.tags
+
+    def test_limits(self):
+        from py3exif import ParseLimits
+        self._assert_exceeded(max_ifds=2)
+        self._assert_exceeded(max_entries=4)
+        self._assert_exceeded(max_values=10)
+        self._assert_exceeded(max_bytes=100)
+        self._assert_exceeded(max_depth=0)
+        self._assert_exceeded(max_time=-1)
+
+        header = _process(self.data, limits=ParseLimits(
+            max_ifds=3, max_entries=5, max_depth=1, max_time=10))
+        self.assertIn('Thumbnail ImageWidth', header.tags)
+
+    def test_long_chain(self):
+        from py3exif import ParseLimits
+        from py3exif.exceptions import LimitExceeded
+        # # 200000 empty IFDs, each pointing to the next one
+        count = 200000
+        data = b'II*\x00' + struct.pack('<I', 8) + b''.join(
+            struct.pack('<HI', 0, 8 + 6 * (i + 1) if i + 1 < count else 0)
+            for i in range(count))
+        header = _process(data, limits=ParseLimits(max_ifds=100))
+        with self.assertRaises(LimitExceeded):
+            header.ifd_offsets
+        # # The walk stopped at the limit
+        self.assertEqual(101, header._budget.ifds)
+        self.assertLess(header._budget.bytes_read, 1000)
+
+
+class TestMalformed(unittest.TestCase):
+    def test_huge_makernote_count(self):
+        exif = BASIC_EXIF + [entry(0x927C, FT_UNDEFINED, b'Nikon\x00' * 4)]
+        data = _patch_entry(make_tiff(BASIC_IFD0, exif=exif), 0x927C,
+                            count=0x7FFFFFFF)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            tags = _process(data).tags
+        self.assertNotIn('EXIF MakerNote', tags)
+        self.assertIn('EXIF ExposureTime', tags)
+        self.assertTrue(any('out of bounds' in str(w.message)
+                            for w in caught))
+
+        with self.assertRaises(ValueError):
+            _process(data, strict=True).tags
+
+    def test_sub_ifd_out_of_bounds(self):
+        data = _patch_entry(make_tiff(BASIC_IFD0, exif=BASIC_EXIF),
+                            EXIF_OFFSET, value=0x10000000)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            tags = _process(data).tags
+        self.assertIn('Image Make', tags)
+        self.assertNotIn('EXIF ExposureTime', tags)
+
+    def test_sub_ifd_cycle(self):
+        # # EXIF pointer back to IFD0 itself
+        data = _patch_entry(make_tiff(BASIC_IFD0, exif=BASIC_EXIF),
+                            EXIF_OFFSET, value=8)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            tags = _process(data).tags
+        self.assertIn('Image Make', tags)
+        self.assertNotIn('EXIF Make', tags)
+        self.assertTrue(any('already decoded' in str(w.message)
+                            for w in caught))
+
+    def test_invalid_pointers(self):
+        from py3exif.constants.field_types import FT_ASCII
+        from tests.helpers import GPS_OFFSET
+        data = bytearray(make_tiff(BASIC_IFD0, exif=BASIC_EXIF,
+                                   gps=[entry(0x0000, FT_SHORT, [2])]))
+        # # EXIF pointer stored as ASCII, GPS pointer without values
+        pos = data.index(struct.pack('<H', EXIF_OFFSET), 8)
+        data[pos + 2:pos + 4] = struct.pack('<H', FT_ASCII)
+        data = _patch_entry(bytes(data), GPS_OFFSET, count=0)
+        for lazy in (False, True):
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                header = _process(data)
+                if lazy:
+                    names = [e.key for e in header.iter_tags()]
+                else:
+                    names = list(header.tags)
+            self.assertIn('Image Make', names)
+            self.assertFalse(any(name.startswith(('EXIF ', 'GPS '))
+                                 for name in names))
+            self.assertTrue(any('invalid type' in str(w.message)
+                                for w in caught))
+
+        with self.assertRaises(ValueError):
+            _process(data, strict=True).tags
+
+    def test_truncated_chain(self):
+        data = make_tiff(BASIC_IFD0)
+        bigtiff = TiffBuilder(bigtiff=True).add_ifd(BASIC_IFD0).build()
+        for truncated in (data[:61], bigtiff[:13], bigtiff[:19]):
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                _process(truncated).tags
+            self.assertTrue(caught)
+            with self.assertRaises(ValueError):
+                _process(truncated, strict=True).tags
+
+    def test_truncated_ifd(self):
+        # # Entry count way past the end of file, and values of the
+        # # first entries out of bounds; the inline ones are still there
+        tiff = make_tiff(BASIC_IFD0)
+        data = tiff[:8] + b'\xff\x7f' + tiff[10:58]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            tags = _process(data).tags
+        self.assertEqual(['Image Orientation'], list(tags))
+
+
+class TestInterruption(unittest.TestCase):
+    def setUp(self):
+        builder = TiffBuilder()
+        for page in range(20):
+            builder.add_ifd([entry(0x0100, FT_SHORT, [page])])
+        self.data = builder.build()
+
+    def test_expired_deadline(self):
+        import time
+        header = _process(self.data, deadline=time.monotonic() - 1)
+        self.assertFalse(header.incomplete)
+        self.assertEqual({}, header.tags)
+        self.assertTrue(header.incomplete)
+
+    def test_far_deadline(self):
+        import time
+        header = _process(self.data, deadline=time.monotonic() + 60)
+        self.assertEqual(20, len(header.tags))
+        self.assertFalse(header.incomplete)
+
+    def test_deadline_during_walk(self):
+        import time
+        header = _process(self.data, deadline=time.monotonic() + 60)
+        walked = []
+        original = header._extend_chain
+
+        def extend_chain():
+            walked.append(True)
+            if len(walked) == 6:
+                # # The deadline passes while reaching the sixth IFD
+                header._budget.deadline = time.monotonic() - 1
+            return original()
+
+        header._extend_chain = extend_chain
+        tags = header.tags
+        self.assertTrue(header.incomplete)
+        self.assertEqual(5, len(tags))
+        self.assertEqual([4], tags['IFD 4 ImageWidth'].values)
+
+    def test_cancel(self):
+        from py3exif import CancellationToken
+        token = CancellationToken()
+        header = _process(self.data, cancel=token)
+        page = header.page_tags(19)
+        self.assertEqual([19], page['IFD 19 ImageWidth'].values)
+
+        # # Cancel while decoding the fifth IFD: the first ones are kept
+        calls = []
+        original = header._extract_tags
+
+        def extract_tags(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 5:
+                token.cancel()
+            return original(*args, **kwargs)
+
+        header._extract_tags = extract_tags
+        tags = header.tags
+        self.assertTrue(header.incomplete)
+        self.assertEqual(4, len(tags))
+        self.assertEqual([3], tags['IFD 3 ImageWidth'].values)
@@ -0,0 +1,350 @@
+"""
+Tests for the MakerNote decoder registry
+"""
+
+import io
+import sys
+import struct
+import unittest
+import subprocess
+
+from py3exif.constants.field_types import FT_ASCII, FT_SHORT, FT_LONG, \
+    FT_UNDEFINED
+from tests.helpers import TiffBuilder, entry, ascii_entry, BASIC_IFD0, \
+    BASIC_EXIF
+
+
+def _note_ifd(entries, endian='I', label=b''):
+    """
+    Build a MakerNote IFD whose values all fit in their entry, so it can
+    be placed anywhere.
+    """
+    prefix = '<' if endian == 'I' else '>'
+    out = bytearray(label) + struct.pack(prefix + 'H', len(entries))
+    for tag, field_type, values in entries:
+        count = len(values)
+        if field_type == FT_SHORT:
+            packed = struct.pack('{}{}H'.format(prefix, count), *values)
+        else:
+            packed = values
+        out += struct.pack(prefix + 'HHI', tag, field_type, count)
+        out += packed.ljust(4, b'\x00')
+    return bytes(out + b'\x00' * 4)
+
+
+def _with_makernote(note, make='Canon', endian='I'):
+    """Build a TIFF whose EXIF IFD holds ``note`` as MakerNote"""
+    ifd0 = [ascii_entry(0x010F, make)] + BASIC_IFD0[1:]
+    exif = BASIC_EXIF + [entry(0x927C, FT_UNDEFINED, note)]
+    return TiffBuilder(endian).add_ifd(ifd0, exif=exif).build()
+
+
+class TestMakerNotes(unittest.TestCase):
+    def _process(self, data, **kwargs):
+        from py3exif import process_file
+        return process_file(io.BytesIO(data), **kwargs)
+
+    def test_vendors_not_imported(self):
+        code = ('import sys, py3exif; '
+                'print([m for m in sys.modules '
+                'if m.startswith("py3exif.makernotes.")])')
+        output = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(b'[]', output.splitlines()[-1].strip())
+
+    def test_canon(self):
+        for endian in 'IM':
+            note = _note_ifd([entry(0x0001, FT_SHORT, [0, 2]),
+                              entry(0x0006, FT_ASCII, b'IMG\x00')], endian)
+            header = self._process(_with_makernote(note, endian=endian))
+            tags = header.tags
+            self.assertEqual([b'IMG'], tags['MakerNote ImageType'].values)
+            settings = tags['MakerNote CameraSettings']
+            self.assertEqual(2, settings['Macromode'])
+            self.assertEqual('Normal', settings.describe('Macromode'))
+            self.assertEqual(['Macromode'], list(settings))
+            self.assertNotIn('SelfTimer', settings)
+            self.assertEqual('Macromode: Normal', settings.printable)
+            self.assertNotIn('MakerNote ShotInfo', tags)
+        self.assertIn('py3exif.makernotes.canon', sys.modules)
+
+    def test_deferred_time_limit(self):
+        import time
+        from py3exif import ParseLimits
+        note = _note_ifd([entry(0x0006, FT_ASCII, b'IMG\x00')])
+        header = self._process(_with_makernote(note),
+                               limits=ParseLimits(max_time=0.5))
+        tags = header.tags
+        # # The time between the lookups is not spent decoding
+        time.sleep(0.6)
+        self.assertEqual([b'IMG'], tags['MakerNote ImageType'].values)
+        self.assertFalse(header.incomplete)
+        self.assertLess(header._budget.elapsed, 0.5)
+
+    def test_canon_record(self):
+        from py3exif.makernotes.canon import CanonRecord, CANON_RECORDS
+        fields = CANON_RECORDS[1][2]
+        values = [0] * 20
+        values[7] = 3
+        values[15] = 0xFFE0
+        values[19] = 250
+        record = CanonRecord(values, fields)
+        self.assertEqual(['WhiteBalance', 'SequenceNumber', 'AFPointUsed',
+                          'FlashBias', 'SubjectDistance'], list(record))
+        self.assertEqual(3, record['WhiteBalance'])
+        self.assertEqual('Tungsten', record.describe('WhiteBalance'))
+        self.assertEqual('-1 EV', record.describe('FlashBias'))
+        self.assertEqual('250', record.describe('SubjectDistance'))
+        self.assertEqual(250, record.to_python['SubjectDistance'])
+        with self.assertRaises(KeyError):
+            record['Macromode']
+
+    def test_unknown_make(self):
+        note = _note_ifd([entry(0x0006, FT_ASCII, b'IMG\x00')])
+        header = self._process(_with_makernote(note, make='Nobody'))
+        self.assertIn('EXIF MakerNote', header.tags)
+        self.assertFalse(any(name.startswith('MakerNote ')
+                             for name in header.tags))
+
+    def test_not_detailed(self):
+        note = _note_ifd([entry(0x0006, FT_ASCII, b'IMG\x00')])
+        header = self._process(_with_makernote(note), detailed=False)
+        self.assertNotIn('MakerNote ImageType', header.tags)
+
+    def test_register(self):
+        from py3exif.makernotes import register_makernote, \
+            unregister_makernote
+
+        def decode_acme(header, tags, note):
+            header.extract_makernote_ifd(tags, note.field_offset + 5,
+                                         tags_library={0x0001: ('Widget', )})
+
+        decoder = register_makernote(decode_acme, make='Acme')
+        self.addCleanup(unregister_makernote, decoder)
+        note = _note_ifd([entry(0x0001, FT_SHORT, [7])], label=b'ACME\x00')
+        header = self._process(_with_makernote(note, make='Acme'))
+        self.assertEqual([7], header.tags['MakerNote Widget'].values)
+
+        # # By signature, for any make, before the built-in decoders
+        decoder = register_makernote(decode_acme, signature=b'ACME\x00')
+        header = self._process(_with_makernote(note, make='OLYMPUS X'))
+        self.assertEqual([7], header.tags['MakerNote Widget'].values)
+
+        # # Even over the built-in decoders of an exact make
+        header = self._process(_with_makernote(note, make='Canon'))
+        self.assertEqual([7], header.tags['MakerNote Widget'].values)
+
+        unregister_makernote(decoder)
+        with self.assertRaises(ValueError):
+            unregister_makernote(decoder)
+
+    def test_override_builtin(self):
+        from py3exif.makernotes import register_makernote, \
+            unregister_makernote
+
+        def decode_canon(header, tags, note):
+            tags['MakerNote Overridden'] = True
+
+        note = _note_ifd([entry(0x0006, FT_ASCII, b'IMG\x00')])
+        decoder = register_makernote(decode_canon, make='Canon')
+        self.addCleanup(unregister_makernote, decoder)
+        header = self._process(_with_makernote(note, make='Canon'))
+        self.assertIn('MakerNote Overridden', header.tags)
+        self.assertNotIn('MakerNote ImageType', header.tags)
+
+    def test_register_lazy(self):
+        from py3exif.makernotes import register_makernote, \
+            unregister_makernote
+        decoder = register_makernote('py3exif.makernotes.canon:decode',
+                                     make='Cannon')
+        self.addCleanup(unregister_makernote, decoder)
+        note = _note_ifd([entry(0x0006, FT_ASCII, b'IMG\x00')])
+        header = self._process(_with_makernote(note, make='Cannon'))
+        self.assertEqual([b'IMG'], header.tags['MakerNote ImageType'].values)
+
+        with self.assertRaises(ValueError):
+            register_makernote('py3exif.makernotes.canon:decode')
+
+    def test_tables_still_in_constants(self):
+        from py3exif.constants import tags
+        from py3exif.makernotes import canon
+        self.assertIs(canon.MAKERNOTE_CANON_TAGS, tags.MAKERNOTE_CANON_TAGS)
+        with self.assertRaises(AttributeError):
+            tags.MAKERNOTE_ACME_TAGS
+
+
+def _relative_ifd(tag, text, start, endian):
+    """
+    Build an IFD, placed at ``start`` from the base its offsets are
+    relative to, with a single ASCII value stored out of the entry.
+    """
+    prefix = '<' if endian == 'I' else '>'
+    data_offset = start + 2 + 12 + 4
+    return struct.pack(prefix + 'HHHII', 1, tag, FT_ASCII, len(text),
+                       data_offset) + b'\x00' * 4 + text
+
+
+class TestRelativeMakerNotes(unittest.TestCase):
+    def _process(self, data):
+        from py3exif import process_file
+        return process_file(io.BytesIO(data))
+
+    def test_fujifilm(self):
+        # # Always "Intel" endian, offsets from the start of the MakerNote
+        note = b'FUJIFILM' + struct.pack('<I', 12) \
+            + _relative_ifd(0x1000, b'NORMAL \x00', 12, 'I')
+        for endian in 'IM':
+            header = self._process(
+                _with_makernote(note, make='FUJIFILM', endian=endian))
+            self.assertEqual([b'NORMAL '],
+                             header.tags['MakerNote Quality'].values)
+            self.assertEqual(endian, header.endian)
+            self.assertEqual(0, header.offset)
+
+    def test_nikon_type2(self):
+        # # Own TIFF header, offsets from there
+        for endian, tiff_header in (('I', b'II*\x00\x08\x00\x00\x00'),
+                                    ('M', b'MM\x00*\x00\x00\x00\x08')):
+            note = b'Nikon\x00\x02\x10\x00\x00' + tiff_header \
+                + _relative_ifd(0x0004, b'FINE   \x00', 8, endian)
+            for file_endian in 'IM':
+                header = self._process(_with_makernote(
+                    note, make='NIKON CORPORATION', endian=file_endian))
+                self.assertEqual([b'FINE   '],
+                                 header.tags['MakerNote Quality'].values)
+                self.assertEqual(file_endian, header.endian)
+
+
+class TestOlympus(unittest.TestCase):
+    def _note(self, endian, field_type=FT_LONG):
+        """Newer Olympus MakerNote, with a CameraSettings sub-IFD"""
+        prefix = '<' if endian == 'I' else '>'
+        label = b'OLYMPUS\x00' + (b'II' if endian == 'I' else b'MM') \
+            + struct.pack(prefix + 'H', 3)
+        sub_ifd = _note_ifd([entry(0x0200, FT_SHORT, [2]),
+                             entry(0x0603, FT_SHORT, [4])], endian)
+        # # Main IFD at 12, with a single entry: the sub-IFD follows it
+        sub_offset = 12 + 2 + 12 + 4
+        # # Either a pointer, or the sub-IFD as the value
+        count = len(sub_ifd) if field_type == FT_UNDEFINED else 1
+        main_ifd = struct.pack(prefix + 'HHHII', 1, 0x2020, field_type,
+                               count, sub_offset) + b'\x00' * 4
+        return label + main_ifd + sub_ifd
+
+    def _process(self, note, endian='M'):
+        from py3exif import process_file
+        data = _with_makernote(note, make='OLYMPUS IMAGING CORP.',
+                               endian=endian)
+        return process_file(io.BytesIO(data))
+
+    def test_camera_settings(self):
+        from py3exif.constants.field_types import FT_IFD
+        for endian in 'IM':
+            for field_type in (FT_LONG, FT_IFD, FT_UNDEFINED):
+                header = self._process(self._note(endian, field_type))
+                tags = header.tags
+                self.assertIn('MakerNote CameraSettings', tags)
+                self.assertFalse(dict.__contains__(
+                    tags, 'MakerNote CameraSettings ExposureMode'))
+
+                mode = tags['MakerNote CameraSettings ExposureMode']
+                self.assertEqual([2], mode.values)
+                self.assertEqual('Program', mode.printable)
+                quality = tags['MakerNote CameraSettings ImageQuality2']
+                self.assertEqual('RAW', quality.printable)
+
+    def test_listing(self):
+        header = self._process(self._note('I'))
+        self.assertIn('CameraSettings ExposureMode', header.makernote)
+
+    def test_out_of_bounds(self):
+        import warnings
+        note = bytearray(self._note('I'))
+        note[12 + 2 + 8:12 + 2 + 12] = struct.pack('<I', 1 << 30)
+        header = self._process(bytes(note))
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertNotIn('MakerNote CameraSettings ExposureMode',
+                             header.tags)
+        self.assertTrue(any('out of bounds' in str(w.message)
+                            for w in caught))
+
+    def test_older_format(self):
+        note = _note_ifd([entry(0x0201, FT_SHORT, [3])], 'M',
+                         label=b'OLYMP\x00\x01\x00')
+        header = self._process(note)
+        self.assertEqual('SHQ', header.tags['MakerNote JPEGQual'].printable)
+
+
+class TestLazyMakerNote(unittest.TestCase):
+    def setUp(self):
+        from py3exif.makernotes import register_makernote, \
+            unregister_makernote
+        self.calls = []
+
+        def decode_lazy(header, tags, note):
+            self.calls.append(note.field_offset)
+            header.extract_makernote_ifd(tags, note.field_offset,
+                                         tags_library={0x0001: ('Widget', )})
+
+        decoder = register_makernote(decode_lazy, make='Lazy')
+        self.addCleanup(unregister_makernote, decoder)
+        note = _note_ifd([entry(0x0001, FT_SHORT, [7])])
+        self.data = _with_makernote(note, make='Lazy')
+
+    def _process(self, **kwargs):
+        from py3exif import process_file
+        return process_file(io.BytesIO(self.data), **kwargs)
+
+    def test_decoded_on_lookup(self):
+        header = self._process()
+        tags = header.tags
+        self.assertEqual([100], tags['EXIF ISOSpeedRatings'].values)
+        self.assertIsNone(tags.get('Image Software'))
+        self.assertIn('EXIF MakerNote', tags)
+        self.assertEqual([], self.calls)
+
+        self.assertEqual([7], tags['MakerNote Widget'].values)
+        self.assertNotIn('MakerNote Gadget', tags)
+        self.assertEqual(1, len(self.calls))
+        self.assertEqual(tags['EXIF MakerNote'].field_offset, self.calls[0])
+
+    def test_decoded_on_listing(self):
+        header = self._process()
+        self.assertIn('MakerNote Widget', list(header.tags))
+        self.assertEqual(1, len(self.calls))
+
+        header = self._process()
+        self.assertIn('MakerNote Widget', dict(header.tags))
+        self.assertEqual(2, len(self.calls))
+
+    def test_makernote_mapping(self):
+        header = self._process()
+        header.tags
+        self.assertEqual([], self.calls)
+        self.assertEqual([7], header.makernote['Widget'].values)
+        self.assertEqual(['Widget'], list(header.makernote))
+        self.assertIn('MakerNote Widget', header)
+        self.assertEqual(1, len(self.calls))
+
+    def test_concurrent_lookups(self):
+        import threading
+        header = self._process()
+        tags = header.tags
+        found = []
+
+        def lookup():
+            found.append(tags['MakerNote Widget'].values)
+
+        threads = [threading.Thread(target=lookup) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([[7]] * 8, found)
+        self.assertEqual(1, len(self.calls))
+
+    def test_not_detailed(self):
+        header = self._process(detailed=False)
+        self.assertNotIn('MakerNote Widget', header.tags)
+        self.assertEqual({}, header.makernote)
+        self.assertEqual([], self.calls)
@@ -8,70 +8,70 @@ import unittest
 class TestMmapBytes(unittest.TestCase):
     def test_filewindow(self):
         import os
-        from StringIO import StringIO
-        from exifpy.utils import FileWindow
+        from io import BytesIO
+        from py3exif.utils import FileWindow
 
-        s = StringIO("Hello, world; spam & eggs for everybody!")
+        s = BytesIO(b"Hello, world; spam & eggs for everybody!")
         s.seek(0)
-        self.assertEqual("H", s.read(1))
-        self.assertEqual("e", s.read(1))
-        self.assertEqual("llo", s.read(3))
+        self.assertEqual(b"H", s.read(1))
+        self.assertEqual(b"e", s.read(1))
+        self.assertEqual(b"llo", s.read(3))
         s.seek(-1, os.SEEK_END)
-        self.assertEqual("!", s.read(1))
+        self.assertEqual(b"!", s.read(1))
 
         win0 = FileWindow(s)
         win0.seek(0)
-        self.assertEqual("H", win0.read(1))
-        self.assertEqual("e", win0.read(1))
-        self.assertEqual("llo", win0.read(3))
+        self.assertEqual(b"H", win0.read(1))
+        self.assertEqual(b"e", win0.read(1))
+        self.assertEqual(b"llo", win0.read(3))
         win0.seek(-1, os.SEEK_END)
-        self.assertEqual("!", win0.read(1))
+        self.assertEqual(b"!", win0.read(1))
         win0.seek(-5, os.SEEK_END)
-        self.assertEqual("body!", win0.read(5))
+        self.assertEqual(b"body!", win0.read(5))
 
         win1 = FileWindow(s, 7)
         win1.seek(0)
-        self.assertEqual("w", win1.read(1))
-        self.assertEqual("o", win1.read(1))
-        self.assertEqual("rld", win1.read(3))
+        self.assertEqual(b"w", win1.read(1))
+        self.assertEqual(b"o", win1.read(1))
+        self.assertEqual(b"rld", win1.read(3))
         win1.seek(-1, os.SEEK_END)
-        self.assertEqual("!", win1.read(1))
+        self.assertEqual(b"!", win1.read(1))
         win1.seek(-5, os.SEEK_END)
-        self.assertEqual("body!", win1.read(5))
+        self.assertEqual(b"body!", win1.read(5))
 
         win1.set_window(14, 25)
         win1.seek(0)
-        self.assertEqual("spam & eggs", win1.read())
+        self.assertEqual(b"spam & eggs", win1.read())
         win1.seek(0)
-        self.assertEqual("spam", win1.read(4))
+        self.assertEqual(b"spam", win1.read(4))
         win1.seek(0)
-        self.assertEqual("spam & eggs", win1.read(1000))
+        self.assertEqual(b"spam & eggs", win1.read(1000))
         win1.seek(-4, os.SEEK_END)
-        self.assertEqual("eggs", win1.read(4))
+        self.assertEqual(b"eggs", win1.read(4))
         win1.seek(-4, os.SEEK_END)
-        self.assertEqual("eggs", win1.read())
+        self.assertEqual(b"eggs", win1.read())
         win1.seek(-4, os.SEEK_END)
-        self.assertEqual("eggs", win1.read(1000))
+        self.assertEqual(b"eggs", win1.read(1000))
 
         win2 = FileWindow(s, 14, 25)
         win2.seek(0)
-        self.assertEqual("spam & eggs", win2.read())
+        self.assertEqual(b"spam & eggs", win2.read())
         win2.seek(0)
-        self.assertEqual("spam", win2.read(4))
+        self.assertEqual(b"spam", win2.read(4))
         win2.seek(0)
-        self.assertEqual("spam & eggs", win2.read(1000))
+        self.assertEqual(b"spam & eggs", win2.read(1000))
         win2.seek(-4, os.SEEK_END)
-        self.assertEqual("eggs", win2.read(4))
+        self.assertEqual(b"eggs", win2.read(4))
         win2.seek(-4, os.SEEK_END)
-        self.assertEqual("eggs", win2.read())
+        self.assertEqual(b"eggs", win2.read())
         win2.seek(-4, os.SEEK_END)
-        self.assertEqual("eggs", win2.read(1000))
+        self.assertEqual(b"eggs", win2.read(1000))
 
     def test_mmapbytes(self):
-        from StringIO import StringIO
-        from exifpy.utils import mmapbytes
+        from io import BytesIO
+        from py3exif.utils import mmapbytes
 
-        message = "Hello, world; spam & eggs for everybody!"
+        message = b"Hello, world; spam & eggs for everybody!"
 
         ## Test direct referencing of items
         ## The object should behave exactly like a bytearray
@@ -91,10 +91,10 @@ class TestMmapBytes(unittest.TestCase):
 
         for winStart, winEnd in test_windows:
             _message = message[winStart:winEnd]
-            mm = mmapbytes(StringIO(message), winStart, winEnd)
+            mm = mmapbytes(BytesIO(message), winStart, winEnd)
             for idx in test_indices:
                 try:
-                    expected = ord(_message[idx])
+                    expected = _message[idx]
 
                 except IndexError:
                     # print "\n\n\nWe're running with window {},{}" \
@@ -138,7 +138,7 @@ class TestMmapBytes(unittest.TestCase):
 
         for winStart, winEnd in test_windows:
             _message = message[winStart:winEnd]
-            mm = mmapbytes(StringIO(message), winStart, winEnd)
+            mm = mmapbytes(BytesIO(message), winStart, winEnd)
             for start, end in test_indices:
                 expected = _message[start:end]
                 result = mm[start:end]
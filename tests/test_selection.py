@@ -0,0 +1,76 @@
+"""
+Tests for tag selection
+"""
+
+import io
+import unittest
+
+from py3exif.constants.field_types import FT_RATIO
+from tests.helpers import TiffBuilder, make_jpeg, make_tiff, entry, \
+    BASIC_IFD0, BASIC_EXIF
+
+GPS = [entry(0x0002, FT_RATIO, [(48, 1), (51, 1), (2400, 100)])]
+
+
+class TestTagSelection(unittest.TestCase):
+    def test_matching(self):
+        from py3exif.selection import TagSelection
+        selection = TagSelection(['Image Orientation', 'GPS*', 'EXIF ?Number'])
+        self.assertIn('Image Orientation', selection)
+        self.assertIn('GPS GPSLatitude', selection)
+        self.assertIn('EXIF FNumber', selection)
+        self.assertNotIn('Image Make', selection)
+        self.assertNotIn('Image Orientation2', selection)
+
+        self.assertTrue(selection.wants_prefix('GPS '))
+        self.assertTrue(selection.wants_prefix('EXIF '))
+        self.assertFalse(selection.wants_prefix('MakerNote '))
+        self.assertFalse(selection.exact_names)
+        self.assertTrue(TagSelection(['Image Make']).exact_names)
+
+    def test_presets(self):
+        from py3exif.selection import TagSelection, PRESETS
+        selection = TagSelection.from_names(['gps', 'Image Make', 'basic'])
+        self.assertEqual(('GPS *', 'Image Make') + PRESETS['basic'][1:],
+                         selection.patterns)
+        self.assertIsNone(TagSelection.from_names(['gps', 'full']))
+
+
+class TestSelectedExtraction(unittest.TestCase):
+    def _process(self, data, **kwargs):
+        from py3exif import process_file
+        return process_file(io.BytesIO(data), **kwargs)
+
+    def test_select(self):
+        data = make_jpeg(make_tiff(BASIC_IFD0, BASIC_EXIF, GPS))
+        header = self._process(data, select=['EXIF ISO*', 'GPS*'])
+        self.assertEqual(['EXIF ISOSpeedRatings', 'GPS GPSLatitude'],
+                         sorted(header.tags))
+        self.assertEqual([100], header.tags['EXIF ISOSpeedRatings'].values)
+
+        header = self._process(data, select='gps')
+        self.assertEqual(['GPS GPSLatitude'], sorted(header.tags))
+
+        header = self._process(data, select='full')
+        self.assertIn('Image XResolution', header.tags)
+
+    def test_pushdown(self):
+        data = make_jpeg(make_tiff(BASIC_IFD0, BASIC_EXIF, GPS))
+        full = self._process(data)
+        full.tags
+        header = self._process(data, select=['Image Orientation'])
+        self.assertEqual(['Image Orientation'], sorted(header.tags))
+        self.assertLess(header._budget.bytes_read, full._budget.bytes_read)
+        # # Neither the EXIF nor the GPS IFD were decoded
+        self.assertEqual(1, header._budget.ifds)
+
+    def test_pages(self):
+        from py3exif.constants.field_types import FT_LONG
+        builder = TiffBuilder()
+        for page in range(3):
+            builder.add_ifd([entry(0x0100, FT_LONG, [1000 + page])])
+        header = self._process(builder.build(), select=['IFD 2 *'])
+        self.assertEqual(['IFD 2 ImageWidth'], sorted(header.tags))
+        # # The chain is walked, but only the last IFD is decoded
+        self.assertEqual(3, header._budget.ifds)
+        self.assertEqual(1, header._budget.values)
@@ -0,0 +1,122 @@
+"""
+Tests for the metadata service
+"""
+
+import os
+import socket
+import shutil
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+from tests.helpers import make_jpeg, make_tiff, BASIC_IFD0, BASIC_EXIF
+
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets only')
+class TestService(unittest.TestCase):
+    def setUp(self):
+        from py3exif.service import MetadataServer
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+        self.image = make_jpeg(make_tiff(BASIC_IFD0, exif=BASIC_EXIF))
+        self.path = os.path.join(self.tmpdir, 'a.jpg')
+        with open(self.path, 'wb') as f:
+            f.write(self.image)
+
+        self.socket_path = os.path.join(self.tmpdir, 'py3exif.sock')
+        self.server = MetadataServer(self.socket_path, jobs=4)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+
+        def stop():
+            self.server.shutdown()
+            thread.join()
+            self.server.server_close()
+        self.addCleanup(stop)
+
+    def _client(self):
+        from py3exif.service import ServiceClient
+        client = ServiceClient(self.socket_path, timeout=10)
+        self.addCleanup(client.close)
+        return client
+
+    def test_parse(self):
+        client = self._client()
+        response = client.parse(self.path)
+        self.assertEqual(self.path, response['path'])
+        self.assertIsNone(response['error'])
+        self.assertEqual('Canon', response['tags']['Image Make'])
+        self.assertEqual('1/500', response['tags']['EXIF ExposureTime'])
+
+        response = client.parse(data=self.image, id=7,
+                                select=['Image Orientation'])
+        self.assertEqual(7, response['id'])
+        self.assertEqual({'Image Orientation': 1}, response['tags'])
+
+    def test_errors(self):
+        client = self._client()
+        response = client.parse(os.path.join(self.tmpdir, 'missing.jpg'))
+        self.assertTrue(response['error'].startswith('FileNotFoundError'))
+        response = client.parse(data=b'garbage')
+        self.assertTrue(response['error'].startswith('UnsupportedFormat'))
+
+        # # The connection is still usable after an invalid request
+        client._socket.sendall(b'not json\n')
+        self.assertTrue(client._rfile.readline().startswith(b'{'))
+        self.assertIsNone(client.parse(self.path)['error'])
+
+    def test_limits(self):
+        from py3exif import ParseLimits
+        from py3exif.service import handle_request, DEFAULT_LIMITS
+        client = self._client()
+        self.server.limits = ParseLimits(max_ifds=1)
+        response = client.parse(self.path)
+        self.assertTrue(response['error'].startswith('LimitExceeded'))
+
+        with unittest.mock.patch('py3exif.service.process_file') as parse:
+            handle_request({'path': self.path})
+        self.assertIs(DEFAULT_LIMITS, parse.call_args[1]['limits'])
+
+    def test_request_too_long(self):
+        client = self._client()
+        self.server.max_request_size = 1024
+        client._socket.sendall(b'{"path": "' + b'x' * 100000 + b'"}\n')
+        response = client._rfile.readline()
+        self.assertIn(b'Request too long', response)
+        # # The rest of the line was skipped
+        self.assertIsNone(client.parse(self.path)['error'])
+
+    def test_pipelining(self):
+        from py3exif.service import ServiceClient
+        missing = os.path.join(self.tmpdir, 'missing.jpg')
+        requests = []
+        for i in range(500):
+            path = missing if i % 7 == 0 else self.path
+            requests.append(ServiceClient.request(path, id=i))
+
+        responses = list(self._client().parse_many(requests))
+        self.assertEqual(list(range(500)), [r['id'] for r in responses])
+        for i, response in enumerate(responses):
+            self.assertEqual(i % 7 == 0, response['error'] is not None)
+
+    def test_concurrent_clients(self):
+        results = []
+
+        def run():
+            with self._client() as client:
+                responses = client.parse_many([self.path] * 50)
+                results.append(all(r['error'] is None for r in responses))
+
+        threads = [threading.Thread(target=run) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([True] * 4, results)
+
+    def test_stale_socket(self):
+        from py3exif.service import MetadataServer
+        with self.assertRaises(OSError):
+            MetadataServer(self.socket_path)
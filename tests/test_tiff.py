@@ -0,0 +1,303 @@
+"""
+Tests for TIFF / BigTIFF IFD chain walking
+"""
+
+import io
+import struct
+import unittest
+import warnings
+
+from py3exif.constants.field_types import FT_SHORT, FT_LONG
+from tests.helpers import TiffBuilder, entry, ascii_entry, BASIC_IFD0, \
+    BASIC_EXIF
+
+
+def _multipage(pages, **kwargs):
+    builder = TiffBuilder(**kwargs)
+    for page in range(pages):
+        builder.add_ifd([
+            entry(0x0100, FT_LONG, [1000 + page]),
+            entry(0x0101, FT_LONG, [2000 + page]),
+            ascii_entry(0x010D, 'page {}'.format(page)),
+        ])
+    return builder
+
+
+class TestIFDChain(unittest.TestCase):
+    def _process(self, data, **kwargs):
+        from py3exif import process_file
+        return process_file(io.BytesIO(data), **kwargs)
+
+    def test_classic_tiff(self):
+        data = TiffBuilder('M').add_ifd(BASIC_IFD0, exif=BASIC_EXIF).build()
+        header = self._process(data)
+        self.assertFalse(header.bigtiff)
+        self.assertEqual([1], header.tags['Image Orientation'].values)
+        self.assertEqual([100], header.tags['EXIF ISOSpeedRatings'].values)
+
+    def test_bigtiff(self):
+        for endian in 'IM':
+            data = TiffBuilder(endian, bigtiff=True) \
+                .add_ifd(BASIC_IFD0, exif=BASIC_EXIF).build()
+            header = self._process(data)
+            self.assertTrue(header.bigtiff)
+            self.assertEqual([b'Canon'], header.tags['Image Make'].values)
+            self.assertEqual([1], header.tags['Image Orientation'].values)
+            self.assertEqual([b'2003:12:14 12:01:44'],
+                             header.tags['EXIF DateTimeOriginal'].values)
+
+    def test_multipage_index(self):
+        for bigtiff in (False, True):
+            header = self._process(_multipage(300, bigtiff=bigtiff).build())
+            self.assertEqual(300, header.page_count)
+            self.assertEqual(300, len(set(header.ifd_offsets)))
+
+            page = header.page_tags(250)
+            self.assertEqual([1250], page['IFD 250 ImageWidth'].values)
+            self.assertEqual([b'page 250'],
+                             page['IFD 250 DocumentName'].values)
+
+            self.assertEqual([1000], header.tags['Image ImageWidth'].values)
+            self.assertEqual([2001],
+                             header.tags['Thumbnail ImageLength'].values)
+            self.assertEqual([1299], header.tags['IFD 299 ImageWidth'].values)
+
+    def test_chain_loop(self):
+        builder = _multipage(5)
+        data = bytearray(builder.build())
+        header = self._process(bytes(data))
+        second = header.ifd_offsets[1]
+
+        # # Make the last IFD point back to the second one
+        data[builder.last_next_field:builder.last_next_field + 4] = \
+            struct.pack('<I', second)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            header = self._process(bytes(data))
+            self.assertEqual(5, header.page_count)
+        self.assertTrue(any('loops back' in str(w.message) for w in caught))
+
+        header = self._process(bytes(data), strict=True)
+        with self.assertRaises(ValueError):
+            header.ifd_offsets
+
+    def test_self_loop(self):
+        builder = TiffBuilder().add_ifd([entry(0x0112, FT_SHORT, [3])])
+        data = bytearray(builder.build())
+        data[builder.last_next_field:builder.last_next_field + 4] = \
+            struct.pack('<I', 8)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            header = self._process(bytes(data))
+            self.assertEqual([8], header.ifd_offsets)
+            self.assertEqual([3], header.tags['Image Orientation'].values)
+
+
+class TestTiffThumbnail(unittest.TestCase):
+    PIXELS = bytes(range(12))
+
+    def _build(self, endian, bigtiff):
+        def build(strip_offset):
+            return TiffBuilder(endian, bigtiff=bigtiff) \
+                .add_ifd(BASIC_IFD0) \
+                .add_ifd([
+                    entry(0x0100, FT_SHORT, [2]),
+                    entry(0x0101, FT_SHORT, [2]),
+                    entry(0x0102, FT_SHORT, [8, 8, 8]),
+                    entry(0x0103, FT_SHORT, [1]),
+                    entry(0x0111, FT_LONG, [strip_offset]),
+                    entry(0x0115, FT_SHORT, [3]),
+                    entry(0x0117, FT_LONG, [len(self.PIXELS)])]) \
+                .build()
+        # # The pixels go right after the IFDs
+        return build(len(build(0))) + self.PIXELS
+
+    def test_extract(self):
+        from py3exif import process_file
+        for endian in ('I', 'M'):
+            for bigtiff in (False, True):
+                header = process_file(self._build(endian, bigtiff))
+                tags = header.tags
+                header._extract_tiff_thumbnail(tags, header.ifd_offsets[1])
+
+                thumbnail = process_file(tags['TIFFThumbnail'])
+                self.assertEqual(bigtiff, thumbnail.bigtiff)
+                self.assertEqual(endian, thumbnail.endian)
+                thumb_tags = thumbnail.tags
+                self.assertEqual([8, 8, 8],
+                                 thumb_tags['Image BitsPerSample'].values)
+                offset = thumb_tags['Image StripOffsets'].value
+                self.assertEqual(self.PIXELS, tags['TIFFThumbnail'][
+                    offset:offset + len(self.PIXELS)])
+
+
+class TestValues(unittest.TestCase):
+    def test_bytes_values(self):
+        from py3exif import process_file
+        from py3exif.constants.field_types import FT_UNDEFINED, FT_BYTE, \
+            FT_SIGNED_BYTE, FT_SIGNED_SHORT
+        note = bytes(bytearray(range(256))) * 120
+        exif = [
+            entry(0x9000, FT_UNDEFINED, b'0230'),
+            entry(0x927C, FT_UNDEFINED, note),
+            entry(0xA302, FT_UNDEFINED, b'\x00\x02\x00\x02\x01\x02\x01\x00'),
+            entry(0x0001, FT_BYTE, b'\x01\x02\x03\x04\x05'),
+            entry(0x0002, FT_SIGNED_BYTE, [-1, 2, -3, 4, -5]),
+            entry(0x0003, FT_SIGNED_SHORT, [-300, 300, -1]),
+        ]
+        ifd0 = [entry(0x0112, FT_SHORT, [1])] + BASIC_IFD0[3:]
+        for endian in 'IM':
+            data = TiffBuilder(endian).add_ifd(ifd0, exif=exif).build()
+            header = process_file(io.BytesIO(data))
+            tags = header.tags
+
+            self.assertEqual(b'0230', tags['EXIF ExifVersion'].values)
+            self.assertEqual(note, tags['EXIF MakerNote'].values)
+            self.assertEqual(len(note), tags['EXIF MakerNote'].field_length)
+            self.assertEqual([1, 2, 3, 4, 5],
+                             tags['EXIF Tag 0x0001'].as_list())
+            self.assertEqual([-1, 2, -3, 4, -5],
+                             tags['EXIF Tag 0x0002'].values)
+            self.assertEqual([-300, 300, -1], tags['EXIF Tag 0x0003'].values)
+            self.assertEqual(8, len(tags['EXIF CVAPattern'].as_list()))
+
+            ratio = tags['Image XResolution'].values[0]
+            self.assertEqual((180, 1), (ratio.num, ratio.den))
+
+
+class TestTypedValues(unittest.TestCase):
+    def test_get_value(self):
+        from py3exif import process_file
+        from py3exif.objects import IFD_Tag, Ratio
+        data = TiffBuilder().add_ifd(BASIC_IFD0, exif=BASIC_EXIF).build()
+        header = process_file(io.BytesIO(data))
+
+        self.assertEqual(1, header.get_value('Image Orientation'))
+        self.assertEqual('Canon', header.get_value('Image Make'))
+        exposure = header.get_value('EXIF ExposureTime')
+        self.assertIsInstance(exposure, Ratio)
+        self.assertEqual((1, 500), (exposure.num, exposure.den))
+        self.assertIsNone(header.get_value('EXIF FNumber'))
+        self.assertEqual(0, header.get_value('EXIF FNumber', 0))
+
+        # # No printable value was computed
+        for tag in header.tags.values():
+            if isinstance(tag, IFD_Tag):
+                self.assertNotIn('_lazy_printable', vars(tag))
+
+    def test_typed(self):
+        from py3exif import process_file
+        data = TiffBuilder().add_ifd(BASIC_IFD0, exif=BASIC_EXIF).build()
+        header = process_file(io.BytesIO(data))
+        typed = header.typed()
+        self.assertEqual(set(header.tags), set(typed))
+        self.assertEqual('Canon PowerShot S40', typed['Image Model'])
+        self.assertEqual(100, typed['EXIF ISOSpeedRatings'])
+        self.assertEqual('2003:12:14 12:01:44', typed['EXIF DateTimeOriginal'])
+
+
+class TestPrintableCache(unittest.TestCase):
+    def test_memoized(self):
+        from py3exif import process_file
+        from py3exif.objects import PrintableCache, render_printable
+        data = TiffBuilder().add_ifd(BASIC_IFD0, exif=BASIC_EXIF).build()
+        cache = PrintableCache(maxsize=2)
+
+        tag = process_file(io.BytesIO(data)).tags['Image Orientation']
+        self.assertEqual(['Horizontal (normal)'], cache.render_many([tag]))
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+        tag = process_file(io.BytesIO(data)).tags['Image Orientation']
+        self.assertEqual('Horizontal (normal)', cache.render(tag))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+        # # Tags without a formatter are not kept
+        tag = process_file(io.BytesIO(data)).tags['Image Make']
+        self.assertEqual([b'Canon'], cache.render(tag))
+        self.assertEqual(1, len(cache))
+
+    def test_bytes_values(self):
+        from py3exif import process_file
+        from py3exif.constants.field_types import FT_BYTE, FT_UNDEFINED
+        gps = [entry(0x0000, FT_BYTE, b'\x02\x02\x00\x00')]
+        exif = BASIC_EXIF + [entry(0x9000, FT_UNDEFINED, b'0230')]
+        data = TiffBuilder().add_ifd(BASIC_IFD0, exif=exif, gps=gps).build()
+        tags = process_file(io.BytesIO(data)).tags
+        # # As printed before the values were kept as bytes
+        self.assertEqual([2, 2, 0, 0], tags['GPS GPSVersionID'].printable)
+        self.assertEqual('0230', tags['EXIF ExifVersion'].printable)
+
+    def test_bounded(self):
+        from py3exif import process_file
+        from py3exif.objects import PrintableCache
+        cache = PrintableCache(maxsize=2)
+        for orientation in range(1, 6):
+            ifd0 = [entry(0x0112, FT_SHORT, [orientation])]
+            data = TiffBuilder().add_ifd(ifd0).build()
+            tag = process_file(io.BytesIO(data)).tags['Image Orientation']
+            cache.render(tag)
+        self.assertEqual(2, len(cache))
+        self.assertEqual(5, cache.misses)
+
+    def test_printable_values(self):
+        from py3exif import process_file
+        data = TiffBuilder().add_ifd(BASIC_IFD0, exif=BASIC_EXIF).build()
+        header = process_file(io.BytesIO(data))
+        printables = header.printable_values()
+        self.assertEqual(set(header.tags), set(printables))
+        self.assertEqual('Horizontal (normal)',
+                         printables['Image Orientation'])
+        self.assertEqual('Horizontal (normal)',
+                         header.tags['Image Orientation'].printable)
+        self.assertEqual({'Image Orientation': 'Horizontal (normal)'},
+                         header.printable_values(['Image Orientation',
+                                                  'EXIF FNumber']))
+
+
+class TestIterTags(unittest.TestCase):
+    def test_events(self):
+        from py3exif import process_file
+        data = TiffBuilder().add_ifd(BASIC_IFD0, exif=BASIC_EXIF).build()
+        header = process_file(io.BytesIO(data))
+        events = list(header.iter_tags())
+        self.assertEqual(sorted(header.tags), sorted(e.key for e in events))
+
+        event = [e for e in events if e.key == 'EXIF ISOSpeedRatings'][0]
+        self.assertEqual(('EXIF', 0x8827, FT_SHORT, 1),
+                         (event.ifd, event.tag, event.field_type, event.count))
+        self.assertEqual([100], event.value.decode())
+        self.assertEqual(b'\x64\x00', event.value.tobytes())
+
+    def test_lazy_values(self):
+        from py3exif import process_file
+        data = _multipage(50).build()
+        header = process_file(io.BytesIO(data))
+        for event in header.iter_tags():
+            pass
+        walked = header._budget.bytes_read
+
+        header = process_file(io.BytesIO(data))
+        header.tags
+        self.assertLess(walked, header._budget.bytes_read)
+
+        # # Stopping early reads less again
+        header = process_file(io.BytesIO(data))
+        for event in header.iter_tags():
+            if event.name == 'ImageWidth':
+                self.assertEqual([1000], event.value.decode())
+                break
+        self.assertLess(header._budget.bytes_read, walked)
+
+    def test_lazy_chain(self):
+        from py3exif import process_file
+        header = process_file(io.BytesIO(_multipage(50).build()))
+        events = header.iter_tags()
+        self.assertEqual('ImageWidth', next(events).name)
+        # # Only the first IFD of the chain was walked
+        self.assertEqual(1, header._budget.ifds)
+        self.assertEqual(1, len(header._chain))
+
+        self.assertEqual(150, len(list(events)) + 1)
+        self.assertEqual(50, header.page_count)
+        self.assertEqual(50, header._budget.ifds)
@@ -11,16 +11,16 @@ class DummyTest(unittest.TestCase):
 
     def test_read_intel_unsigned_int(self):
         ## Read from little endian (Intel) format
-        from exifpy.utils import unpack_intel
-        self.assertEqual(unpack_intel('\xE8\x03'), 1000)
+        from py3exif.utils import unpack_intel
+        self.assertEqual(unpack_intel(b'\xE8\x03'), 1000)
 
     def test_read_intel_signed_int(self):
         ## Read from big endian (Motorola) format
-        from exifpy.utils import unpack_motorola
-        self.assertEqual(unpack_motorola('\x03\xE8'), 1000)
+        from py3exif.utils import unpack_motorola
+        self.assertEqual(unpack_motorola(b'\x03\xE8'), 1000)
 
     def test_encdec_int(self):
-        from exifpy.utils import encode_int, decode_int
+        from py3exif.utils import encode_int, decode_int
 
         def test_encdec(number, size, signed, little_endian):
             result = encode_int(number, size=size, signed=signed,
@@ -30,10 +30,10 @@ class DummyTest(unittest.TestCase):
             self.assertEqual(number, result2)
 
         ## Check with fixed values..
-        self.assertEqual(decode_int('\xE8\x03', little_endian=True), 1000)
+        self.assertEqual(decode_int(b'\xE8\x03', little_endian=True), 1000)
 
         ## This is a big endian 1000...
-        self.assertEqual(decode_int('\x03\xE8', little_endian=False), 1000)
+        self.assertEqual(decode_int(b'\x03\xE8', little_endian=False), 1000)
 
         ## Check reciprocity..
         test_encdec(1000, 4, False, False)
@@ -43,3 +43,199 @@ class DummyTest(unittest.TestCase):
 
         test_encdec(-1000, 4, True, False)
         test_encdec(-1000, 4, True, True)
+
+
+class TestMakeString(unittest.TestCase):
+    def test_make_string(self):
+        from py3exif.utils import make_string
+        self.assertEqual('Canon\xe9', make_string(b'Ca\x00non\n\xe9'))
+        self.assertEqual('0230', make_string(bytearray(b'0230')))
+        self.assertEqual('AB', make_string([65, 66, 300, 7]))
+        self.assertEqual('page 1', make_string([b'page 1\x00']))
+        # # Nothing printable: unchanged
+        self.assertEqual(b'\x00\x01', make_string(b'\x00\x01'))
+
+    def test_same_as_typed(self):
+        from py3exif import process_file
+        from py3exif.utils import make_string
+        from py3exif.constants.field_types import FT_ASCII
+        from tests.helpers import make_tiff
+        header = process_file(make_tiff([(0x010F, FT_ASCII, b'Caf\xe9\x00')]))
+        tag = header.tags['Image Make']
+        self.assertEqual(u'Caf\xe9', header.typed()['Image Make'])
+        self.assertEqual(header.typed()['Image Make'], make_string(tag.values))
+
+    def test_user_comment(self):
+        from py3exif.utils import make_string_uc
+        self.assertEqual('hello',
+                         make_string_uc(b'ASCII\x00\x00\x00hello\x00'))
+        self.assertEqual('hello', make_string_uc(b'\x00' * 8 + b'hello'))
+        self.assertEqual('', make_string_uc(b'\x00' * 16))
+        for codec in ('utf-16-le', 'utf-16-be', 'utf-16'):
+            comment = b'UNICODE\x00' + u'Caf\xe9 \u65e5'.encode(codec)
+            self.assertEqual(u'Caf\xe9 \u65e5', make_string_uc(comment))
+        comment = b'JIS' + b'\x00' * 5 + u'\u65e5\u672c'.encode('shift_jis')
+        self.assertEqual(u'\u65e5\u672c', make_string_uc(comment))
+
+
+class TestReaders(unittest.TestCase):
+    DATA = b'Hello, world; spam & eggs for everybody!'
+
+    def _check(self, reader):
+        self.assertEqual(len(self.DATA), reader.size)
+        self.assertEqual(b'Hello', reader.read_at(0, 5))
+        self.assertEqual(b'spam', reader.read_at(14, 4))
+        self.assertEqual(b'body!', reader.read_at(35, 100))
+        self.assertEqual(b'', reader.read_at(100, 4))
+        with self.assertRaises(ValueError):
+            reader.read_at(-1, 4)
+
+    def test_buffer_reader(self):
+        import io
+        from py3exif.utils import open_reader, BufferReader
+        for source in (self.DATA, bytearray(self.DATA), io.BytesIO(self.DATA)):
+            reader = open_reader(source)
+            self.assertIsInstance(reader, BufferReader)
+            self._check(reader)
+
+    def test_bytesio_close(self):
+        import io
+        from py3exif import process_file
+        from tests.helpers import make_jpeg, make_tiff, BASIC_IFD0
+        # # Closing the BytesIO must not fail while the header is alive
+        with io.BytesIO(make_jpeg(make_tiff(BASIC_IFD0))) as fileobj:
+            header = process_file(fileobj)
+        self.assertEqual('Canon', header.typed()['Image Make'])
+
+        fileobj = io.BytesIO(self.DATA)
+        from py3exif.utils import open_reader
+        reader = open_reader(fileobj)
+        fileobj.write(b'Bye')
+        self.assertEqual(b'Hello', reader.read_at(0, 5))
+
+    def test_fd_reader(self):
+        import os
+        import tempfile
+        from py3exif.utils import open_reader, FDReader, SeekReader
+        with tempfile.TemporaryFile() as fileobj:
+            fileobj.write(self.DATA)
+            fileobj.flush()
+            fileobj.seek(3)
+            reader = open_reader(fileobj)
+            if hasattr(os, 'pread'):
+                self.assertIsInstance(reader, FDReader)
+            else:
+                self.assertIsInstance(reader, SeekReader)
+            self._check(reader)
+            # # The file position is left alone
+            self.assertEqual(3, fileobj.tell())
+
+            if hasattr(os, 'pread'):
+                # # A single call for reads up to (or past) the end of file
+                from unittest import mock
+                with mock.patch('os.pread', wraps=os.pread) as pread:
+                    self.assertEqual(b'body!', reader.read_at(35, 100))
+                    self.assertEqual(b'', reader.read_at(100, 4))
+                self.assertEqual(1, pread.call_count)
+
+    def test_closed_file(self):
+        import os
+        import shutil
+        import tempfile
+        from py3exif import process_file
+        from tests.helpers import make_tiff, ascii_entry
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        paths = []
+        for name in ('a', 'b'):
+            paths.append(os.path.join(tmpdir, name + '.tif'))
+            with open(paths[-1], 'wb') as f:
+                f.write(make_tiff([ascii_entry(0x010E, name * 100)]))
+
+        # # The descriptor of a.tif is given to b.tif once a.tif is closed
+        with open(paths[0], 'rb') as f:
+            header = process_file(f, read_size=0)
+        with open(paths[1], 'rb'):
+            with self.assertRaises(ValueError):
+                header.tags
+
+    def test_seek_reader(self):
+        import io
+        from py3exif.utils import open_reader, SeekReader
+        reader = open_reader(io.BufferedReader(io.BytesIO(self.DATA)))
+        self.assertIsInstance(reader, SeekReader)
+        self._check(reader)
+
+    def test_concurrent_access(self):
+        import tempfile
+        import threading
+        from py3exif import process_file
+        from tests.helpers import TiffBuilder, entry, ascii_entry
+        from py3exif.constants.field_types import FT_LONG
+
+        builder = TiffBuilder()
+        for page in range(50):
+            builder.add_ifd([entry(0x0100, FT_LONG, [page]),
+                             ascii_entry(0x010D, 'page {:d}'.format(page))])
+
+        with tempfile.TemporaryFile() as fileobj:
+            fileobj.write(builder.build())
+            fileobj.flush()
+            header = process_file(fileobj)
+            errors = []
+
+            def work(pages):
+                for page in pages:
+                    tags = header.page_tags(page)
+                    name = header._ifd_name(page)
+                    if tags[name + ' ImageWidth'].values != [page]:
+                        errors.append(page)
+
+            threads = [threading.Thread(target=work, args=(range(i, 50, 4), ))
+                       for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual([], errors)
+
+
+class TestLazyProperty(unittest.TestCase):
+    def test_computed_once(self):
+        import time
+        import threading
+        from py3exif.utils import lazy_property
+
+        class Slow(object):
+            calls = 0
+
+            @lazy_property
+            def value(self):
+                Slow.calls += 1
+                time.sleep(0.01)
+                return object()
+
+        slow = Slow()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(slow.value))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, Slow.calls)
+        self.assertEqual(1, len(set(id(x) for x in results)))
+
+        slow.value = 42
+        self.assertEqual(42, slow.value)
+        del slow.value
+        slow.value
+        self.assertEqual(2, Slow.calls)
+
+        # # The lock of the instance is created once
+        from unittest import mock
+        with mock.patch.object(threading, 'RLock',
+                               side_effect=AssertionError):
+            del slow.value
+            slow.value
+        self.assertEqual(3, Slow.calls)